@@ -0,0 +1,184 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Lower values are served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be queued; `status_code` is 429 or 503 and `retry_after` is in seconds."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of doing work for a request whose client deadline has passed."""
+
+
+def expired(deadline: Optional[float]) -> bool:
+    """Whether a deadline on the time.monotonic() clock has passed."""
+    return deadline is not None and time.monotonic() >= deadline
+
+
+class AdmissionQueue:
+    """
+    Bounds the requests of one model and one workload that run or wait at a time.
+
+    Up to `max_concurrency` requests run at once. Further requests wait in a
+    queue ordered by priority, then arrival, and are rejected with 429 once
+    `max_queue` are waiting; lower priority classes may only fill
+    `low_priority_share` of the queue, so batch traffic cannot crowd out
+    interactive traffic. A waiting request whose deadline passes leaves the queue
+    with DeadlineExceeded without ever running.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, low_priority_share: float = 0.5):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.low_priority_share = low_priority_share
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        # Moving average of the time a request holds its slot, for Retry-After
+        self._service_time = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is expected to have drained."""
+        return max(1, math.ceil(self._service_time * (self.queued() + 1) / self.max_concurrency))
+
+    async def acquire(self, priority: int = 0, deadline: Optional[float] = None) -> Callable[[], None]:
+        """Waits for a slot and returns the function releasing it."""
+        if expired(deadline):
+            self.expired += 1
+            raise DeadlineExceeded("Request deadline passed before it was admitted")
+        if self._active < self.max_concurrency and not self.queued():
+            self._active += 1
+        else:
+            limit = self.max_queue if priority == 0 else int(self.max_queue * self.low_priority_share)
+            if self.queued() >= limit:
+                self.rejected += 1
+                raise AdmissionRejected(429, "Too many queued requests for this model", self.retry_after())
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._order), future))
+            timeout = deadline - time.monotonic() if deadline is not None else None
+            try:
+                await asyncio.wait_for(future, timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just as the wait ended
+                    self._release_slot()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.expired += 1
+                    raise DeadlineExceeded("Request deadline passed while it was queued")
+                raise
+        self.admitted += 1
+        started = time.monotonic()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+                self._release_slot()
+        return release
+
+    def _release_slot(self):
+        # The slot goes straight to the next live waiter, if any
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": self.queued(),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "service_time_ms": self._service_time * 1000
+        }
+
+
+class AdmissionController:
+    """
+    Per-model admission queues, created on first use, plus a server-wide bound.
+
+    When `max_in_flight` requests are running or queued across all models, new
+    requests are rejected with 503 before reaching any model queue.
+    """
+
+    def __init__(self, max_in_flight: int, low_priority_share: float = 0.5):
+        self.max_in_flight = max_in_flight
+        self.low_priority_share = low_priority_share
+        self._queues: Dict[Tuple[str, str], AdmissionQueue] = {}
+        self._in_flight = 0
+        self.rejected = 0
+
+    def queue(self, model_name: str, workload: str, max_concurrency: int, max_queue: int) -> AdmissionQueue:
+        key = (model_name, workload)
+        queue = self._queues.get(key)
+        if queue is None or (queue.max_concurrency, queue.max_queue) != (max(1, max_concurrency), max(0, max_queue)):
+            # New limits apply to new requests; requests holding a slot of the old queue release it there
+            queue = self._queues[key] = AdmissionQueue(max_concurrency, max_queue, self.low_priority_share)
+        return queue
+
+    def forget(self, model_name: str):
+        for key in [key for key in self._queues if key[0] == model_name]:
+            del self._queues[key]
+
+    async def acquire(self, queue: AdmissionQueue, priority: int = 0, deadline: Optional[float] = None) -> Callable[[], None]:
+        if self._in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise AdmissionRejected(503, "Server overloaded", queue.retry_after())
+        self._in_flight += 1
+        try:
+            release = await queue.acquire(priority, deadline)
+        except BaseException:
+            self._in_flight -= 1
+            raise
+        released = False
+
+        def release_all():
+            nonlocal released
+            if not released:
+                released = True
+                self._in_flight -= 1
+                release()
+        return release_all
+
+    @asynccontextmanager
+    async def admit(self, queue: AdmissionQueue, priority: int = 0, deadline: Optional[float] = None):
+        release = await self.acquire(queue, priority, deadline)
+        try:
+            yield
+        finally:
+            release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+            "queues": {f"{name}/{workload}": queue.stats() for (name, workload), queue in self._queues.items()}
+        }
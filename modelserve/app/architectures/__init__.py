@@ -0,0 +1,2 @@
+# This file makes the 'architectures' directory a Python package.
+# Each module exposes a `build(spec, state_dict)` function returning an nn.Module.
@@ -0,0 +1,49 @@
+# Fully connected classifier, the architecture produced by the tabular training scripts
+import re
+import torch
+import torch.nn as nn
+from typing import Dict, List
+
+
+class MLPClassifier(nn.Module):
+    def __init__(self, input_size: int, hidden_sizes: List[int], num_classes: int):
+        super().__init__()
+        layers = []
+        in_features = input_size
+        for hidden_size in hidden_sizes:
+            layers += [nn.Linear(in_features, hidden_size), nn.ReLU()]
+            in_features = hidden_size
+        layers.append(nn.Linear(in_features, num_classes))
+        self.layer_stack = nn.Sequential(*layers)
+
+    def forward(self, x):
+        return self.layer_stack(x)
+
+
+def infer_shapes(state_dict: Dict[str, torch.Tensor]) -> dict:
+    """Reads input size, hidden sizes and number of classes from the linear layer weights."""
+    weights = sorted(
+        (int(match.group(1)), tensor)
+        for key, tensor in state_dict.items()
+        if (match := re.fullmatch(r"layer_stack\.(\d+)\.weight", key))
+    )
+    if not weights:
+        raise ValueError("State dict does not contain any 'layer_stack.<i>.weight' entry.")
+    shapes = [tensor.shape for _, tensor in weights]
+    return {
+        "input_size": shapes[0][1],
+        "hidden_sizes": [shape[0] for shape in shapes[:-1]],
+        "num_classes": shapes[-1][0]
+    }
+
+
+def build(spec: dict, state_dict: Dict[str, torch.Tensor]) -> nn.Module:
+    """
+    Builds an MLPClassifier from the "architecture" section of a model config.
+
+    Any of 'input_size', 'hidden_sizes' and 'num_classes' missing from the spec
+    is inferred from the shapes stored in the weights.
+    """
+    shapes = infer_shapes(state_dict)
+    shapes.update({key: spec[key] for key in shapes if key in spec})
+    return MLPClassifier(shapes["input_size"], list(shapes["hidden_sizes"]), shapes["num_classes"])
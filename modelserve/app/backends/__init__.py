@@ -0,0 +1,4 @@
+# This file makes the 'backends' directory a Python package.
+# Each module is an execution backend exposing EXTENSION, the file extension of its
+# artifacts, `export(model, example, path)` writing a model to an artifact, and
+# `load(path)` returning a callable that maps an input tensor to an output tensor.
@@ -0,0 +1,15 @@
+# torch.export graph compiled ahead of time by Inductor into a native library
+import torch
+import torch.nn as nn
+
+EXTENSION = ".pt2"
+
+
+def export(model: nn.Module, example: torch.Tensor, path: str):
+    batch = torch.export.Dim("batch", min=1)
+    exported = torch.export.export(model, (example,), dynamic_shapes=({0: batch},))
+    torch._inductor.aoti_compile_and_package(exported, package_path=path)
+
+
+def load(path: str):
+    return torch._inductor.aoti_load_package(path)
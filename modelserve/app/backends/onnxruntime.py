@@ -0,0 +1,38 @@
+# ONNX graph run by ONNX Runtime on its CPU execution provider. Optional: needs the
+# onnxruntime package, and onnx and onnxscript to export models.
+import torch
+import torch.nn as nn
+
+EXTENSION = ".onnx"
+
+
+class OnnxRuntimeModel:
+    """Runs an ONNX Runtime session on tensors, with the graph optimizations fully enabled."""
+
+    def __init__(self, path: str):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Same thread budget as torch in this process, e.g. WORKER_THREADS in a worker
+        options.intra_op_num_threads = torch.get_num_threads()
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, data: torch.Tensor) -> torch.Tensor:
+        inputs = data.detach().to(torch.float32).contiguous().numpy()
+        return torch.from_numpy(self.session.run(None, {self.input_name: inputs})[0])
+
+
+def export(model: nn.Module, example: torch.Tensor, path: str):
+    batch = torch.export.Dim("batch", min=1)
+    # Weights are embedded in the graph file so the artifact is a single file that can
+    # be renamed into place; this limits exportable models to 2 GB.
+    torch.onnx.export(
+        model, (example,), path,
+        input_names=["input"], output_names=["output"],
+        dynamic_shapes=({0: batch},), dynamo=True, external_data=False, verbose=False
+    )
+
+
+def load(path: str) -> OnnxRuntimeModel:
+    return OnnxRuntimeModel(path)
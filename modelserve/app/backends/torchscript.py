@@ -0,0 +1,20 @@
+# Traced and frozen TorchScript module: weights folded into the graph, ops fused
+import warnings
+import torch
+import torch.nn as nn
+
+EXTENSION = ".ts.pt"
+
+
+def export(model: nn.Module, example: torch.Tensor, path: str):
+    # torch.jit is deprecated upstream but remains the cheapest way to get a frozen graph
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        with torch.no_grad():
+            torch.jit.save(torch.jit.freeze(torch.jit.trace(model, example)), path)
+
+
+def load(path: str):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return torch.jit.load(path, map_location="cpu")
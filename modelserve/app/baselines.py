@@ -0,0 +1,121 @@
+import os
+import sys
+import json
+import argparse
+import numpy as np
+import torch
+from typing import Dict, Iterator, List, Optional
+
+from streaming import FILE_FORMATS, parse_rows, read_rows
+from preprocessing import Preprocessor, load_preprocessor
+
+# Background set of a model, a 2-D .npy array of input rows stored next to model.pt
+DEFAULT_BACKGROUND_FILE = "background.npy"
+
+
+def background_path(model_path: str, config: dict) -> str:
+    return os.path.join(os.path.dirname(model_path), config.get("background", DEFAULT_BACKGROUND_FILE))
+
+
+def load_explainer_state(model_path: str, config: dict) -> Dict[str, torch.Tensor]:
+    """
+    Loads the precomputed inputs shared by the explainers of a model: the baseline,
+    the mean of its background set. Returns an empty dict when the model has no
+    background set, in which case explainers derive their baseline per request.
+    """
+    path = background_path(model_path, config)
+    if not os.path.exists(path):
+        return {}
+    background = np.load(path, allow_pickle=False)
+    if background.ndim != 2 or len(background) == 0:
+        raise ValueError(f"Background set '{path}' must be a non-empty 2-D array, got shape {background.shape}")
+    return {"baseline": torch.from_numpy(background.astype(np.float32).mean(axis=0, keepdims=True))}
+
+
+def iter_dataset_rows(path: str, chunk_rows: int = 4096, preprocessor: Optional[Preprocessor] = None) -> Iterator[torch.Tensor]:
+    """
+    Reads a CSV or NDJSON dataset file in chunks of parsed rows.
+    With a `preprocessor`, the rows are raw ones (CSV records keyed by the header,
+    NDJSON objects or arrays) and are returned as the encoded features of the network.
+    """
+    fmt = FILE_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported dataset format '{path}', expected one of {list(FILE_FORMATS)}")
+    header: List[str] = []
+
+    def parse(lines: List[bytes], first: bool) -> torch.Tensor:
+        if preprocessor is None:
+            return parse_rows(lines, fmt, skip_header=first)
+        rows = read_rows(lines, fmt)
+        if fmt == "csv":
+            if first:
+                header.extend(rows.pop(0))
+            rows = [dict(zip(header, row)) for row in rows]
+        with torch.no_grad():
+            return preprocessor(preprocessor.encode_rows(rows))
+
+    lines: List[bytes] = []
+    first = True
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                lines.append(line)
+            if len(lines) == chunk_rows:
+                yield parse(lines, first)
+                lines, first = [], False
+    if lines:
+        yield parse(lines, first)
+
+
+def sample_background(path: str, samples: int = 100, seed: int = 0, columns: Optional[List[int]] = None,
+                      preprocessor: Optional[Preprocessor] = None) -> np.ndarray:
+    """
+    Draws a uniform sample of `samples` rows from a dataset file in one pass
+    (reservoir sampling), optionally keeping only the feature `columns`. With a
+    `preprocessor`, raw rows are sampled in the encoded feature space the
+    explainers work in, and the preprocessor picks the columns by name.
+    """
+    rng = np.random.default_rng(seed)
+    reservoir: List[np.ndarray] = []
+    seen = 0
+    for chunk in iter_dataset_rows(path, preprocessor=preprocessor):
+        rows = chunk.numpy()
+        if columns is not None:
+            rows = rows[:, columns]
+        for row in rows:
+            if len(reservoir) < samples:
+                reservoir.append(row)
+            else:
+                slot = rng.integers(0, seen + 1)
+                if slot < samples:
+                    reservoir[slot] = row
+            seen += 1
+    if not reservoir:
+        raise ValueError(f"Dataset '{path}' has no rows")
+    return np.stack(reservoir).astype(np.float32)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Stores the explainer background set of a model, sampled from its training dataset.")
+    parser.add_argument("dataset", help="Training dataset, as a .csv or .ndjson file of feature rows")
+    parser.add_argument("model_dir", help="Directory holding the model.pt of the model")
+    parser.add_argument("--samples", type=int, default=100, help="Number of background rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--columns", type=int, nargs="*", help="Indices of the feature columns, if the dataset has others (e.g. the label)")
+    args = parser.parse_args(argv)
+
+    # Explanations of a model with a fitted preprocessing are over its encoded features
+    config_path = os.path.join(args.model_dir, "config.json")
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path, "r") as f:
+            config = json.load(f)
+    preprocessor = load_preprocessor(os.path.join(args.model_dir, "model.pt"), config)
+    background = sample_background(args.dataset, args.samples, args.seed, args.columns, preprocessor)
+    path = os.path.join(args.model_dir, DEFAULT_BACKGROUND_FILE)
+    np.save(path, background, allow_pickle=False)
+    print(f"Saved a background set of {len(background)} rows to {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
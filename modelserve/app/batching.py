@@ -0,0 +1,113 @@
+import asyncio
+import time
+import torch
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+
+from admission import DeadlineExceeded, expired
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent requests for a single model into one forward pass.
+
+    Requests are queued as they arrive. A runner task takes the first queued
+    request, keeps collecting more until either `max_batch_size` rows have been
+    gathered or `max_wait_ms` has elapsed, concatenates them along the first
+    dimension, runs `forward` once off the event loop, and scatters the rows of
+    the result back to each waiting request. `forward` is either a blocking
+    function, run in a thread, or a coroutine function, awaited directly.
+
+    The runner task exits as soon as the queue is drained and is restarted by
+    the next submission, so an idle batcher holds no task and needs no cleanup.
+    Requests whose client has gone away, or whose deadline has passed while they
+    were queued, are left out of the batch.
+
+    After each forward pass, `on_batch` is called with the number of rows in
+    the batch, the seconds each of its requests spent queued, and the seconds
+    the forward pass took.
+    """
+
+    def __init__(self, forward: Callable[[torch.Tensor], Union[torch.Tensor, Awaitable[torch.Tensor]]], max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 on_batch: Optional[Callable[[int, List[float], float], None]] = None):
+        self.forward = forward
+        self._forward_is_async = asyncio.iscoroutinefunction(forward)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.on_batch = on_batch
+        self._queue: "asyncio.Queue[Tuple[torch.Tensor, asyncio.Future, Optional[float], float]]" = asyncio.Queue()
+        self._runner: Optional[asyncio.Task] = None
+
+    async def submit(self, data: torch.Tensor, deadline: Optional[float] = None) -> torch.Tensor:
+        """
+        Queues `data` for the next batch and waits for its rows of the output.
+        `deadline` is on the time.monotonic() clock.
+        """
+        if data.dim() == 1:
+            # A single unbatched row.
+            return (await self.submit(data.unsqueeze(0), deadline))[0]
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((data, future, deadline, time.perf_counter()))
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+        return await future
+
+    async def run(self, inputs: torch.Tensor) -> torch.Tensor:
+        """Runs `forward` on an already batched input, bypassing the queue."""
+        if self._forward_is_async:
+            return await self.forward(inputs)
+        return await asyncio.to_thread(self.forward, inputs)
+
+    async def _run(self):
+        while not self._queue.empty():
+            batch = await self._collect()
+            # Requests with a different row shape or dtype cannot be concatenated,
+            # so each compatible group gets its own forward pass.
+            groups = {}
+            for data, future, deadline, submitted in batch:
+                if future.done():
+                    continue
+                if expired(deadline):
+                    future.set_exception(DeadlineExceeded("Request deadline passed while it was queued"))
+                    continue
+                groups.setdefault((tuple(data.shape[1:]), data.dtype), []).append((data, future, submitted))
+            for group in groups.values():
+                await self._execute(group)
+
+    async def _collect(self) -> List[Tuple[torch.Tensor, asyncio.Future, Optional[float], float]]:
+        loop = asyncio.get_running_loop()
+        first = self._queue.get_nowait()
+        batch = [first]
+        rows = len(first[0])
+        deadline = loop.time() + self.max_wait
+        while rows < self.max_batch_size:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    async def _execute(self, group: List[Tuple[torch.Tensor, asyncio.Future, float]]):
+        sizes = [len(data) for data, _, _ in group]
+        started = time.perf_counter()
+        try:
+            inputs = group[0][0] if len(group) == 1 else torch.cat([data for data, _, _ in group])
+            outputs = await self.run(inputs)
+        except Exception as e:
+            for _, future, _ in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if self.on_batch is not None:
+            self.on_batch(sum(sizes), [started - submitted for _, _, submitted in group], time.perf_counter() - started)
+        for (_, future, _), rows in zip(group, torch.split(outputs, sizes)):
+            # The client may have gone away while the batch was running.
+            if not future.done():
+                future.set_result(rows)
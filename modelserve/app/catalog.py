@@ -0,0 +1,161 @@
+import os
+import re
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# File of a model directory naming the version to serve
+CURRENT_VERSION_FILE = "CURRENT"
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def version_key(version: str) -> Tuple:
+    """Sort key comparing the numbers in version names numerically, so that 'v10' comes after 'v9'."""
+    return tuple((0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", version) if part)
+
+
+def _has_model_files(path: str) -> bool:
+    return os.path.exists(os.path.join(path, "model.pt")) and os.path.exists(os.path.join(path, "config.json"))
+
+
+def current_version(model_root: str) -> Optional[str]:
+    """
+    The version of a model to serve: the one named in its CURRENT file, or else the
+    highest version sub-directory holding a model.pt and a config.json. None for an
+    unversioned model, whose files sit directly in `model_root`. Hidden directories
+    are skipped, so a version can be staged under a dot-name and renamed into place.
+    """
+    try:
+        versions = [
+            entry.name for entry in os.scandir(model_root)
+            if entry.is_dir() and not entry.name.startswith(".") and _has_model_files(entry.path)
+        ]
+    except OSError:
+        return None
+    try:
+        with open(os.path.join(model_root, CURRENT_VERSION_FILE), "r") as f:
+            pinned = f.read().strip()
+        if pinned in versions:
+            return pinned
+        print(f"Warning: {CURRENT_VERSION_FILE} of '{model_root}' names the missing version '{pinned}', ignoring it.")
+    except OSError:
+        pass
+    return max(versions, key=version_key) if versions else None
+
+
+class ModelCatalog:
+    """
+    In-memory catalog of the models found in a model directory.
+
+    A model is a sub-directory holding a model.pt and a config.json, either
+    directly or in version sub-directories (<model>/<version>/model.pt), of
+    which the current one is served. `refresh` diffs the directory against the
+    catalog by modification times: the directory listing is only read again
+    when the model directory itself has changed (a model was added or removed),
+    the versions of a model only when its directory or CURRENT file has
+    changed, and a config.json is only parsed again when its modification time
+    has changed. Sub-directories that do not hold a model (yet) are looked at
+    again on every refresh, since a model's files can be copied into its
+    directory after the directory itself was created.
+    """
+
+    def __init__(self, model_dir: str):
+        self.model_dir = model_dir
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._dir_mtime: Optional[int] = None
+        # Sub-directories of the model directory that are not models
+        self._rejected: List[str] = []
+        self._lock = threading.Lock()
+
+    def __contains__(self, model_name: str) -> bool:
+        return model_name in self._models
+
+    def __getitem__(self, model_name: str) -> Dict[str, Any]:
+        return self._models[model_name]
+
+    def get(self, model_name: str) -> Optional[Dict[str, Any]]:
+        return self._models.get(model_name)
+
+    def names(self) -> List[str]:
+        return list(self._models)
+
+    def items(self):
+        return list(self._models.items())
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """Brings the catalog up to date and returns the names of the added, removed and updated models."""
+        with self._lock:
+            changes = {"added": [], "removed": [], "updated": []}
+            dir_mtime = _mtime_ns(self.model_dir)
+            if dir_mtime is None:
+                changes["removed"] = list(self._models)
+                self._models = {}
+                self._dir_mtime = None
+                self._rejected = []
+                return changes
+
+            if dir_mtime != self._dir_mtime:
+                names = [entry.name for entry in os.scandir(self.model_dir) if entry.is_dir()]
+                self._dir_mtime = dir_mtime
+            else:
+                names = list(self._models) + self._rejected
+
+            models = {}
+            for model_name in names:
+                entry = self._scan(model_name, self._models.get(model_name))
+                if entry is None:
+                    continue
+                models[model_name] = entry
+                previous = self._models.get(model_name)
+                if previous is None:
+                    changes["added"].append(model_name)
+                elif entry is not previous:
+                    changes["updated"].append(model_name)
+            changes["removed"] = [name for name in self._models if name not in models]
+            self._rejected = [name for name in names if name not in models]
+            self._models = models
+            return changes
+
+    def _scan(self, model_name: str, previous: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Returns the up to date entry of a model, `previous` itself if nothing changed, or None if it is gone."""
+        model_root = os.path.join(self.model_dir, model_name)
+        root_mtimes = (_mtime_ns(model_root), _mtime_ns(os.path.join(model_root, CURRENT_VERSION_FILE)))
+        if previous is not None and previous["root_mtimes"] == root_mtimes:
+            version = previous["version"]
+        else:
+            version = current_version(model_root)
+        version_dir = os.path.join(model_root, version) if version is not None else model_root
+
+        model_path = os.path.join(version_dir, "model.pt")
+        config_path = os.path.join(version_dir, "config.json")
+        model_mtime = _mtime_ns(model_path)
+        config_mtime = _mtime_ns(config_path)
+        if model_mtime is None or config_mtime is None:
+            return None
+        if previous is not None and (previous["version"], previous["model_mtime"], previous["config_mtime"]) == (version, model_mtime, config_mtime):
+            previous["root_mtimes"] = root_mtimes
+            return previous
+
+        entry = {
+            "version": version,
+            "root_mtimes": root_mtimes,
+            "model_path": model_path,
+            "config_path": config_path,
+            "model_mtime": model_mtime,
+            "config_mtime": config_mtime,
+            "config": None,
+            "config_error": None
+        }
+        try:
+            with open(config_path, 'r') as f:
+                entry["config"] = json.load(f)
+        except Exception as e:
+            entry["config_error"] = str(e)
+            print(f"Could not read config for {model_name}: {e}")
+        return entry
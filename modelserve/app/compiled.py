@@ -0,0 +1,67 @@
+import os
+import glob
+import importlib
+import torch
+import torch.nn as nn
+from typing import Callable, Optional
+
+# Serving the nn.Module itself; every other backend is a module of the 'backends' package
+EAGER_BACKEND = "eager"
+
+
+def input_size(model: nn.Module) -> Optional[int]:
+    """Number of input features of a model, read from its first linear layer."""
+    for module in model.modules():
+        if isinstance(module, nn.Linear):
+            return module.in_features
+    return None
+
+
+def get_backend(backend: str):
+    """Imports the execution backend module named `backend`."""
+    try:
+        return importlib.import_module(f"backends.{backend}")
+    except ImportError as e:
+        raise ValueError(f"Execution backend '{backend}' is not available: {e}")
+
+
+def artifact_path(model_path: str, weights_checksum: str, backend: str) -> str:
+    """
+    Path of the artifact of the weights in `model_path` for `backend`, stored next
+    to model.pt as model.<checksum>.<backend><extension>.
+    """
+    directory = os.path.dirname(model_path)
+    return os.path.join(directory, f"model.{weights_checksum[:16]}.{backend}{get_backend(backend).EXTENSION}")
+
+
+def load_compiled(path: str, backend: str) -> Callable[[torch.Tensor], torch.Tensor]:
+    """Loads an artifact written by `compile_model`."""
+    return get_backend(backend).load(path)
+
+
+def compile_model(model: nn.Module, backend: str, model_path: str, weights_checksum: str, example: torch.Tensor) -> str:
+    """
+    Returns the path of the artifact of a model for an execution backend, exporting it first if needed.
+
+    The artifact is keyed by the weights checksum, so it is reused across restarts
+    and worker processes until model.pt changes; artifacts of older weights are
+    removed when a new one is written. It is written under a temporary name and
+    renamed, so a concurrent loader never sees a partial file.
+    """
+    module = get_backend(backend)
+    path = artifact_path(model_path, weights_checksum, backend)
+    if os.path.exists(path):
+        return path
+
+    temporary = f"{path}.{os.getpid()}.tmp{module.EXTENSION}"
+    module.export(model, example, temporary)
+    os.replace(temporary, path)
+
+    pattern = os.path.join(os.path.dirname(model_path), f"model.*.{backend}{module.EXTENSION}")
+    for stale in glob.glob(pattern):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return path
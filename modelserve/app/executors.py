@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from admission import DeadlineExceeded, expired
+
+
+def model_threads(config: dict, workload: str, default: int) -> int:
+    """
+    Torch intra-op threads for a workload of a model, from the "threads" section of its config.
+    Only worker processes, which run one call at a time, can honour it: the thread count is process-wide.
+    """
+    return int(config.get("threads", {}).get(workload, default))
+
+
+class WorkloadExecutor:
+    """
+    Thread pool dedicated to one class of work, e.g. predictions or explanations,
+    so that one class cannot take every thread from the other.
+
+    The calls of all executors share torch's process-wide intra-op thread pool.
+    A call whose `deadline` has passed by the time it gets a thread is dropped
+    with DeadlineExceeded. The executor tracks how many calls are queued and
+    running and how long calls waited for a thread.
+    """
+
+    def __init__(self, name: str, max_workers: int, window: int = 1024):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-executor")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._expired = 0
+        # Wait times of the most recent calls, in seconds
+        self._waits: deque = deque(maxlen=window)
+
+    async def run(self, fn: Callable, *args, deadline: Optional[float] = None, **kwargs) -> Any:
+        submitted = time.perf_counter()
+
+        def call():
+            with self._lock:
+                self._queued -= 1
+                self._waits.append(time.perf_counter() - submitted)
+                if expired(deadline):
+                    self._expired += 1
+                    raise DeadlineExceeded("Request deadline passed while it was queued")
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        with self._lock:
+            self._queued += 1
+        future = self._executor.submit(call)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future):
+        # A call cancelled while still queued never reaches `call`
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            queued, running, completed, expired_calls = self._queued, self._running, self._completed, self._expired
+
+        def percentile(p: float) -> Optional[float]:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] * 1000 if waits else None
+
+        return {
+            "workers": self.max_workers,
+            "queued": queued,
+            "running": running,
+            "completed": completed,
+            "expired": expired_calls,
+            "wait_ms_mean": sum(waits) / len(waits) * 1000 if waits else None,
+            "wait_ms_p50": percentile(0.5),
+            "wait_ms_p99": percentile(0.99),
+            "wait_ms_max": waits[-1] * 1000 if waits else None
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
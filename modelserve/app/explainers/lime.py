@@ -1,12 +1,135 @@
-# Example LIME explainer
+# Model Explainer using LIME (Local Interpretable Model-agnostic Explanations)
+import math
 import torch
+import torch.nn as nn
+from typing import Optional, Tuple
 
-def explain(model: torch.nn.Module, data: torch.Tensor) -> dict:
+from explainers import shap
+
+
+def sample_masks(num_samples: int, num_features: int, seed: int) -> torch.Tensor:
     """
-    Generates a LIME explanation for the given model and data.
-    This is a dummy implementation.
+    Binary masks of the features kept in each perturbation sample, the first one
+    keeping every feature, drawn from a generator seeded with `seed`.
+    """
+    generator = torch.Generator().manual_seed(seed)
+    masks = torch.randint(0, 2, (num_samples, num_features), generator=generator).float()
+    masks[0] = 1.0
+    return masks
+
+
+def kernel_weights(masks: torch.Tensor, kernel_width: Optional[float] = None) -> torch.Tensor:
+    """Exponential kernel on the distance of each sample to the unperturbed row, as LIME weighs its samples."""
+    num_features = masks.shape[1]
+    if kernel_width is None:
+        kernel_width = 0.75 * math.sqrt(num_features)
+    distances = torch.sqrt((1.0 - masks).sum(dim=1))
+    return torch.exp(-distances ** 2 / kernel_width ** 2)
+
+
+def weighted_ridge(design: torch.Tensor, weights: torch.Tensor, targets: torch.Tensor, alpha: float) -> torch.Tensor:
     """
-    print("Generating LIME explanation...")
-    # In a real implementation, you would use the LIME library
-    # to generate explanations.
-    return {"lime_explanation": f"Explanation for data of shape {data.shape}"}
+    Solves the weighted ridge regressions of every column of `targets` on the same design at once.
+
+    Args:
+        design: (N_SAMPLES, N_FEATURES) inputs of the local models.
+        weights: (N_SAMPLES,) sample weights.
+        targets: (N_SAMPLES, N_TARGETS) outputs to fit, one regression per column.
+        alpha: L2 penalty of the coefficients; the intercept is not penalised.
+
+    Returns:
+        A tensor of shape (N_FEATURES + 1, N_TARGETS), the intercepts first.
+    """
+    design = torch.cat([torch.ones(len(design), 1, dtype=design.dtype), design], dim=1)
+    weighted = design * weights[:, None]
+    penalty = torch.full((design.shape[1],), alpha, dtype=design.dtype)
+    penalty[0] = 0.0
+    gram = design.T @ weighted + torch.diag(penalty)
+    return torch.linalg.solve(gram, weighted.T @ targets)
+
+
+def lime_attributions(model: nn.Module, data: torch.Tensor, baseline: torch.Tensor, num_samples: int = 256, seed: int = 0,
+                      kernel_width: Optional[float] = None, alpha: float = 1.0, internal_batch_size: Optional[int] = None) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    LIME coefficients of every output class for every row of `data`.
+
+    A perturbation sample replaces the features switched off by its mask with
+    the baseline. All rows share the same masks, so the samples of the whole
+    batch are built as one (N_SAMPLES_TOTAL, N_FEATURES) tensor and scored in a
+    single forward pass, and since the design and kernel weights are then the
+    same for every row, the local linear models of all rows and classes are
+    fitted by solving one weighted ridge system. Sharing the masks also makes
+    the explanation of a row independent of the other rows of the request.
+
+    Returns:
+        The coefficients, of shape (N_CLASSES, N_ROWS, N_FEATURES), and the
+        intercepts, of shape (N_CLASSES, N_ROWS).
+    """
+    num_rows, num_features = data.shape
+    masks = sample_masks(num_samples, num_features, seed).to(data.dtype)
+    weights = kernel_weights(masks, kernel_width).to(data.dtype)
+
+    # (N_ROWS, N_SAMPLES, N_FEATURES) -> one batch of N_ROWS * N_SAMPLES perturbed rows
+    perturbed = (masks[None] * data[:, None] + (1.0 - masks[None]) * baseline.reshape(1, 1, -1)).reshape(-1, num_features)
+    with torch.no_grad():
+        if internal_batch_size is None:
+            outputs = model(perturbed)
+        else:
+            outputs = torch.cat([model(chunk) for chunk in torch.split(perturbed, internal_batch_size)])
+    num_classes = outputs.shape[1]
+
+    # Targets of the regressions: one column per (row, class)
+    targets = outputs.reshape(num_rows, num_samples, num_classes).permute(1, 0, 2).reshape(num_samples, -1)
+    coefficients = weighted_ridge(masks, weights, targets, alpha).reshape(num_features + 1, num_rows, num_classes)
+    return coefficients[1:].permute(2, 1, 0), coefficients[0].T
+
+
+def prepare(data: torch.Tensor, background_samples: int = 10, **params) -> dict:
+    """Computes the request-level inputs of an explanation: the baseline, as for Integrated Gradients."""
+    return shap.prepare(data, background_samples)
+
+
+def explain(model: torch.nn.Module, data: torch.Tensor, background_samples: int = 10, num_samples: int = 256, seed: int = 0,
+            kernel_width: Optional[float] = None, alpha: float = 1.0, internal_batch_size: Optional[int] = None,
+            baseline: Optional[torch.Tensor] = None) -> dict:
+    """
+    Generates a LIME explanation for the given PyTorch model and data.
+
+    Around each row, LIME fits a linear model, weighted by proximity, to the
+    model outputs on perturbed copies of the row in which some features are
+    replaced by the baseline. The coefficients of that local model are the
+    attributions of the features.
+
+    Args:
+        model: The trained PyTorch model (nn.Module).
+        data: The torch.Tensor input data to be explained.
+        background_samples: The number of samples from 'data' to use to compute the baseline (average of these samples).
+        num_samples: The number of perturbation samples per row.
+        seed: Seed of the perturbation masks; the same seed gives the same explanation of a row.
+        kernel_width: Width of the proximity kernel, 0.75 * sqrt(N_FEATURES) by default.
+        alpha: Ridge penalty of the local linear models.
+        internal_batch_size: If set, at most this many perturbed rows go through the model at once.
+        baseline: The baseline input. When not given, it is computed by `prepare` from 'data'.
+
+    Returns:
+        A dictionary in the same format as the Integrated Gradients explainer.
+        - 'attributions': A list of numpy arrays, one for each model output class.
+        - 'baseline': The numpy array of the baseline input.
+    """
+    if baseline is None:
+        baseline = prepare(data, background_samples)["baseline"]
+
+    try:
+        model.eval()
+        attributions, _ = lime_attributions(
+            model, data.float(), baseline.float(),
+            num_samples=num_samples, seed=seed, kernel_width=kernel_width,
+            alpha=alpha, internal_batch_size=internal_batch_size
+        )
+        return {
+            "attributions": list(attributions.detach().cpu().numpy()),
+            "baseline": baseline.detach().cpu().numpy()
+        }
+
+    except Exception as e:
+        return {"error": str(e), "attributions": None, "baseline": None}
@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import torch
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def digest_tensor(tensor: torch.Tensor) -> bytes:
+    """Digest of the dtype, shape and contents of a tensor."""
+    array = tensor.detach().cpu().contiguous().numpy()
+    return hashlib.blake2b(f"{array.dtype}{array.shape}".encode() + array.tobytes(), digest_size=16).digest()
+
+
+def explanation_keys(model_name: str, weights_checksum: str, explainer_name: str, params: Dict[str, Any], context: Dict[str, Any], data: torch.Tensor) -> List[str]:
+    """
+    Cache keys of the explanations of each row of `data`.
+
+    A key covers everything an explanation depends on: the model and the exact
+    weights it was computed with, the explainer and its parameters, the
+    request-level context produced by the explainer's `prepare` (e.g. the
+    baseline), and the row itself.
+    """
+    prefix = hashlib.blake2b(digest_size=16)
+    prefix.update(json.dumps([model_name, weights_checksum, explainer_name, params], sort_keys=True, default=str).encode())
+    for name in sorted(context):
+        value = context[name]
+        prefix.update(name.encode())
+        prefix.update(digest_tensor(value) if isinstance(value, torch.Tensor) else json.dumps(value, default=str).encode())
+
+    keys = []
+    for row in data:
+        key = prefix.copy()
+        key.update(digest_tensor(row))
+        keys.append(key.hexdigest())
+    return keys
+
+
+class ExplanationCache:
+    """
+    Content-addressed cache of per-row explanations.
+
+    The in-memory tier is an LRU bounded to `max_bytes`. When `directory` is set,
+    entries are also written there as .npy files, which outlive restarts and are
+    promoted to memory when read; that tier is bounded to `max_disk_bytes`,
+    removing the least recently written files first.
+    """
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None, max_disk_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._disk_files: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        return [self.get(key) for key in keys]
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+            return value
+
+    def put_many(self, keys: List[str], values: List[np.ndarray]):
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._store(key, value)
+        if self.directory is not None:
+            for key, value in zip(keys, values):
+                self._write_disk(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk_files),
+                "disk_bytes": self._disk_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def _store(self, key: str, value: np.ndarray):
+        if value.nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+        self._entries[key] = value
+        self._bytes += value.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    # --- Disk tier ---
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.npy")
+
+    def _scan_disk(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".npy"):
+                    stat = os.stat(os.path.join(root, name))
+                    files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk_files[key] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        if self.directory is None:
+            return None
+        try:
+            return np.load(self._path(key), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: np.ndarray):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial file.
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                np.save(f, value, allow_pickle=False)
+            os.replace(temporary, path)
+        except OSError as e:
+            print(f"Warning: could not write explanation cache entry '{key}': {e}")
+            return
+        with self._lock:
+            self._disk_bytes -= self._disk_files.pop(key, 0)
+            self._disk_files[key] = os.path.getsize(path)
+            self._disk_bytes += self._disk_files[key]
+            while self.max_disk_bytes is not None and self._disk_bytes > self.max_disk_bytes and self._disk_files:
+                old_key, size = self._disk_files.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
@@ -0,0 +1,72 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring assigning keys (model names) to nodes (replicas).
+
+    Every node is placed on the ring at `virtual_nodes` points. A key belongs to
+    the first `replication` distinct nodes found walking clockwise from its own
+    point, so when a node joins or leaves, only the keys next to its points
+    move, and they move to or from that node only.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = 128):
+        self.virtual_nodes = virtual_nodes
+        self._nodes: List[str] = []
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for i in range(self.virtual_nodes):
+            point = _point(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def owners(self, key: str, replication: int = 1) -> List[str]:
+        """The nodes holding `key`, its primary first."""
+        replication = min(replication, len(self._nodes))
+        owners: List[str] = []
+        if replication <= 0:
+            return owners
+        index = bisect.bisect(self._points, _point(key))
+        for offset in range(len(self._points)):
+            node = self._owners[(index + offset) % len(self._points)]
+            if node not in owners:
+                owners.append(node)
+                if len(owners) == replication:
+                    break
+        return owners
+
+    def assignments(self, keys: Iterable[str], replication: int = 1) -> Dict[str, List[str]]:
+        return {key: self.owners(key, replication) for key in keys}
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import numpy as np
+import torch
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from tensor_io import encode_npz
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+
+class ExplanationJob:
+    """
+    An explanation computed in the background, chunk by chunk.
+
+    The attributions of the chunks done so far are kept in memory, stacked as
+    (classes, rows, features), until the whole result is written to disk.
+    """
+
+    def __init__(self, job_id: str, model_name: str, explainer_name: str, rows_total: int, chunk_rows: int):
+        self.job_id = job_id
+        self.model_name = model_name
+        self.explainer_name = explainer_name
+        self.rows_total = rows_total
+        self.chunk_rows = chunk_rows
+        self.rows_done = 0
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks: List[np.ndarray] = []
+        self.baseline: Optional[np.ndarray] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "model": self.model_name,
+            "explainer": self.explainer_name,
+            "status": self.status,
+            "rows_total": self.rows_total,
+            "rows_done": self.rows_done,
+            "progress": self.rows_done / self.rows_total if self.rows_total else 1.0,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+    def partial_result(self) -> Optional[Dict[str, np.ndarray]]:
+        """The attributions of the rows done so far, or None if no chunk is done yet."""
+        if not self.chunks:
+            return None
+        return {"attributions": np.concatenate(self.chunks, axis=1), "baseline": self.baseline}
+
+    @classmethod
+    def from_info(cls, info: Dict[str, Any]) -> "ExplanationJob":
+        job = cls(info["job_id"], info["model"], info["explainer"], info["rows_total"], 0)
+        job.rows_done = info["rows_done"]
+        job.status = info["status"]
+        job.error = info["error"]
+        job.created_at = info["created_at"]
+        job.started_at = info["started_at"]
+        job.finished_at = info["finished_at"]
+        return job
+
+
+class JobStore:
+    """
+    Runs explanation jobs in the background and keeps their results.
+
+    At most `max_running` jobs run at a time; the others wait in submission
+    order. A finished job's result is written to `directory` as
+    <job_id>/result.npz along with its status in <job_id>/job.json, so results
+    can still be fetched after a restart. Finished jobs are removed once they
+    are older than `ttl_seconds`.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float, max_running: int = 1):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_running = max_running
+        self._jobs: Dict[str, ExplanationJob] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def submit(self, model_name: str, explainer_name: str, data: torch.Tensor, chunk_rows: int,
+               explain_chunk: Callable[[torch.Tensor], Awaitable[dict]]) -> ExplanationJob:
+        """Starts a job explaining `data` with `explain_chunk`, called on successive chunks of `chunk_rows` rows."""
+        self.prune()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_running)
+        job = ExplanationJob(uuid.uuid4().hex, model_name, explainer_name, len(data), chunk_rows)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, data, explain_chunk))
+        return job
+
+    def get(self, job_id: str) -> Optional[ExplanationJob]:
+        job = self._jobs.get(job_id)
+        if job is None and os.path.basename(job_id) == job_id:
+            try:
+                with open(os.path.join(self.directory, job_id, "job.json"), "r") as f:
+                    job = self._jobs[job_id] = ExplanationJob.from_info(json.load(f))
+            except (OSError, ValueError, KeyError):
+                return None
+        return job
+
+    def result_path(self, job: ExplanationJob) -> str:
+        return os.path.join(self.directory, job.job_id, "result.npz")
+
+    def cancel(self, job_id: str) -> Optional[ExplanationJob]:
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.task.cancel()
+            self._finish(job, "cancelled")
+        return job
+
+    def delete(self, job_id: str):
+        job = self.cancel(job_id)
+        if job is not None:
+            self._jobs.pop(job_id, None)
+            shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+
+    def prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.ttl_seconds:
+                self.delete(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        counts = {state: 0 for state in JOB_STATES}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    async def _run(self, job: ExplanationJob, data: torch.Tensor, explain_chunk: Callable[[torch.Tensor], Awaitable[dict]]):
+        async with self._slots:
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                for start in range(0, len(data), job.chunk_rows):
+                    chunk = data[start:start + job.chunk_rows]
+                    explanation = await explain_chunk(chunk)
+                    if explanation.get("attributions") is None:
+                        raise RuntimeError(explanation.get("error", "explainer returned no attributions"))
+                    job.chunks.append(np.stack(explanation["attributions"]))
+                    baseline = explanation.get("baseline")
+                    job.baseline = baseline.detach().cpu().numpy() if isinstance(baseline, torch.Tensor) else baseline
+                    job.rows_done += len(chunk)
+                await asyncio.to_thread(self._write_result, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.error = str(e)
+                # The chunks done before the failure are kept as a partial result
+                if job.chunks:
+                    try:
+                        await asyncio.to_thread(self._write_result, job)
+                    except OSError as write_error:
+                        print(f"Warning: could not write the partial result of job '{job.job_id}': {write_error}")
+                self._finish(job, "failed")
+                return
+            self._finish(job, "done")
+
+    def _write_result(self, job: ExplanationJob):
+        path = self.result_path(job)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(encode_npz(job.partial_result() or {}))
+        os.replace(temporary, path)
+
+    def _finish(self, job: ExplanationJob, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        # The result now lives on disk, if anywhere
+        job.chunks = []
+        try:
+            os.makedirs(os.path.join(self.directory, job.job_id), exist_ok=True)
+            with open(os.path.join(self.directory, job.job_id, "job.json"), "w") as f:
+                json.dump(job.info(), f)
+        except OSError as e:
+            print(f"Warning: could not record the status of job '{job.job_id}': {e}")
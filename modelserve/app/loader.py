@@ -0,0 +1,124 @@
+import os
+import hashlib
+import importlib
+import threading
+import torch
+import torch.nn as nn
+from typing import Dict, Optional, Tuple
+
+DEFAULT_ARCHITECTURE = "mlp"
+
+# Checksums by file path, with the size and modification time of the file they were computed for
+_checksums: Dict[str, Tuple[int, int, str]] = {}
+_checksums_lock = threading.Lock()
+
+
+def load_weights(path: str) -> Dict[str, torch.Tensor]:
+    """
+    Loads a state dict through a memory mapping of the weights file.
+
+    The returned tensors are views on the mapped file, so nothing is copied into
+    process memory until a page is actually touched, and the pages are shared
+    through the page cache with every other process mapping the same file.
+    Files saved in the legacy (non-zip) format cannot be mapped and are read eagerly.
+    """
+    try:
+        return torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    except RuntimeError as e:
+        print(f"Warning: could not memory-map '{path}' ({e}), loading it eagerly.")
+        return torch.load(path, map_location="cpu", weights_only=True)
+
+
+def build_model(config: dict, state_dict: Dict[str, torch.Tensor]) -> nn.Module:
+    """
+    Builds the network described by the "architecture" section of a model config
+    and binds it to `state_dict`.
+
+    The module is constructed on the meta device so no memory is spent on a
+    random initialisation, then the loaded tensors are assigned as its parameters.
+    """
+    spec = config.get("architecture", {})
+    architecture = importlib.import_module(f"architectures.{spec.get('type', DEFAULT_ARCHITECTURE)}")
+    with torch.device("meta"):
+        model = architecture.build(spec, state_dict)
+    model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    return model
+
+
+class Explainer:
+    """
+    An explainer module bound to the parameters given for it in a model config.
+
+    Modules expose `explain(model, data, **params)` and may also expose
+    `prepare(data, **params)`, returning the request-level inputs of an
+    explanation (e.g. a baseline derived from the request) as keyword
+    arguments for `explain`. Without `prepare`, the explanation of a row is
+    assumed to depend on that row only.
+    """
+
+    def __init__(self, name: str, module, params: Optional[dict] = None):
+        self.name = name
+        self.params = dict(params or {})
+        self._explain = module.explain
+        self._prepare = getattr(module, "prepare", None)
+
+    def __call__(self, model: nn.Module, data: torch.Tensor, **kwargs) -> dict:
+        return self._explain(model, data, **self.params, **kwargs)
+
+    def prepare(self, data: torch.Tensor) -> dict:
+        return self._prepare(data, **self.params) if self._prepare is not None else {}
+
+
+def load_explainers(model_name: str, config: dict) -> Dict[str, Explainer]:
+    """
+    Imports the explainers listed in a model config and returns them by name.
+    When "explainers" maps names to parameter dicts, the parameters are bound to the explainer.
+    """
+    explainers = {}
+    explainers_config = config.get("explainers", {})
+    for explainer_name in explainers_config:
+        params = explainers_config[explainer_name] if isinstance(explainers_config, dict) else None
+        try:
+            explainer_module = importlib.import_module(f"explainers.{explainer_name}")
+            if hasattr(explainer_module, 'explain'):
+                explainers[explainer_name] = Explainer(explainer_name, explainer_module, params)
+        except ImportError:
+            print(f"Warning: could not import explainer '{explainer_name}' for model '{model_name}'.")
+    return explainers
+
+
+def file_checksum(path: str, chunk_bytes: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file, read in chunks. The file is only read again once its size
+    or modification time has changed, so reloading or swapping a model does not
+    read all of its weights just to identify them.
+    """
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _checksums_lock:
+        cached = _checksums.get(path)
+    if cached is not None and cached[:2] == key:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_bytes):
+            digest.update(chunk)
+    with _checksums_lock:
+        _checksums[path] = (*key, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def model_nbytes(model: nn.Module) -> int:
+    """Size in bytes of the parameters and buffers of a model."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of the current process, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
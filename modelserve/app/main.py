@@ -1,28 +1,196 @@
 import os
 import sys
 import json
-import importlib
+import copy
+import hashlib
+import functools
+import numpy as np
 import torch
 import torch.nn as nn
 import time
-import threading
 import asyncio
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Any, Dict
+import tempfile
+import contextlib
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, JSONResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from typing import List, Any, Callable, Dict, Optional, Tuple
 
 # Add the app directory to the python path to allow for absolute imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from batching import MicroBatcher
+from loader import Explainer, load_weights, build_model, load_explainers, file_checksum, model_nbytes, process_rss_bytes
+from model_cache import ModelCache, tensors_nbytes
+from singleflight import SingleFlight
+from catalog import ModelCatalog
+from compiled import EAGER_BACKEND, compile_model, load_compiled, input_size
+from quantize import quantize_checked, quantized_checksum
+from worker_pool import WorkerPool
+from executors import WorkloadExecutor
+from admission import PRIORITIES, AdmissionController, AdmissionRejected, DeadlineExceeded, expired
+from tensor_io import NPY_MEDIA_TYPE, NPZ_MEDIA_TYPE, as_model_input, decode_npy, encode_npy, encode_npz
+from explanation_cache import ExplanationCache, explanation_keys
+from prediction_cache import PredictionCache, prediction_key
+from jobs import JobStore
+from baselines import load_explainer_state
+from preprocessing import Preprocessor, load_preprocessor, preprocessing_path, with_preprocessing
+from metrics import BATCH_SIZE_BUCKETS, PROMETHEUS_MEDIA_TYPE, MetricsRegistry, setup_tracing
+from streaming import (
+    NDJSON_MEDIA_TYPE, FORMATS, FILE_FORMATS, BodyStreamingResponse,
+    iter_file, iter_fileobj, iter_line_chunks, parse_rows, read_rows, score_stream, spool_stream
+)
+
 # --- Configuration ---
-# Models are in a directory named 'models' at the project root.
-MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'models'))
-UNLOAD_TIMEOUT = 60 * 10
+# Models are in a directory named 'models' at the project root, unless MODEL_DIR is set.
+MODEL_DIR = os.path.abspath(os.getenv("MODEL_DIR", os.path.join(os.path.dirname(__file__), '..', '..', 'models')))
+# Loaded models are kept in memory up to MODEL_CACHE_BYTES, evicting by MODEL_CACHE_POLICY
+# ('lru' or 'lfu'). Models listed in PINNED_MODELS, or with "pinned": true in their
+# config.json, are never evicted.
+MODEL_CACHE_BYTES = int(os.getenv("MODEL_CACHE_BYTES", 2 * 1024 ** 3))
+MODEL_CACHE_POLICY = os.getenv("MODEL_CACHE_POLICY", "lru")
+PINNED_MODELS = [name.strip() for name in os.getenv("PINNED_MODELS", "").split(",") if name.strip()]
+# Pinned models, models listed in PRELOAD_MODELS and models with "preload": true in their
+# config.json are loaded, warmed up and pinned in the background at startup, PRELOAD_CONCURRENCY
+# at a time. /ready answers 503 until each of them is loaded or has failed to load, so traffic
+# only reaches a replica once its preloaded models are warm; a model that fails to load is
+# reported but does not keep the replica out of rotation.
+PRELOAD_MODELS = [name.strip() for name in os.getenv("PRELOAD_MODELS", "").split(",") if name.strip()]
+PRELOAD_CONCURRENCY = int(os.getenv("PRELOAD_CONCURRENCY", 4))
+# A model that failed to load is not retried for LOAD_FAILURE_TTL seconds.
+LOAD_FAILURE_TTL = float(os.getenv("LOAD_FAILURE_TTL", 30))
+# Concurrent /predict requests for the same model are merged into one forward pass
+# of at most BATCH_MAX_SIZE rows, waiting at most BATCH_MAX_WAIT_MS for the batch to fill.
+# Both can be overridden per model with a "batching" section in its config.json.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 32))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 5))
+# With WORKER_PROCESSES > 0, predict and explain run in that many worker processes
+# using WORKER_THREADS torch threads each, instead of in the server process.
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 0))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", max(1, (os.cpu_count() or 1) // max(1, WORKER_PROCESSES))))
+# Number of models each worker process keeps loaded.
+WORKER_MODEL_SLOTS = int(os.getenv("WORKER_MODEL_SLOTS", 8))
+# A model is spread to another worker once all workers holding it have this many queued calls.
+WORKER_SPILL_DEPTH = int(os.getenv("WORKER_SPILL_DEPTH", 4))
+
+# Predictions and explanations run on separate thread pools of PREDICT_EXECUTOR_WORKERS and
+# EXPLAIN_EXECUTOR_WORKERS threads, so a long explanation never holds up predictions.
+# Torch's intra-op and inter-op thread pools are process-wide and shared by both; they are
+# sized once at startup by TORCH_THREADS and TORCH_INTEROP_THREADS when set. Per-workload
+# budgets, and the per-model "threads" section ({"predict": n, "explain": n}) of a
+# config.json, only apply to worker processes (WORKER_PROCESSES), which run one call at a time.
+PREDICT_EXECUTOR_WORKERS = int(os.getenv("PREDICT_EXECUTOR_WORKERS", 2))
+EXPLAIN_EXECUTOR_WORKERS = int(os.getenv("EXPLAIN_EXECUTOR_WORKERS", 1))
+TORCH_THREADS = os.getenv("TORCH_THREADS")
+TORCH_INTEROP_THREADS = os.getenv("TORCH_INTEROP_THREADS")
+
+# Each model runs at most ADMISSION_MAX_CONCURRENCY /predict requests at once and queues up
+# to ADMISSION_MAX_QUEUE more (EXPLAIN_MAX_CONCURRENCY and EXPLAIN_MAX_QUEUE for /explain);
+# further requests are rejected with 429. Both can be overridden per model with an
+# "admission" section ({"predict": {"max_concurrency": n, "max_queue": n}, "explain": ...})
+# in its config.json. Requests sent with "X-Priority: batch" are queued after interactive
+# ones and may only fill BATCH_QUEUE_SHARE of a queue. Across all models at most
+# MAX_IN_FLIGHT_REQUESTS requests run or wait; beyond that requests are rejected with 503.
+# A request with an X-Request-Timeout-Ms header is dropped with 504 instead of being run
+# once that many milliseconds have passed.
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", 64))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 256))
+EXPLAIN_MAX_CONCURRENCY = int(os.getenv("EXPLAIN_MAX_CONCURRENCY", 4))
+EXPLAIN_MAX_QUEUE = int(os.getenv("EXPLAIN_MAX_QUEUE", 32))
+BATCH_QUEUE_SHARE = float(os.getenv("BATCH_QUEUE_SHARE", 0.5))
+MAX_IN_FLIGHT_REQUESTS = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", 1024))
+
+# Concurrent /predict requests with the same input for the same model share one forward
+# pass. With PREDICT_CACHE_TTL_MS > 0, predictions are also kept in memory for that long, up
+# to PREDICT_CACHE_BYTES, and repeated inputs are answered without running the model.
+PREDICT_CACHE_TTL_MS = float(os.getenv("PREDICT_CACHE_TTL_MS", 0))
+PREDICT_CACHE_BYTES = int(os.getenv("PREDICT_CACHE_BYTES", 16 * 1024 ** 2))
+
+# /predict/{model_name}/stream scores its input in chunks of STREAM_CHUNK_ROWS rows.
+# A request body is read in full before the predictions are sent, kept in memory up to
+# STREAM_SPOOL_MEMORY_BYTES and in a temporary file beyond.
+# Datasets referenced by URI are only read from under DATA_DIR, where the backend stores them.
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", 4096))
+STREAM_SPOOL_MEMORY_BYTES = int(os.getenv("STREAM_SPOOL_MEMORY_BYTES", 16 * 1024 ** 2))
+DATA_DIR = os.path.abspath(os.getenv("DATA_DIR", "/data"))
+
+# Per-row explanations are cached in memory up to EXPLAIN_CACHE_BYTES (0 disables the cache)
+# and, if EXPLAIN_CACHE_DIR is set, on disk up to EXPLAIN_CACHE_DISK_BYTES.
+EXPLAIN_CACHE_BYTES = int(os.getenv("EXPLAIN_CACHE_BYTES", 64 * 1024 ** 2))
+EXPLAIN_CACHE_DIR = os.getenv("EXPLAIN_CACHE_DIR")
+EXPLAIN_CACHE_DISK_BYTES = int(os.getenv("EXPLAIN_CACHE_DISK_BYTES", 1024 ** 3))
+
+# Explanations of more than EXPLAIN_ASYNC_ROWS rows, or requested with "Prefer: respond-async",
+# run as background jobs in chunks of EXPLAIN_JOB_CHUNK_ROWS rows and /explain answers 202 with
+# the job. At most EXPLAIN_JOB_CONCURRENCY jobs run at a time; their results are kept in
+# EXPLAIN_JOB_DIR for EXPLAIN_JOB_TTL seconds.
+EXPLAIN_ASYNC_ROWS = int(os.getenv("EXPLAIN_ASYNC_ROWS", 1024))
+EXPLAIN_JOB_CHUNK_ROWS = int(os.getenv("EXPLAIN_JOB_CHUNK_ROWS", 256))
+EXPLAIN_JOB_CONCURRENCY = int(os.getenv("EXPLAIN_JOB_CONCURRENCY", 1))
+EXPLAIN_JOB_DIR = os.getenv("EXPLAIN_JOB_DIR", os.path.join(tempfile.gettempdir(), "modelserve-jobs"))
+EXPLAIN_JOB_TTL = float(os.getenv("EXPLAIN_JOB_TTL", 24 * 3600))
+
+# The model catalog is refreshed in the background every CATALOG_REFRESH_SECONDS.
+# A model directory may hold versions in sub-directories (<model>/<version>/model.pt), of
+# which the one named in its CURRENT file, or else the highest, is served. When the served
+# files of a loaded model change, the new version is loaded and warmed up in the background
+# while the old one keeps serving, then swapped in at once; requests already running on the
+# old version finish on it before it is released.
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", 5))
+
+# Predictions are run by the MODEL_COMPILE_BACKEND execution backend: 'eager' (the
+# nn.Module itself), 'torchscript', 'aot_inductor' or 'onnxruntime'. Non-eager backends
+# export the model once and cache the artifact next to model.pt. Before a model
+# is reported as loaded, MODEL_WARMUP_BATCHES batches of random inputs are run through it.
+# Both can be overridden per model with a "compile" section in its config.json.
+MODEL_COMPILE_BACKEND = os.getenv("MODEL_COMPILE_BACKEND", EAGER_BACKEND)
+MODEL_WARMUP_BATCHES = int(os.getenv("MODEL_WARMUP_BATCHES", 3))
+
+# /metrics exposes request phase latencies, batch sizes, model load times and cache, queue and
+# in-flight counters in the Prometheus text format. If OTEL_EXPORTER_OTLP_ENDPOINT is set (e.g.
+# http://otel-collector:4318), the phases of each request are also exported as OTLP spans of
+# service OTEL_SERVICE_NAME, which needs the opentelemetry-sdk and opentelemetry-exporter-otlp packages.
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "modelserve")
 
 # --- Global State ---
 app = FastAPI(title="Anemone Model Forge - Model Server")
-available_models: Dict[str, Dict[str, str]] = {}
-loaded_models: Dict[str, Dict[str, Any]] = {}
+catalog = ModelCatalog(MODEL_DIR)
+catalog_refreshes = SingleFlight()
+background_tasks: List[asyncio.Task] = []
+loaded_models = ModelCache(MODEL_CACHE_BYTES, policy=MODEL_CACHE_POLICY, pinned=PINNED_MODELS)
+model_loads = SingleFlight()
+model_swaps = SingleFlight()
+# Replaced model versions that still have requests in flight
+draining_models: List[Dict[str, Any]] = []
+load_failures: Dict[str, Tuple[float, str]] = {}
+# Startup preload state of each preloaded model: pending, loading, ready or failed
+preload_status: Dict[str, str] = {}
+worker_pool: Optional[WorkerPool] = None
+predict_executor: Optional[WorkloadExecutor] = None
+explain_executor: Optional[WorkloadExecutor] = None
+admission = AdmissionController(MAX_IN_FLIGHT_REQUESTS, low_priority_share=BATCH_QUEUE_SHARE)
+explanation_jobs = JobStore(EXPLAIN_JOB_DIR, EXPLAIN_JOB_TTL, max_running=EXPLAIN_JOB_CONCURRENCY)
+prediction_flights = SingleFlight()
+prediction_cache: Optional[PredictionCache] = (
+    PredictionCache(PREDICT_CACHE_BYTES, PREDICT_CACHE_TTL_MS / 1000) if PREDICT_CACHE_TTL_MS > 0 else None
+)
+# Requests answered by joining the forward pass of an identical concurrent request
+coalesced_predictions = {"count": 0}
+metrics = MetricsRegistry()
+phase_seconds = metrics.histogram(
+    "modelserve_request_phase_seconds",
+    "Time spent by requests in each phase: decode, admission, queue, inference and encode.",
+    ("model", "endpoint", "phase")
+)
+batch_rows = metrics.histogram("modelserve_batch_rows", "Rows per forward pass of the micro-batcher.", ("model",), BATCH_SIZE_BUCKETS)
+model_load_seconds = metrics.histogram("modelserve_model_load_seconds", "Time to load, compile and warm up a model.", ("model", "stage"))
+tracer = None
+explanation_cache: Optional[ExplanationCache] = (
+    ExplanationCache(EXPLAIN_CACHE_BYTES, directory=EXPLAIN_CACHE_DIR, max_disk_bytes=EXPLAIN_CACHE_DISK_BYTES)
+    if EXPLAIN_CACHE_BYTES > 0 else None
+)
 
 # --- Pydantic Models ---
 class PredictRequest(BaseModel):
@@ -34,186 +202,1023 @@ class ExplainRequest(BaseModel):
 
 # --- Core Logic ---
 
-def discover_models():
-    """Scans the model directory for models and updates the available_models mapping."""
-    global available_models
-    if not os.path.exists(MODEL_DIR):
-        print(f"Model directory '{MODEL_DIR}' not found.")
-        return
+def make_forward(model: nn.Module):
+    """Wraps a model into a gradient-free forward function suitable for batched inference."""
+    def forward(data: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return model(data)
+    return forward
 
-    discovered = {}
-    for model_name in os.listdir(MODEL_DIR):
-        model_path = os.path.join(MODEL_DIR, model_name)
-        if not os.path.isdir(model_path):
-            continue
 
-        pytorch_model_path = os.path.join(model_path, "model.pt")
-        config_path = os.path.join(model_path, "config.json")
+def scan_catalog() -> Dict[str, List[str]]:
+    """Rescans the model directory into the catalog. Touches nothing else, so it can run off the event loop."""
+    if not os.path.exists(catalog.model_dir):
+        print(f"Model directory '{catalog.model_dir}' not found.")
 
-        if os.path.exists(pytorch_model_path) and os.path.exists(config_path):
-            discovered[model_name] = {
-                "model_path": pytorch_model_path,
-                "config_path": config_path
-            }
-    available_models = discovered
-    print(f"Discovered models: {list(available_models.keys())}")
+    changes = catalog.refresh()
+    if any(changes.values()):
+        print(f"Model catalog changes: {changes}")
+    return changes
 
 
-def get_model(model_name: str):
+def apply_catalog_changes(changes: Dict[str, List[str]]):
     """
-    Gets a model from the loaded_models cache or loads it from disk.
+    Drops the serving state of models whose files disappeared and the load failures
+    of models whose files changed. Runs on the event loop, like every other user of that state.
+    Loaded models whose files changed keep serving until `refresh_catalog` has
+    swapped in their new version.
     """
-    if model_name in loaded_models:
-        loaded_models[model_name]["last_access"] = time.time()
-        return loaded_models[model_name]
+    for model_name in changes["updated"] + changes["removed"]:
+        load_failures.pop(model_name, None)
+    for model_name in changes["removed"]:
+        loaded_models.remove(model_name)
+        admission.forget(model_name)
+        if worker_pool is not None:
+            worker_pool.forget(model_name)
 
-    if model_name not in available_models:
-        raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found.")
 
-    model_info = available_models[model_name]
-    
+def discover_models() -> Dict[str, List[str]]:
+    """Refreshes the model catalog from the model directory, from the event loop thread."""
+    changes = scan_catalog()
+    apply_catalog_changes(changes)
+    return changes
+
+
+async def refresh_catalog() -> Dict[str, List[str]]:
+    """Rescans the model catalog off the event loop and starts swapping in the new version of updated loaded models."""
+    changes = await asyncio.to_thread(scan_catalog)
+    apply_catalog_changes(changes)
+    for model_name in changes["updated"]:
+        if model_name in loaded_models:
+            start_swap(model_name)
+    return changes
+
+
+async def watch_models():
+    """Keeps the model catalog up to date in the background."""
+    while True:
+        await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+        try:
+            await refresh_catalog()
+        except Exception as e:
+            print(f"Could not refresh the model catalog: {e}")
+
+
+def load_model(model_name: str, model_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Loads a model, its config and its explainers from disk.
+    This is blocking and is meant to run off the event loop.
+    """
+    started = time.perf_counter()
+    rss_before = process_rss_bytes()
+
+    # The config has already been parsed by the catalog
+    if model_info["config"] is None:
+        raise ValueError(f"Invalid config.json: {model_info['config_error']}")
+    config = copy.deepcopy(model_info["config"])
+
+    # Build the model from its config and memory-mapped weights
+    state_dict = load_weights(model_info["model_path"])
+    model = build_model(config, state_dict)
+    # Raw input columns are encoded in front of the network if the model has a fitted preprocessing
+    preprocessor = load_preprocessor(model_info["model_path"], config)
+    load_time_ms = (time.perf_counter() - started) * 1000
+    rss_after = process_rss_bytes()
+    # Identifies the exact weights in explanation cache keys
+    weights_checksum = file_checksum(model_info["model_path"])
+
+    explainers = load_explainers(model_name, config)
+    # The baseline shared by all explainers, precomputed from the training data if the model has a background set
     try:
+        explainer_state = load_explainer_state(model_info["model_path"], config)
+    except ValueError as e:
+        print(f"Warning: ignoring the background set of model '{model_name}': {e}")
+        explainer_state = {}
+
+    batching = config.get("batching", {})
+    max_batch_size = batching.get("max_batch_size", BATCH_MAX_SIZE)
+
+    # Predictions can go through an int8 copy of the network, which is only enabled
+    # if it agrees with the fp32 model on the stored calibration sample.
+    serving_model, serving_checksum, quantization = model, weights_checksum, None
+    if "quantization" in config:
+        try:
+            quantized, quantization = quantize_checked(model, config["quantization"], model_info["model_path"])
+        except Exception as e:
+            quantized, quantization = None, {"mode": config["quantization"].get("mode"), "enabled": False, "reason": str(e)}
+        if quantized is not None:
+            serving_model = quantized
+            serving_checksum = quantized_checksum(weights_checksum, config["quantization"], model_info["model_path"])
+        else:
+            print(f"Warning: not serving model '{model_name}' quantized: {quantization['reason']}.")
+
+    # Predictions go through the backend artifact if there is one; explainers need
+    # gradients and keep using the eager fp32 model.
+    compile_config = config.get("compile", {})
+    backend = compile_config.get("backend", MODEL_COMPILE_BACKEND)
+    n_features = compile_config.get("input_size", input_size(model))
+    compiled, compiled_path, compile_time_ms = None, None, None
+    if backend != EAGER_BACKEND and n_features is not None:
+        compile_started = time.perf_counter()
+        try:
+            example = torch.randn(max_batch_size, n_features)
+            compiled_path = compile_model(serving_model, backend, model_info["model_path"], serving_checksum, example)
+            compiled = load_compiled(compiled_path, backend)
+            compile_time_ms = (time.perf_counter() - compile_started) * 1000
+        except Exception as e:
+            compiled_path = None
+            print(f"Warning: could not compile model '{model_name}' with '{backend}' ({e}), serving it eagerly.")
+    if compiled_path is None:
+        backend = EAGER_BACKEND
+    if preprocessor is not None:
+        # Predictions also depend on the fitted preprocessing
+        preprocessing_checksum = file_checksum(preprocessing_path(model_info["model_path"], config))
+        serving_checksum = hashlib.sha256(f"{serving_checksum}:{preprocessing_checksum}".encode()).hexdigest()
+
+    # In worker pool mode the forward passes run in the worker processes, which map
+    # the same weights file, and this process only keeps the model for bookkeeping.
+    if worker_pool is not None:
+        worker_info = dict(
+            model_info,
+            compiled_path=compiled_path,
+            compile_backend=backend,
+            quantization=config["quantization"] if serving_model is not model else None
+        )
+        forward = functools.partial(worker_pool.predict, model_name, worker_info)
+    else:
+        forward = make_forward(with_preprocessing(preprocessor, compiled if compiled is not None else serving_model))
+        if predict_executor is not None:
+            forward = functools.partial(predict_executor.run, forward)
+
+    def on_batch(rows: int, waits: List[float], forward_seconds: float):
+        batch_rows.observe(rows, model_name)
+        for wait in waits:
+            phase_seconds.observe(wait, model_name, "predict", "queue")
+            phase_seconds.observe(forward_seconds, model_name, "predict", "inference")
+
+    batcher = MicroBatcher(
+        forward,
+        max_batch_size=max_batch_size,
+        max_wait_ms=batching.get("max_wait_ms", BATCH_MAX_WAIT_MS),
+        on_batch=on_batch
+    )
+
+    # Packed int8 weights are not parameters, so a quantized copy is sized by its state dict.
+    # The fp32 model is only kept, and counted, when explainers need it.
+    if serving_model is model:
+        memory_bytes = model_nbytes(model)
+    else:
+        memory_bytes = tensors_nbytes(serving_model.state_dict())
+        if explainers:
+            memory_bytes += model_nbytes(model)
+        else:
+            model = serving_model
 
-        # DEMO
-        class SimpleClassifier(nn.Module):
-            def __init__(self, input_size, num_classes):
-                super().__init__()
-                self.layer_stack = nn.Sequential(
-                    nn.Linear(input_size, 32),
-                    nn.ReLU(),
-                    nn.Linear(32, 16),
-                    nn.ReLU(),
-                    nn.Linear(16, num_classes)
-                )
-
-            def forward(self, x):
-                return self.layer_stack(x)
-
-        # 2. Create Dummy Data
-        N_SAMPLES = 100
-        N_FEATURES = 5
-        N_CLASSES = 3
-
-        model = SimpleClassifier(N_FEATURES, N_CLASSES)
-
-        # Load model
-        state_dict = torch.load(model_info["model_path"])
-        model.load_state_dict(state_dict)
-        model.eval()
-
-        # Load config
-        with open(model_info["config_path"], 'r') as f:
-            config = json.load(f)
-
-        # Load explainers
-        explainers = {}
-        if "explainers" in config:
-            for explainer_name in config["explainers"]:
-                try:
-                    explainer_module = importlib.import_module(f"explainers.{explainer_name}")
-                    if hasattr(explainer_module, 'explain'):
-                        explainers[explainer_name] = explainer_module.explain
-                except ImportError:
-                    print(f"Warning: could not import explainer '{explainer_name}' for model '{model_name}'.")
-
-        loaded_models[model_name] = {
-            "model": model,
-            "config": config,
-            "explainers": explainers,
-            "last_access": time.time()
-        }
-        print(f"Loaded model '{model_name}'.")
-        return loaded_models[model_name]
+    return {
+        "name": model_name,
+        # The catalog entry of the version this is, which requests use throughout
+        "model_info": model_info,
+        "model": model,
+        "config": config,
+        "explainers": explainers,
+        # Tensors kept alive by explainers between calls, accounted in the model size
+        "explainer_state": explainer_state,
+        "batcher": batcher,
+        "weights_checksum": weights_checksum,
+        # Identifies the weights predictions are computed with, e.g. the quantized ones
+        "serving_checksum": serving_checksum,
+        "preprocessor": preprocessor,
+        # Width of the inputs taken by the serving path: raw columns when they are preprocessed
+        "input_size": preprocessor.n_columns if preprocessor is not None else n_features,
+        "backend": backend,
+        "compiled": compiled_path is not None,
+        "quantization": quantization,
+        "load_time_ms": load_time_ms,
+        "compile_time_ms": compile_time_ms,
+        "warmup_time_ms": None,
+        "memory_bytes": memory_bytes,
+        "resident_bytes": rss_after - rss_before if None not in (rss_before, rss_after) else None,
+        "in_flight": 0,
+        "retired_at": None
+    }
 
+
+async def warmup_model(model_name: str, model_data: Dict[str, Any]):
+    """
+    Runs a few batches of random inputs through the serving path of a model, so
+    the first requests do not pay for lazy allocations, kernel selection or the
+    shape specialisation of a compiled variant. Batches alternate between a
+    single row and a full batch.
+    """
+    batches = model_data["config"].get("compile", {}).get("warmup_batches", MODEL_WARMUP_BATCHES)
+    n_features = model_data["input_size"]
+    if batches <= 0 or n_features is None:
+        return
+    batcher = model_data["batcher"]
+    started = time.perf_counter()
+    try:
+        for i in range(batches):
+            await batcher.run(torch.randn(1 if i % 2 == 0 else batcher.max_batch_size, n_features))
+    except Exception as e:
+        print(f"Warning: warmup of model '{model_name}' failed: {e}")
+        return
+    model_data["warmup_time_ms"] = (time.perf_counter() - started) * 1000
+
+
+def cache_model(model_name: str, model_data: Dict[str, Any]):
+    """Stores a loaded model in the loaded_models cache, replacing any other version of it."""
+    for stage in ("load", "compile", "warmup"):
+        if model_data[f"{stage}_time_ms"] is not None:
+            model_load_seconds.observe(model_data[f"{stage}_time_ms"] / 1000, model_name, stage)
+    if model_data["config"].get("pinned", False):
+        loaded_models.pin(model_name)
+    size_bytes = model_data["memory_bytes"] + tensors_nbytes(model_data["explainer_state"])
+    for evicted in loaded_models.put(model_name, model_data, size_bytes):
+        print(f"Evicted model '{evicted}' to stay within the model cache budget.")
+        if worker_pool is not None:
+            worker_pool.forget(evicted)
+
+
+async def load_and_cache_model(model_name: str) -> Dict[str, Any]:
+    """Loads and warms up a model in a worker thread and stores it in the loaded_models cache."""
+    model_info = catalog[model_name]
+    try:
+        model_data = await asyncio.to_thread(load_model, model_name, model_info)
     except Exception as e:
+        load_failures[model_name] = (time.monotonic() + LOAD_FAILURE_TTL, str(e))
         raise HTTPException(status_code=500, detail=f"Error loading model '{model_name}': {e}")
+    # The model is reported as 'loading' until it is warm
+    await warmup_model(model_name, model_data)
 
+    cache_model(model_name, model_data)
+    print(f"Loaded model '{model_name}'" + (f" version '{model_info['version']}'." if model_info["version"] is not None else "."))
+    if catalog.get(model_name) is not model_info:
+        # A new version was deployed while this one was loading
+        start_swap(model_name)
+    return model_data
 
-def unload_inactive_models():
-    """Periodically checks for inactive models and unloads them."""
+
+def lease_model(model_data: Dict[str, Any]) -> Callable[[], None]:
+    """Counts a request as in flight on a loaded model version and returns the function ending it."""
+    model_data["in_flight"] += 1
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            model_data["in_flight"] -= 1
+            if model_data["in_flight"] == 0 and model_data["retired_at"] is not None:
+                finish_draining(model_data)
+    return release
+
+
+def retire_model(model_data: Dict[str, Any]):
+    """Marks a replaced model version as draining; it is released once its last in-flight request ends."""
+    model_data["retired_at"] = time.monotonic()
+    if model_data["in_flight"] == 0:
+        finish_draining(model_data)
+    else:
+        draining_models.append(model_data)
+
+
+def finish_draining(model_data: Dict[str, Any]):
+    # Dropping the last references frees the model, its batcher and any compiled variant
+    draining_models[:] = [other for other in draining_models if other is not model_data]
+    drain_ms = (time.monotonic() - model_data["retired_at"]) * 1000
+    print(f"Released version '{model_data['model_info']['version']}' of model '{model_data['name']}' after draining for {drain_ms:.0f} ms.")
+
+
+async def swap_model(model_name: str):
+    """
+    Brings a loaded model to the version in the catalog without downtime: the new
+    version is loaded and warmed up while the old one keeps serving, then replaces
+    it in the cache in a single step, so every request runs entirely on one
+    version. The old version is retired and drains its in-flight requests. If
+    the new version fails to load, the old one keeps serving.
+    """
     while True:
-        now = time.time()
-        to_unload = [
-            name for name, data in loaded_models.items()
-            if now - data["last_access"] > UNLOAD_TIMEOUT
-        ]
-        for name in to_unload:
-            print(f"Unloading inactive model {name}")
-            del loaded_models[name]
-        time.sleep(10)
+        model_info = catalog.get(model_name)
+        old = loaded_models.peek(model_name)
+        if model_info is None or old is None or old["model_info"] is model_info:
+            return
+        try:
+            model_data = await asyncio.to_thread(load_model, model_name, model_info)
+        except Exception as e:
+            load_failures[model_name] = (time.monotonic() + LOAD_FAILURE_TTL, str(e))
+            print(f"Warning: could not load the new version of model '{model_name}', still serving the old one: {e}")
+            return
+        await warmup_model(model_name, model_data)
+        if loaded_models.peek(model_name) is not old:
+            # The model was unloaded or replaced meanwhile
+            return
+        cache_model(model_name, model_data)
+        retire_model(old)
+        print(f"Swapped in version '{model_info['version']}' of model '{model_name}'.")
+
+
+def start_swap(model_name: str):
+    """Starts swapping in the new version of a model in the background, unless a swap of it is already running."""
+    if model_name in model_swaps:
+        # The running swap checks the catalog again once it is done
+        return
+    task = asyncio.create_task(model_swaps.do(model_name, lambda: swap_model(model_name)))
+    background_tasks.append(task)
+    task.add_done_callback(lambda done: background_tasks.remove(done) if done in background_tasks else None)
+
+
+async def get_model(model_name: str) -> Dict[str, Any]:
+    """
+    Gets a model from the loaded_models cache or loads it from disk.
+    Concurrent requests for a model that is not loaded yet all wait for the same load.
+    """
+    model_data = loaded_models.get(model_name)
+    if model_data is not None:
+        return model_data
+
+    if model_name not in catalog:
+        # The model may have been deployed since the last background refresh
+        await catalog_refreshes.do("refresh", refresh_catalog)
+    if model_name not in catalog:
+        raise HTTPException(status_code=404, detail=f"Model '{model_name}' not found.")
+
+    failure = load_failures.get(model_name)
+    if failure is not None:
+        expires_at, error = failure
+        if time.monotonic() < expires_at:
+            raise HTTPException(status_code=500, detail=f"Error loading model '{model_name}': {error}")
+        del load_failures[model_name]
+
+    return await model_loads.do(model_name, lambda: load_and_cache_model(model_name))
 
 
+def preload_names() -> List[str]:
+    """The models to preload: pinned ones, those in PRELOAD_MODELS and those whose config asks for it."""
+    names = set(PRELOAD_MODELS) | set(PINNED_MODELS)
+    for model_name, entry in catalog.items():
+        config = entry["config"] or {}
+        if config.get("preload", False) or config.get("pinned", False):
+            names.add(model_name)
+    return sorted(names)
+
+
+async def preload_models(model_names: List[str]):
+    """Loads, warms up and pins models in the background, PRELOAD_CONCURRENCY at a time."""
+    slots = asyncio.Semaphore(max(1, PRELOAD_CONCURRENCY))
+    for model_name in model_names:
+        preload_status[model_name] = "pending"
+
+    async def preload(model_name: str):
+        async with slots:
+            preload_status[model_name] = "loading"
+            # Pinned first, so the models preloaded after it cannot evict it
+            loaded_models.pin(model_name)
+            try:
+                await get_model(model_name)
+            except HTTPException as e:
+                preload_status[model_name] = "failed"
+                print(f"Warning: could not preload model '{model_name}': {e.detail}")
+                return
+            preload_status[model_name] = "ready"
+
+    started = time.perf_counter()
+    await asyncio.gather(*(preload(model_name) for model_name in model_names))
+    if model_names:
+        print(f"Preloaded {sum(status == 'ready' for status in preload_status.values())} of {len(model_names)} models in {time.perf_counter() - started:.1f} s.")
+
 # --- FastAPI Events ---
 
 @app.on_event("startup")
 async def startup_event():
-    """On startup, discover models and start the background thread for unloading."""
+    """
+    On startup, discover models, start watching for changes, start the predict and
+    explain executors and the inference worker processes if enabled, then start
+    preloading models.
+    """
+    global worker_pool, predict_executor, explain_executor, tracer
+    if TORCH_THREADS is not None:
+        torch.set_num_threads(int(TORCH_THREADS))
+    if TORCH_INTEROP_THREADS is not None:
+        try:
+            torch.set_num_interop_threads(int(TORCH_INTEROP_THREADS))
+        except RuntimeError as e:
+            print(f"Warning: could not set the torch inter-op threads: {e}")
+    if OTEL_EXPORTER_OTLP_ENDPOINT:
+        tracer = setup_tracing(OTEL_SERVICE_NAME)
     discover_models()
-    # Start a thread to watch for file system changes to rediscover models
-    threading.Thread(target=unload_inactive_models, daemon=True).start()
+    predict_executor = WorkloadExecutor("predict", PREDICT_EXECUTOR_WORKERS)
+    explain_executor = WorkloadExecutor("explain", EXPLAIN_EXECUTOR_WORKERS)
+    background_tasks.append(asyncio.create_task(watch_models()))
+    if WORKER_PROCESSES > 0:
+        worker_pool = WorkerPool(WORKER_PROCESSES, WORKER_THREADS, model_slots=WORKER_MODEL_SLOTS, spill_depth=WORKER_SPILL_DEPTH)
+        print(f"Started {WORKER_PROCESSES} inference worker processes.")
+    background_tasks.append(asyncio.create_task(preload_models(preload_names())))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background tasks, the executors and the inference worker processes."""
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    for executor in (predict_executor, explain_executor):
+        if executor is not None:
+            executor.shutdown()
+    if worker_pool is not None:
+        worker_pool.shutdown()
 
 # --- API Endpoints ---
 
 @app.get("/models")
-async def get_models_list():
-    """Get a list of available models and their configs."""
-    discover_models() # Refresh on each request to get latest models
+async def get_models_list(refresh: bool = False):
+    """
+    Get a list of available models and their configs.
+    The list is served from the in-memory catalog; `refresh` rescans the model directory first.
+    """
+    if refresh:
+        await catalog_refreshes.do("refresh", refresh_catalog)
     model_info = []
-    for model_name, paths in available_models.items():
-        try:
-            with open(paths['config_path'], 'r') as f:
-                config = json.load(f)
-                config['name'] = model_name
-                if model_name in loaded_models:
-                    config['status'] = 'loaded'
-                    config['available_explainers'] = list(loaded_models[model_name].get("explainers", {}).keys())
-                else:
-                    config['status'] = 'available'
-                model_info.append(config)
-        except Exception as e:
-            print(f"Could not read config for {model_name}: {e}")
+    for model_name, entry in catalog.items():
+        if entry["config"] is None:
+            continue
+        config = dict(entry["config"])
+        config['name'] = model_name
+        config['version'] = entry["version"]
+        loaded = loaded_models.peek(model_name)
+        if loaded is not None:
+            config['status'] = 'loaded'
+            config['loaded_version'] = loaded["model_info"]["version"]
+            config['updating'] = model_name in model_swaps
+            config['draining_versions'] = [old["model_info"]["version"] for old in draining_models if old["name"] == model_name]
+            if model_name in load_failures:
+                config['update_error'] = load_failures[model_name][1]
+            config['available_explainers'] = list(loaded.get("explainers", {}).keys())
+            config['load_time_ms'] = loaded["load_time_ms"]
+            config['backend'] = loaded["backend"]
+            config['compiled'] = loaded["compiled"]
+            config['quantization'] = loaded["quantization"]
+            config['precomputed_baseline'] = "baseline" in loaded["explainer_state"]
+            preprocessor = loaded["preprocessor"]
+            config['input_columns'] = preprocessor.names if preprocessor is not None else None
+            config['features'] = preprocessor.feature_names if preprocessor is not None else None
+            config['compile_time_ms'] = loaded["compile_time_ms"]
+            config['warmup_time_ms'] = loaded["warmup_time_ms"]
+            config['memory_bytes'] = loaded["memory_bytes"]
+            config['resident_bytes'] = loaded["resident_bytes"]
+            config['pinned'] = loaded_models.is_pinned(model_name)
+        elif model_name in model_loads:
+            config['status'] = 'loading'
+        else:
+            config['status'] = 'available'
+            if model_name in load_failures:
+                config['load_error'] = load_failures[model_name][1]
+        model_info.append(config)
             
     return model_info
 
 
-@app.post("/predict/{model_name}")
-async def predict(model_name: str, request: PredictRequest):
-    """Make a prediction using a specified model."""
+@app.get("/ready")
+async def get_readiness():
+    """Readiness probe: 503 until every model preloaded at startup is loaded and warm, or has failed to load."""
+    pending = sorted(name for name, status in preload_status.items() if status in ("pending", "loading"))
+    content = {"ready": not pending, "pending": pending, "models": dict(preload_status)}
+    return JSONResponse(status_code=503 if pending else 200, content=content)
+
+
+@app.get("/models/cache")
+async def get_model_cache_stats():
+    """Get the memory usage and hit/miss/eviction counters of the loaded model cache."""
+    return loaded_models.stats()
+
+
+@app.get("/executors")
+async def get_executors():
+    """Get the queue depth and wait times of the predict and explain executors."""
+    return {executor.name: executor.stats() for executor in (predict_executor, explain_executor) if executor is not None}
+
+
+@app.get("/admission")
+async def get_admission_stats():
+    """Get the number of running, queued, rejected and expired requests of each model."""
+    return admission.stats()
+
+
+@metrics.collector
+def collect_serving_metrics():
+    """Counters and gauges kept by the model cache, admission queues, executors, caches and jobs, read at scrape time."""
+    cache = loaded_models.stats()
+    yield "modelserve_model_cache_bytes", "gauge", "Memory used by loaded models.", [("modelserve_model_cache_bytes", {}, cache["used_bytes"])]
+    for counter in ("hits", "misses", "evictions"):
+        name = f"modelserve_model_cache_{counter}_total"
+        yield name, "counter", f"Model cache {counter}.", [(name, {}, cache[counter])]
+    yield "modelserve_model_in_flight", "gauge", "Requests in flight on each loaded model, draining versions included.", [
+        ("modelserve_model_in_flight", {"model": model_data["name"], "draining": str(model_data["retired_at"] is not None).lower()}, model_data["in_flight"])
+        for model_data in [loaded_models.peek(name) for name in cache["models"]] + draining_models if model_data is not None
+    ]
+
+    stats = admission.stats()
+    yield "modelserve_in_flight_requests", "gauge", "Requests running or queued across all models.", [("modelserve_in_flight_requests", {}, stats["in_flight"])]
+    yield "modelserve_overload_rejections_total", "counter", "Requests rejected with 503 because the server was overloaded.", [("modelserve_overload_rejections_total", {}, stats["rejected"])]
+    queues = [(dict(zip(("model", "workload"), key.split("/", 1))), queue) for key, queue in stats["queues"].items()]
+    for field, kind, help_text in (
+        ("active", "gauge", "Requests holding an admission slot."),
+        ("queued", "gauge", "Requests waiting for an admission slot."),
+        ("admitted", "counter", "Requests admitted."),
+        ("rejected", "counter", "Requests rejected with 429 because the queue was full."),
+        ("expired", "counter", "Requests dropped because their deadline passed before they were admitted.")
+    ):
+        name = f"modelserve_admission_{field}" + ("_total" if kind == "counter" else "")
+        yield name, kind, help_text, [(name, labels, queue[field]) for labels, queue in queues]
+
+    executors = [executor.stats() | {"name": executor.name} for executor in (predict_executor, explain_executor) if executor is not None]
+    for field, kind in (("queued", "gauge"), ("running", "gauge"), ("completed", "counter"), ("expired", "counter")):
+        name = f"modelserve_executor_{field}" + ("_total" if kind == "counter" else "")
+        yield name, kind, f"Calls {field} in the predict and explain executors.", [(name, {"executor": e["name"]}, e[field]) for e in executors]
 
-    model_data = get_model(model_name)
-    model = model_data["model"]
-    
+    caches = [("explanation", explanation_cache), ("prediction", prediction_cache)]
+    for counter in ("hits", "misses"):
+        name = f"modelserve_result_cache_{counter}_total"
+        yield name, "counter", f"Explanation and prediction cache {counter}.", [
+            (name, {"cache": cache_name}, result_cache.stats()[counter]) for cache_name, result_cache in caches if result_cache is not None
+        ]
+    yield "modelserve_coalesced_predictions_total", "counter", "Predictions served by joining an identical in-flight request.", [
+        ("modelserve_coalesced_predictions_total", {}, coalesced_predictions["count"])
+    ]
+    yield "modelserve_explanation_jobs", "gauge", "Explanation jobs in each state.", [
+        ("modelserve_explanation_jobs", {"status": status}, count) for status, count in explanation_jobs.stats().items()
+    ]
+    if worker_pool is not None:
+        yield "modelserve_worker_pending", "gauge", "Calls queued on each inference worker process.", [
+            ("modelserve_worker_pending", {"worker": str(worker)}, pending) for worker, pending in enumerate(worker_pool.stats()["pending"])
+        ]
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Serving metrics in the Prometheus text format."""
+    return Response(content=metrics.render(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
+@app.get("/workers")
+async def get_workers():
+    """Get the queue depth of each inference worker process and which models they hold."""
+    if worker_pool is None:
+        return {"processes": 0}
+    return worker_pool.stats()
+
+
+@app.post("/models/{model_name}/pin")
+async def pin_model(model_name: str):
+    """Protect a model from eviction, loading it if needed."""
+    await get_model(model_name)
+    loaded_models.pin(model_name)
+    return {"name": model_name, "pinned": True}
+
+
+@app.delete("/models/{model_name}/pin")
+async def unpin_model(model_name: str):
+    """Make a pinned model evictable again."""
+    loaded_models.unpin(model_name)
+    return {"name": model_name, "pinned": False}
+
+
+def request_body_docs(schema: type) -> dict:
+    """OpenAPI description of an endpoint accepting either a JSON body or a .npy tensor."""
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": schema.model_json_schema()},
+        NPY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}}
+    }}}
+
+
+async def read_body(request: Request) -> bytearray:
+    """Reads the request body into a writable buffer that tensors can wrap without copying."""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+    return body
+
+
+async def parse_request(request: Request, schema: type, model_data: Dict[str, Any]) -> Tuple[torch.Tensor, Optional[BaseModel]]:
+    """
+    Decodes the input tensor of a request according to its Content-Type.
+    A .npy body is wrapped as is; a JSON body is validated against `schema` and also returned.
+    For a model with a preprocessor, JSON rows are raw rows, coded by the preprocessor,
+    and .npy rows must already be coded, with one column per input column. Inputs of
+    another shape than the model takes are rejected, and numeric ones cast to float32.
+    """
+    preprocessor = model_data["preprocessor"]
+    if request.headers.get("content-type", "").startswith(NPY_MEDIA_TYPE):
+        try:
+            return as_model_input(decode_npy(await read_body(request)), model_data["input_size"]), None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid {NPY_MEDIA_TYPE} body: {e}")
     try:
-        tensor_data = torch.tensor(request.data)
-        predictions = await asyncio.to_thread(model, tensor_data)
-        return {"predictions": predictions.tolist()}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        parsed = schema.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    try:
+        if preprocessor is not None:
+            return preprocessor.encode_rows(parsed.data), parsed
+        return as_model_input(torch.tensor(parsed.data), model_data["input_size"]), parsed
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid input rows: {e}")
+
+
+def stream_parser(preprocessor: Optional[Preprocessor]) -> Callable[[List[bytes], str, bool], torch.Tensor]:
+    """Parses the chunks of a streamed input, as raw rows coded by the preprocessor of the model if it has one."""
+    if preprocessor is None:
+        return parse_rows
+    def parse(lines: List[bytes], fmt: str, skip_header: bool = False) -> torch.Tensor:
+        rows = read_rows(lines, fmt)
+        if skip_header and fmt == "csv" and rows and rows[0] == preprocessor.names:
+            rows = rows[1:]
+        return preprocessor.encode_rows(rows)
+    return parse
+
+
+def accepts(request: Request, media_type: str) -> bool:
+    return media_type in request.headers.get("accept", "")
+
 
+def span(name: str, **attributes):
+    """An OpenTelemetry span, nested in the current one, when tracing is enabled."""
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.start_as_current_span(name, attributes=attributes)
 
-@app.post("/explain/{model_name}")
-async def explain(model_name: str, request: ExplainRequest):
 
-    """Get an explanation for a prediction."""
-    model_data = get_model(model_name)
-    model = model_data["model"]
-    
-    if request.explainer not in model_data["explainers"]:
-        raise HTTPException(status_code=404, detail=f"Explainer '{request.explainer}' not available for model '{model_name}'")
-        
-    explainer_func = model_data["explainers"][request.explainer]
-    
+@contextlib.contextmanager
+def timed_phase(model_name: str, endpoint: str, phase: str):
+    """Records the time spent in a phase of a request in the phase histogram, and as a span when tracing is enabled."""
+    started = time.perf_counter()
+    with span(f"{endpoint}.{phase}", model=model_name):
+        try:
+            yield
+        finally:
+            phase_seconds.observe(time.perf_counter() - started, model_name, endpoint, phase)
+
+
+def version_headers(model_data: Dict[str, Any]) -> Dict[str, str]:
+    """The X-Model-Version header naming the model version that served a response, for versioned models."""
+    version = model_data["model_info"]["version"]
+    return {"X-Model-Version": version} if version is not None else {}
+
+
+def request_deadline(request: Request) -> Optional[float]:
+    """The time.monotonic() deadline given by the X-Request-Timeout-Ms header of a request, if any."""
+    timeout_ms = request.headers.get("x-request-timeout-ms")
+    if timeout_ms is None:
+        return None
     try:
-        import json
-        tensor_data = torch.tensor(request.data)
-        explanation = await asyncio.to_thread(explainer_func, model, tensor_data)
-        return {
-            "attributions": json.dumps([e.tolist() for e in explanation.get("attributions", [])]) if explanation.get("attributions") is not None else None,
-            "baseline": json.dumps(explanation.get("baseline", None).tolist()) if explanation.get("baseline") is not None else None
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred during explanation: {e}")
+        return time.monotonic() + float(timeout_ms) / 1000
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Request-Timeout-Ms must be a number of milliseconds.")
+
+
+async def admit(model_name: str, model_data: Dict[str, Any], workload: str, request: Request, deadline: Optional[float], default_priority: str = "interactive"):
+    """
+    Waits for a slot in the admission queue of a model for `workload` and returns the function releasing it.
+    Raises 429 or 503 with a Retry-After header when the request cannot be queued, and 504 when its deadline passes first.
+    """
+    priority = request.headers.get("x-priority", default_priority)
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"X-Priority must be one of {list(PRIORITIES)}.")
+    defaults = {
+        "predict": (ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE),
+        "explain": (EXPLAIN_MAX_CONCURRENCY, EXPLAIN_MAX_QUEUE)
+    }[workload]
+    limits = model_data["config"].get("admission", {}).get(workload, {})
+    queue = admission.queue(
+        model_name, workload,
+        limits.get("max_concurrency", defaults[0]),
+        limits.get("max_queue", defaults[1])
+    )
+    try:
+        return await admission.acquire(queue, PRIORITIES[priority], deadline)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+
+async def coalesced_predict(model_name: str, model_data: Dict[str, Any], data: torch.Tensor, deadline: Optional[float] = None) -> torch.Tensor:
+    """
+    Runs an input through the batcher of a model, unless an identical input is
+    already in flight, whose forward pass is then shared, or its predictions are
+    still in the prediction cache.
+    """
+    key = prediction_key(model_name, model_data["serving_checksum"], model_data["backend"], data)
+    if prediction_cache is not None:
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return cached
+
+    async def run() -> torch.Tensor:
+        predictions = await model_data["batcher"].submit(data, deadline)
+        if prediction_cache is not None:
+            prediction_cache.put(key, predictions)
+        return predictions
+
+    if key in prediction_flights:
+        coalesced_predictions["count"] += 1
+    try:
+        return await prediction_flights.do(key, run)
+    except DeadlineExceeded:
+        # The shared pass was dropped at the deadline of the request that started it
+        if expired(deadline):
+            raise
+        return await model_data["batcher"].submit(data, deadline)
+
+
+@app.get("/predictions/cache")
+async def get_prediction_cache_stats():
+    """Get the number of coalesced predictions and the size and hit/miss counters of the prediction cache."""
+    stats = {"coalesced": coalesced_predictions["count"], "in_flight": len(prediction_flights)}
+    if prediction_cache is None:
+        return {**stats, "enabled": False}
+    return {**stats, "enabled": True, **prediction_cache.stats()}
+
+
+@app.post("/predict/{model_name}", openapi_extra=request_body_docs(PredictRequest))
+async def predict(model_name: str, request: Request):
+    """
+    Make a prediction using a specified model.
+    The input is either a JSON PredictRequest or a raw .npy tensor, and the
+    predictions are returned as a .npy tensor when the client accepts it.
+    """
+
+    with span("predict", model=model_name):
+        deadline = request_deadline(request)
+        model_data = await get_model(model_name)
+        end_lease = lease_model(model_data)
+        try:
+            with timed_phase(model_name, "predict", "admission"):
+                release = await admit(model_name, model_data, "predict", request, deadline)
+        except BaseException:
+            end_lease()
+            raise
+        try:
+            with timed_phase(model_name, "predict", "decode"):
+                tensor_data, _ = await parse_request(request, PredictRequest, model_data)
+            # The queue and inference phases are recorded by the batcher
+            with span("predict.batch", model=model_name):
+                predictions = await coalesced_predict(model_name, model_data, tensor_data, deadline)
+        except DeadlineExceeded as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            release()
+            end_lease()
+
+        headers = version_headers(model_data)
+        with timed_phase(model_name, "predict", "encode"):
+            if accepts(request, NPY_MEDIA_TYPE):
+                return Response(content=encode_npy(predictions), media_type=NPY_MEDIA_TYPE, headers=headers)
+            return JSONResponse(content={"predictions": predictions.tolist()}, headers=headers)
+
+
+def resolve_dataset_uri(dataset_uri: str) -> str:
+    """Maps a file:// dataset URI, as stored by the backend, to a local path under DATA_DIR."""
+    path = os.path.realpath(dataset_uri.removeprefix("file://"))
+    if not path.startswith(DATA_DIR + os.sep):
+        raise HTTPException(status_code=400, detail=f"Dataset URI must point inside '{DATA_DIR}'.")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Dataset file '{dataset_uri}' not found.")
+    return path
+
+
+@app.post("/predict/{model_name}/stream")
+async def predict_stream(model_name: str, request: Request, dataset_uri: Optional[str] = None, chunk_rows: int = Query(STREAM_CHUNK_ROWS, gt=0)):
+    """
+    Score a large input chunk by chunk and stream the predictions back as NDJSON, one line per row.
+    The rows are read from the request body, as NDJSON arrays or CSV records, or from
+    a dataset file given by `dataset_uri`. A request body is read in full before the
+    predictions are sent. Streams are admitted as batch traffic unless the request says
+    otherwise, and hold their admission slot until they end.
+    """
+    deadline = request_deadline(request)
+    model_data = await get_model(model_name)
+
+    spool = None
+    if dataset_uri is not None:
+        path = resolve_dataset_uri(dataset_uri)
+        fmt = FILE_FORMATS.get(os.path.splitext(path)[1].lower())
+        source = iter_file(path)
+    else:
+        fmt = FORMATS.get(request.headers.get("content-type", "").split(";")[0].strip())
+    if fmt is None:
+        raise HTTPException(status_code=415, detail=f"Expected {NDJSON_MEDIA_TYPE} or CSV input.")
+    if dataset_uri is None:
+        # Uploaded before admission, so a slow upload does not hold a slot
+        spool = await spool_stream(request.stream(), STREAM_SPOOL_MEMORY_BYTES)
+        source = iter_fileobj(spool)
+
+    end_lease = lease_model(model_data)
+    try:
+        release = await admit(model_name, model_data, "predict", request, deadline, default_priority="batch")
+    except BaseException:
+        end_lease()
+        if spool is not None:
+            spool.close()
+        raise
+
+    def on_close():
+        release()
+        end_lease()
+        if spool is not None:
+            spool.close()
+    chunks = iter_line_chunks(source, chunk_rows)
+    return BodyStreamingResponse(
+        score_stream(chunks, fmt, model_data["batcher"].run, parse_chunk=stream_parser(model_data["preprocessor"])), on_close=on_close,
+        media_type=NDJSON_MEDIA_TYPE, headers=version_headers(model_data)
+    )
+
+
+async def run_explainer(model_name: str, model_data: Dict[str, Any], explainer: Explainer, data: torch.Tensor, deadline: Optional[float] = None, **kwargs) -> dict:
+    if worker_pool is not None:
+        if expired(deadline):
+            raise DeadlineExceeded("Request deadline passed before the explanation started")
+        return await worker_pool.explain(model_name, model_data["model_info"], explainer.name, data, **kwargs)
+    if explain_executor is not None:
+        return await explain_executor.run(explainer, model_data["model"], data, deadline=deadline, **kwargs)
+    return await asyncio.to_thread(explainer, model_data["model"], data, **kwargs)
+
+
+def lookup_explanations(model_name: str, model_data: Dict[str, Any], explainer: Explainer, data: torch.Tensor, context: Optional[dict] = None) -> Tuple[dict, List[str], List[Optional[np.ndarray]]]:
+    if context is None:
+        context = explainer.prepare(data)
+    keys = explanation_keys(model_name, model_data["weights_checksum"], explainer.name, explainer.params, context, data)
+    return context, keys, explanation_cache.get_many(keys)
+
+
+async def explain_rows(model_name: str, model_data: Dict[str, Any], explainer: Explainer, data: torch.Tensor, deadline: Optional[float] = None, context: Optional[dict] = None) -> dict:
+    """
+    Explains the rows of `data`, reusing cached per-row attributions.
+    Only the rows missing from the explanation cache go through the explainer.
+    `context` is the explainer's request-level context when `data` is a chunk of a larger input.
+    Models with a precomputed baseline use it as the context of every request.
+    """
+    if context is None and model_data["explainer_state"]:
+        context = dict(model_data["explainer_state"])
+    if explanation_cache is None or len(data) == 0:
+        return await run_explainer(model_name, model_data, explainer, data, deadline, **(context or {}))
+
+    context, keys, rows = await asyncio.to_thread(lookup_explanations, model_name, model_data, explainer, data, context)
+    baseline = context.get("baseline")
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        explanation = await run_explainer(model_name, model_data, explainer, data[missing], deadline, **context)
+        if explanation.get("attributions") is None:
+            return explanation
+        # (N_CLASSES, N_MISSING, N_FEATURES) -> one (N_CLASSES, N_FEATURES) array per row
+        computed = list(np.stack(explanation["attributions"], axis=1))
+        await asyncio.to_thread(explanation_cache.put_many, [keys[i] for i in missing], computed)
+        for i, row in zip(missing, computed):
+            rows[i] = row
+        if explanation.get("baseline") is not None:
+            baseline = explanation["baseline"]
+
+    if isinstance(baseline, torch.Tensor):
+        baseline = baseline.detach().cpu().numpy()
+    return {"attributions": list(np.stack(rows, axis=1)), "baseline": baseline}
+
+
+@app.get("/explanations/cache")
+async def get_explanation_cache_stats():
+    """Get the size and hit/miss counters of the explanation cache."""
+    if explanation_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **explanation_cache.stats()}
+
+
+async def submit_explanation_job(model_name: str, model_data: Dict[str, Any], explainer: Explainer, data: torch.Tensor):
+    """Starts explaining `data` in the background, chunk by chunk, with the request-level context of the whole input."""
+    if model_data["explainer_state"]:
+        context = dict(model_data["explainer_state"])
+    else:
+        context = await asyncio.to_thread(explainer.prepare, data)
+
+    def explain_chunk(chunk: torch.Tensor):
+        return explain_rows(model_name, model_data, explainer, chunk, context=context)
+    job = explanation_jobs.submit(model_name, explainer.name, data, EXPLAIN_JOB_CHUNK_ROWS, explain_chunk)
+    # The whole job runs on the version it was submitted to
+    end_lease = lease_model(model_data)
+    job.task.add_done_callback(lambda _: end_lease())
+    return job
+
+
+@app.get("/jobs")
+async def get_jobs_stats():
+    """Get the number of explanation jobs in each state."""
+    return explanation_jobs.stats()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status and progress of an explanation job."""
+    job = explanation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job.info()
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Get the attributions computed by an explanation job as a .npz archive, stacked as
+    (classes, rows, features). While the job runs, the rows done so far are returned.
+    """
+    job = explanation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    headers = {"X-Job-Status": job.status, "X-Rows-Done": str(job.rows_done)}
+    path = explanation_jobs.result_path(job)
+    if job.status in ("done", "failed") and os.path.exists(path):
+        return FileResponse(path, media_type=NPZ_MEDIA_TYPE, headers=headers)
+    partial = job.partial_result()
+    if partial is None:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' has no results yet (status: {job.status}).")
+    return Response(content=encode_npz(partial), media_type=NPZ_MEDIA_TYPE, headers=headers)
+
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel an explanation job if it is still running and delete its results."""
+    if explanation_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    explanation_jobs.delete(job_id)
+    return {"job_id": job_id, "deleted": True}
+
+
+@app.post("/explain/{model_name}", openapi_extra=request_body_docs(ExplainRequest))
+async def explain(model_name: str, request: Request, explainer: Optional[str] = None):
+
+    """
+    Get an explanation for a prediction.
+    With a raw .npy body the explainer is given as a query parameter. Attributions,
+    stacked as (classes, rows, features), and the baseline are returned as a .npz
+    archive when the client accepts it. Large inputs, or requests sent with
+    "Prefer: respond-async", are explained by a background job instead: the
+    response is 202 with the job, to be followed at /jobs/{job_id}.
+    """
+    with span("explain", model=model_name):
+        deadline = request_deadline(request)
+        model_data = await get_model(model_name)
+        end_lease = lease_model(model_data)
+        try:
+            with timed_phase(model_name, "explain", "admission"):
+                release = await admit(model_name, model_data, "explain", request, deadline)
+        except BaseException:
+            end_lease()
+            raise
+        try:
+            with timed_phase(model_name, "explain", "decode"):
+                tensor_data, parsed = await parse_request(request, ExplainRequest, model_data)
+                if tensor_data.dim() == 1:
+                    # Explainers attribute batches of rows
+                    tensor_data = tensor_data.unsqueeze(0)
+                if model_data["preprocessor"] is not None:
+                    # Attributions are over the encoded features the network sees
+                    with torch.no_grad():
+                        tensor_data = model_data["preprocessor"](tensor_data)
+            explainer_name = parsed.explainer if parsed is not None else explainer
+
+            if explainer_name not in model_data["explainers"]:
+                raise HTTPException(status_code=404, detail=f"Explainer '{explainer_name}' not available for model '{model_name}'")
+
+            explainer = model_data["explainers"][explainer_name]
+
+            if len(tensor_data) > EXPLAIN_ASYNC_ROWS or "respond-async" in request.headers.get("prefer", ""):
+                job = await submit_explanation_job(model_name, model_data, explainer, tensor_data)
+                return JSONResponse(status_code=202, content=job.info(), headers={"Location": f"/jobs/{job.job_id}", **version_headers(model_data)})
+
+            try:
+                with timed_phase(model_name, "explain", "inference"):
+                    explanation = await explain_rows(model_name, model_data, explainer, tensor_data, deadline)
+            except DeadlineExceeded as e:
+                raise HTTPException(status_code=504, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"An error occurred during explanation: {e}")
+        finally:
+            release()
+            end_lease()
 
+        headers = version_headers(model_data)
+        attributions = explanation.get("attributions")
+        baseline = explanation.get("baseline")
+        with timed_phase(model_name, "explain", "encode"):
+            if accepts(request, NPZ_MEDIA_TYPE):
+                if attributions is None:
+                    raise HTTPException(status_code=500, detail=f"An error occurred during explanation: {explanation.get('error')}")
+                content = encode_npz({"attributions": np.stack(attributions), "baseline": baseline})
+                return Response(content=content, media_type=NPZ_MEDIA_TYPE, headers=headers)
+            return JSONResponse(content={
+                "attributions": json.dumps([e.tolist() for e in attributions]) if attributions is not None else None,
+                "baseline": json.dumps(baseline.tolist()) if baseline is not None else None
+            }, headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,139 @@
+import bisect
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol, Sequence, Tuple
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds in seconds, from sub-millisecond forward passes to multi-second explanations
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(Protocol):
+    """A metric family recorded as things happen, rendered as its samples."""
+
+    name: str
+    kind: str
+    help_text: str
+
+    def samples(self) -> Iterable[Sample]:
+        ...
+
+
+class Histogram:
+    """
+    Cumulative histogram over fixed bucket bounds. An observation costs a binary
+    search and three additions under a lock; the buckets are only made
+    cumulative when rendered.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        # Per series: bucket counts (the last one is +Inf), sum, count
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            series = [(label_values, list(counts), total, count) for label_values, (counts, total, count) in self._series.items()]
+        for label_values, counts, total, count in series:
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class MetricsRegistry:
+    """
+    Metrics recorded as things happen, plus collectors called at scrape time for
+    values other components already keep (cache sizes, queue depths, in-flight
+    counts), which are thus free to record.
+    """
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]):
+        """Registers a function returning (name, kind, help, samples) families to add to every scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        families = [(metric.name, metric.kind, metric.help_text, list(metric.samples())) for metric in self._metrics]
+        for fn in self._collectors:
+            try:
+                families.extend(fn())
+            except Exception as e:
+                print(f"Warning: metrics collector {fn.__name__} failed: {e}")
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def setup_tracing(service_name: str) -> Optional[Any]:
+    """
+    Returns an OpenTelemetry tracer exporting spans over OTLP/HTTP, configured by the
+    standard OTEL_EXPORTER_OTLP_* environment variables, or None if the OpenTelemetry
+    SDK and OTLP exporter are not installed.
+    """
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError as e:
+        print(f"Warning: OTLP tracing is enabled but OpenTelemetry is not installed ({e}), not exporting spans.")
+        return None
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    return provider.get_tracer("modelserve")
@@ -0,0 +1,133 @@
+import threading
+import torch
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+POLICIES = ("lru", "lfu")
+
+
+def tensors_nbytes(obj: Any) -> int:
+    """Total size in bytes of the tensors found in (possibly nested) dicts, lists and tuples."""
+    if isinstance(obj, torch.Tensor):
+        return obj.numel() * obj.element_size()
+    if isinstance(obj, dict):
+        return sum(tensors_nbytes(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(tensors_nbytes(value) for value in obj)
+    return 0
+
+
+class ModelCache:
+    """
+    Thread-safe cache of loaded models bounded by a memory budget.
+
+    Every entry is stored with its size in bytes. When an insertion takes the
+    total above `budget_bytes`, unpinned entries are evicted, least recently used
+    first ('lru' policy) or least frequently used first with recency breaking
+    ties ('lfu' policy), until the cache fits again or only pinned entries and
+    the new entry are left.
+    """
+
+    def __init__(self, budget_bytes: int, policy: str = "lru", pinned: Iterable[str] = ()):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy '{policy}', expected one of {POLICIES}.")
+        self.budget_bytes = budget_bytes
+        self.policy = policy
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._uses: Dict[str, int] = {}
+        self._pinned = set(pinned)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Returns the entry for `name` and records the access, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._uses[name] += 1
+            self._entries.move_to_end(name)
+            return entry
+
+    def peek(self, name: str) -> Optional[Dict[str, Any]]:
+        """Returns the entry for `name` without counting it as an access."""
+        return self._entries.get(name)
+
+    def put(self, name: str, entry: Dict[str, Any], size_bytes: int) -> List[str]:
+        """Stores an entry and returns the names of the entries evicted to make room for it."""
+        with self._lock:
+            if name in self._entries:
+                self._remove(name)
+            self._entries[name] = entry
+            self._sizes[name] = size_bytes
+            self._uses[name] = 1
+            evicted = []
+            while self.total_bytes > self.budget_bytes:
+                victim = self._victim(exclude=name)
+                if victim is None:
+                    break
+                self._remove(victim)
+                self.evictions += 1
+                evicted.append(victim)
+            return evicted
+
+    def remove(self, name: str) -> bool:
+        """Drops an entry regardless of pinning. Returns False if it was not cached."""
+        with self._lock:
+            if name not in self._entries:
+                return False
+            self._remove(name)
+            return True
+
+    def pin(self, name: str):
+        """Protects `name` from eviction, whether or not it is currently loaded."""
+        with self._lock:
+            self._pinned.add(name)
+
+    def unpin(self, name: str):
+        with self._lock:
+            self._pinned.discard(name)
+
+    def is_pinned(self, name: str) -> bool:
+        return name in self._pinned
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "budget_bytes": self.budget_bytes,
+                "used_bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "models": {
+                    name: {"size_bytes": self._sizes[name], "uses": self._uses[name], "pinned": name in self._pinned}
+                    for name in self._entries
+                }
+            }
+
+    def _victim(self, exclude: str) -> Optional[str]:
+        # Entries are kept in recency order, oldest first.
+        candidates = [name for name in self._entries if name != exclude and name not in self._pinned]
+        if not candidates:
+            return None
+        if self.policy == "lfu":
+            return min(candidates, key=lambda name: self._uses[name])
+        return candidates[0]
+
+    def _remove(self, name: str):
+        del self._entries[name]
+        del self._sizes[name]
+        del self._uses[name]
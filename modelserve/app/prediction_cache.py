@@ -0,0 +1,80 @@
+import time
+import hashlib
+import threading
+import torch
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from explanation_cache import digest_tensor
+
+
+def prediction_key(model_name: str, serving_checksum: str, backend: str, data: torch.Tensor) -> str:
+    """
+    Key of the predictions of a whole input: the model, the exact weights and
+    execution backend serving it, and the dtype, shape and contents of the input.
+    """
+    key = hashlib.blake2b(f"{model_name}:{serving_checksum}:{backend}:".encode(), digest_size=16)
+    key.update(digest_tensor(data))
+    return key.hexdigest()
+
+
+class PredictionCache:
+    """
+    Short-lived cache of the predictions of recent inputs.
+
+    Entries expire `ttl_seconds` after they were stored, and the least recently
+    used ones are evicted once the cache holds more than `max_bytes`. An expired
+    entry is dropped when it is next looked up.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, torch.Tensor]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key: str) -> Optional[torch.Tensor]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: torch.Tensor):
+        size = value.numel() * value.element_size()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired
+            }
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= value.numel() * value.element_size()
@@ -0,0 +1,224 @@
+import os
+import csv
+import sys
+import json
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Fitted preprocessing of a model, stored next to model.pt and referenced from
+# config.json as "preprocessing": "<file name>"
+DEFAULT_PREPROCESSING_FILE = "preprocessing.json"
+COLUMN_KINDS = ("numeric", "onehot", "ordinal")
+
+
+def preprocessing_path(model_path: str, config: dict) -> Optional[str]:
+    name = config.get("preprocessing")
+    return None if name is None else os.path.join(os.path.dirname(model_path), name)
+
+
+def load_preprocessor(model_path: str, config: dict) -> Optional["Preprocessor"]:
+    """Loads the preprocessing referenced by a model config, or returns None when the model takes encoded inputs."""
+    path = preprocessing_path(model_path, config)
+    if path is None:
+        return None
+    with open(path, "r") as f:
+        return Preprocessor(json.load(f))
+
+
+def with_preprocessing(preprocessor: Optional["Preprocessor"], forward: Callable[[torch.Tensor], torch.Tensor]) -> Callable[[torch.Tensor], torch.Tensor]:
+    """Puts the preprocessing in front of a forward function, so it runs once per batch."""
+    if preprocessor is None:
+        return forward
+    def preprocessed(data: torch.Tensor) -> torch.Tensor:
+        return forward(preprocessor(data))
+    return preprocessed
+
+
+class Preprocessor(nn.Module):
+    """
+    The fitted preprocessing of the input columns of a model, run as tensor ops on whole batches.
+
+    The spec lists the columns in input order, each one of:
+      {"name": ..., "kind": "numeric", "mean": ..., "std": ..., "fill": ...}
+      {"name": ..., "kind": "onehot", "categories": [...], "fill": ...}
+      {"name": ..., "kind": "ordinal", "categories": [...], "fill": ...}
+    Numeric columns are standardized and their missing values replaced by `fill`
+    (the mean by default). Categorical columns are encoded by their index in
+    `categories`, as one indicator per category or as a single ordinal feature;
+    missing and unknown values take the `fill` category, or no category at all
+    (all indicators off, ordinal -1) without one.
+
+    Raw rows are first coded by `encode_rows` into a float matrix with one column
+    per input column: numbers as they are, categories as their index and missing
+    or unknown values as NaN. `forward` maps that matrix to the features of the
+    network with the same few ops whatever the number of columns.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        super().__init__()
+        columns = spec.get("columns")
+        if not isinstance(columns, list) or not columns:
+            raise ValueError("Preprocessing spec must have a non-empty 'columns' list")
+        self.names: List[str] = []
+        self.feature_names: List[str] = []
+        # Per column, the category codes of a categorical column, None for a numeric one
+        self._lookups: List[Optional[Dict[str, int]]] = []
+        fill, shift, scale = [], [], []
+        onehot_source, onehot_code, output_index = [], [], []
+        for i, column in enumerate(columns):
+            name = str(column.get("name", i))
+            kind = column.get("kind", "numeric")
+            if kind not in COLUMN_KINDS:
+                raise ValueError(f"Column '{name}' has unknown kind '{kind}', expected one of {list(COLUMN_KINDS)}")
+            self.names.append(name)
+            if kind == "numeric":
+                mean, std = float(column.get("mean", 0.0)), float(column.get("std", 1.0))
+                fill.append(float(column.get("fill", mean)))
+                shift.append(mean)
+                scale.append(std if std > 0 else 1.0)
+                self._lookups.append(None)
+                output_index.append(i)
+                self.feature_names.append(name)
+                continue
+
+            categories = [str(category) for category in column.get("categories", [])]
+            if not categories:
+                raise ValueError(f"Column '{name}' must list its categories")
+            lookup = {category: code for code, category in enumerate(categories)}
+            if column.get("fill") is not None and str(column["fill"]) not in lookup:
+                raise ValueError(f"Fill value '{column['fill']}' of column '{name}' is not one of its categories")
+            fill.append(float(lookup[str(column["fill"])]) if column.get("fill") is not None else -1.0)
+            shift.append(0.0)
+            scale.append(1.0)
+            self._lookups.append(lookup)
+            if kind == "ordinal":
+                output_index.append(i)
+                self.feature_names.append(name)
+            else:
+                for code, category in enumerate(categories):
+                    # Indicators come after the coded columns in the concatenated matrix
+                    output_index.append(len(columns) + len(onehot_source))
+                    onehot_source.append(i)
+                    onehot_code.append(float(code))
+                    self.feature_names.append(f"{name}={category}")
+
+        self.register_buffer("fill", torch.tensor(fill, dtype=torch.float32))
+        self.register_buffer("shift", torch.tensor(shift, dtype=torch.float32))
+        self.register_buffer("scale", torch.tensor(scale, dtype=torch.float32))
+        self.register_buffer("onehot_source", torch.tensor(onehot_source, dtype=torch.long))
+        self.register_buffer("onehot_code", torch.tensor(onehot_code, dtype=torch.float32))
+        self.register_buffer("output_index", torch.tensor(output_index, dtype=torch.long))
+
+    @property
+    def n_columns(self) -> int:
+        return len(self.names)
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+    def encode_rows(self, rows: Sequence[Any]) -> torch.Tensor:
+        """
+        Codes raw rows, either lists of values in column order or objects keyed by
+        column name, into the float matrix taken by `forward`.
+        """
+        listed = []
+        for row in rows:
+            if isinstance(row, dict):
+                listed.append([row.get(name) for name in self.names])
+            elif isinstance(row, (list, tuple)) and len(row) == self.n_columns:
+                listed.append(row)
+            else:
+                raise ValueError(f"Rows must be objects keyed by column name or lists of {self.n_columns} values")
+        columns = [[row[i] for row in listed] for i in range(self.n_columns)]
+
+        coded = np.empty((len(rows), self.n_columns), dtype=np.float32)
+        for i, (name, values, lookup) in enumerate(zip(self.names, columns, self._lookups)):
+            if lookup is None:
+                try:
+                    coded[:, i] = np.array([np.nan if value == "" else value for value in values], dtype=np.float32)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Column '{name}' must hold numbers")
+            else:
+                coded[:, i] = [np.nan if value is None else lookup.get(str(value), np.nan) for value in values]
+        return torch.from_numpy(coded)
+
+    def forward(self, data: torch.Tensor) -> torch.Tensor:
+        data = data.to(torch.float32)
+        filled = torch.where(torch.isnan(data), self.fill, data)
+        scaled = (filled - self.shift) / self.scale
+        indicators = (filled[:, self.onehot_source] == self.onehot_code).to(scaled.dtype)
+        return torch.cat([scaled, indicators], dim=1)[:, self.output_index]
+
+
+def read_records(path: str) -> List[Dict[str, Any]]:
+    """Reads a CSV file with a header or an NDJSON file of objects into a list of records."""
+    with open(path, "r", newline="") as f:
+        if path.lower().endswith(".csv"):
+            return [dict(record) for record in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def fit_preprocessing(records: List[Dict[str, Any]], numeric: Sequence[str] = (), onehot: Sequence[str] = (),
+                      ordinal: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+    """
+    Fits the preprocessing spec of the given columns on training records: the
+    mean and standard deviation of numeric columns, which also fill their missing
+    values, and the categories of one-hot columns, filled with the most frequent
+    one. Ordinal columns are given with their categories in order.
+    Columns are laid out numeric first, then one-hot, then ordinal.
+    """
+    def present(name: str) -> List[Any]:
+        return [record.get(name) for record in records if record.get(name) not in (None, "")]
+
+    columns = []
+    for name in numeric:
+        values = np.array(present(name), dtype=np.float64)
+        if len(values) == 0:
+            raise ValueError(f"Column '{name}' has no values")
+        mean = float(values.mean())
+        columns.append({"name": name, "kind": "numeric", "mean": mean, "std": float(values.std()), "fill": mean})
+    for name in onehot:
+        values = [str(value) for value in present(name)]
+        if not values:
+            raise ValueError(f"Column '{name}' has no values")
+        categories, counts = np.unique(values, return_counts=True)
+        columns.append({"name": name, "kind": "onehot", "categories": categories.tolist(), "fill": str(categories[counts.argmax()])})
+    for name, categories in (ordinal or {}).items():
+        columns.append({"name": name, "kind": "ordinal", "categories": list(categories)})
+    return {"columns": columns}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Fits the input preprocessing of a model on its training dataset and references it from its config.json.")
+    parser.add_argument("dataset", help="Training dataset, as a .csv file with a header or an .ndjson file of objects")
+    parser.add_argument("model_dir", help="Directory holding the model.pt and config.json of the model")
+    parser.add_argument("--numeric", nargs="*", default=[], help="Columns to standardize")
+    parser.add_argument("--onehot", nargs="*", default=[], help="Columns to one-hot encode")
+    parser.add_argument("--ordinal", nargs="*", default=[], metavar="COLUMN=A,B,C", help="Columns to encode by the rank of their categories")
+    args = parser.parse_args(argv)
+
+    ordinal = {}
+    for column in args.ordinal:
+        name, _, categories = column.partition("=")
+        ordinal[name] = categories.split(",")
+    spec = fit_preprocessing(read_records(args.dataset), args.numeric, args.onehot, ordinal)
+    path = os.path.join(args.model_dir, DEFAULT_PREPROCESSING_FILE)
+    with open(path, "w") as f:
+        json.dump(spec, f, indent=2)
+
+    config_path = os.path.join(args.model_dir, "config.json")
+    if os.path.exists(config_path):
+        with open(config_path, "r") as f:
+            config = json.load(f)
+        config["preprocessing"] = DEFAULT_PREPROCESSING_FILE
+        with open(config_path, "w") as f:
+            json.dump(config, f, indent=2)
+    print(f"Saved the preprocessing of {len(spec['columns'])} columns to {path}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
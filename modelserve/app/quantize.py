@@ -0,0 +1,122 @@
+import os
+import copy
+import hashlib
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+from typing import Any, Dict, List, Optional, Tuple
+
+from loader import file_checksum
+
+QUANTIZATION_MODES = ("dynamic", "static")
+# Stored sample of inputs, next to model.pt, used to calibrate and check the quantized network
+DEFAULT_CALIBRATION_FILE = "calibration.npy"
+# Share of calibration rows on which the quantized network must predict the same class
+DEFAULT_MIN_AGREEMENT = 0.99
+
+
+def calibration_path(model_path: str, quantization: Dict[str, Any]) -> str:
+    return os.path.join(os.path.dirname(model_path), quantization.get("calibration", DEFAULT_CALIBRATION_FILE))
+
+
+def load_calibration(path: str) -> torch.Tensor:
+    """Loads a calibration sample saved as a 2-D .npy array of input rows."""
+    array = np.load(path, allow_pickle=False)
+    if array.ndim != 2:
+        raise ValueError(f"Calibration sample '{path}' must be a 2-D array, got shape {array.shape}")
+    return torch.from_numpy(array.astype(np.float32, copy=False))
+
+
+def _fusable_groups(model: nn.Module) -> List[List[str]]:
+    """Names of the consecutive Linear and ReLU pairs in the sequential containers of a model."""
+    groups = []
+    for name, module in model.named_modules():
+        if not isinstance(module, nn.Sequential):
+            continue
+        children = list(module.named_children())
+        prefix = f"{name}." if name else ""
+        for (first, first_module), (second, second_module) in zip(children, children[1:]):
+            if isinstance(first_module, nn.Linear) and isinstance(second_module, nn.ReLU):
+                groups.append([prefix + first, prefix + second])
+    return groups
+
+
+def quantize_model(model: nn.Module, mode: str, calibration: Optional[torch.Tensor] = None) -> nn.Module:
+    """
+    Returns an int8 copy of a model, leaving the fp32 model untouched.
+
+    'dynamic' stores the linear weights as int8 and quantizes activations on the
+    fly. 'static' also runs the activations in int8, with scales observed on the
+    `calibration` rows, after fusing each Linear with the ReLU that follows it.
+    """
+    # torch.ao.quantization is deprecated upstream in favour of torchao, which is not a dependency here
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from torch.ao import quantization
+
+        if mode == "dynamic":
+            return quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        if mode != "static":
+            raise ValueError(f"Unknown quantization mode '{mode}', expected one of {list(QUANTIZATION_MODES)}")
+        if calibration is None:
+            raise ValueError("Static quantization needs a calibration sample")
+
+        fused = quantization.fuse_modules(copy.deepcopy(model), _fusable_groups(model))
+        wrapped = quantization.QuantWrapper(fused).eval()
+        wrapped.qconfig = quantization.get_default_qconfig(torch.backends.quantized.engine)
+        quantization.prepare(wrapped, inplace=True)
+        with torch.inference_mode():
+            wrapped(calibration)
+        return quantization.convert(wrapped, inplace=True)
+
+
+def compare_outputs(reference: nn.Module, quantized: nn.Module, calibration: torch.Tensor) -> Dict[str, float]:
+    """Top-1 agreement and largest absolute output difference between two networks on the same rows."""
+    with torch.inference_mode():
+        expected = reference(calibration)
+        actual = quantized(calibration)
+    return {
+        "agreement": (expected.argmax(dim=1) == actual.argmax(dim=1)).float().mean().item(),
+        "max_abs_error": (expected - actual).abs().max().item()
+    }
+
+
+def quantize_checked(model: nn.Module, quantization: Dict[str, Any], model_path: str) -> Tuple[Optional[nn.Module], Dict[str, Any]]:
+    """
+    Quantizes a model as described by the "quantization" section of its config
+    and checks it against the fp32 model on the stored calibration sample.
+
+    Returns the quantized model, or None if it could not be checked or was not
+    accurate enough, along with a report of the check. The section holds 'mode',
+    optionally 'calibration' (file name next to model.pt), 'min_agreement' and
+    'max_abs_error'.
+    """
+    mode = quantization.get("mode", "dynamic")
+    report = {"mode": mode, "enabled": False}
+    path = calibration_path(model_path, quantization)
+    if not os.path.exists(path):
+        report["reason"] = f"calibration sample '{os.path.basename(path)}' not found"
+        return None, report
+
+    calibration = load_calibration(path)
+    quantized = quantize_model(model, mode, calibration)
+    report.update(compare_outputs(model, quantized, calibration))
+
+    min_agreement = quantization.get("min_agreement", DEFAULT_MIN_AGREEMENT)
+    max_abs_error = quantization.get("max_abs_error")
+    if report["agreement"] < min_agreement:
+        report["reason"] = f"top-1 agreement {report['agreement']:.4f} below {min_agreement}"
+    elif max_abs_error is not None and report["max_abs_error"] > max_abs_error:
+        report["reason"] = f"max absolute error {report['max_abs_error']:.4g} above {max_abs_error}"
+    else:
+        report["enabled"] = True
+        return quantized, report
+    return None, report
+
+
+def quantized_checksum(weights_checksum: str, quantization: Dict[str, Any], model_path: str) -> str:
+    """Identifies a quantized network by its fp32 weights, quantization mode and calibration sample."""
+    digest = hashlib.sha256(f"{weights_checksum}:{quantization.get('mode', 'dynamic')}:".encode())
+    digest.update(file_checksum(calibration_path(model_path, quantization)).encode())
+    return digest.hexdigest()
@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+import asyncio
+import httpx
+from collections import OrderedDict
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Add the app directory to the python path to allow for absolute imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from hashring import HashRing
+
+# --- Configuration ---
+# Base URLs of the modelserve replicas, comma separated (e.g. http://localhost:8001,http://localhost:8002).
+MODELSERVE_REPLICAS = [url.strip().rstrip("/") for url in os.getenv("MODELSERVE_REPLICAS", "").split(",") if url.strip()]
+# Each model is served by ROUTER_REPLICATION replicas, picked by consistent hashing of its name
+# over ROUTER_VIRTUAL_NODES points per replica, so only the models of a replica that joins or
+# leaves move. Requests for a model go to whichever of its replicas has the fewest in flight.
+ROUTER_REPLICATION = int(os.getenv("ROUTER_REPLICATION", 2))
+ROUTER_VIRTUAL_NODES = int(os.getenv("ROUTER_VIRTUAL_NODES", 128))
+# Replicas are health-checked every ROUTER_HEALTH_INTERVAL seconds on their readiness probe. A
+# replica that does not answer, or is not ready yet, leaves the ring until it is ready again.
+ROUTER_HEALTH_INTERVAL = float(os.getenv("ROUTER_HEALTH_INTERVAL", 5))
+ROUTER_HEALTH_PATH = os.getenv("ROUTER_HEALTH_PATH", "/ready")
+ROUTER_TIMEOUT = float(os.getenv("ROUTER_TIMEOUT", 300))
+# The replica of an explanation job is remembered for ROUTER_JOB_TTL seconds, as long as
+# modelserve keeps the job (EXPLAIN_JOB_TTL).
+ROUTER_JOB_TTL = float(os.getenv("ROUTER_JOB_TTL", 24 * 3600))
+
+# Headers that only apply to one connection and are not forwarded
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "host", "content-length"}
+
+# --- Global State ---
+app = FastAPI(title="Anemone Model Forge - Model Router")
+# Every configured replica, healthy or not, and the ring of the healthy ones
+replicas: Dict[str, Dict[str, Any]] = {}
+ring = HashRing(virtual_nodes=ROUTER_VIRTUAL_NODES)
+# Model names of the replica catalogs, to report which models moved on a ring change
+known_models: Set[str] = set()
+# Explanation jobs live on the replica that accepted them: job id -> (replica, expiry), oldest first
+job_replicas: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+client: Optional[httpx.AsyncClient] = None
+background_tasks: List[asyncio.Task] = []
+
+
+class ReplicaRequest(BaseModel):
+    url: str
+
+# --- Core Logic ---
+
+def add_replica(url: str) -> Dict[str, List[str]]:
+    """Registers a replica and puts it on the ring; returns the models that moved."""
+    replicas.setdefault(url, {"healthy": True, "in_flight": 0, "requests": 0, "errors": 0})
+    replicas[url]["healthy"] = True
+    return update_ring(lambda: ring.add(url))
+
+
+def remove_replica(url: str) -> Dict[str, List[str]]:
+    """Takes a replica off the ring; returns the models that moved."""
+    return update_ring(lambda: ring.remove(url))
+
+
+def update_ring(change) -> Dict[str, List[str]]:
+    before = ring.assignments(known_models, ROUTER_REPLICATION)
+    change()
+    after = ring.assignments(known_models, ROUTER_REPLICATION)
+    moved = {name: after[name] for name in known_models if before[name] != after[name]}
+    if moved:
+        print(f"Ring now has {len(ring)} replicas, reassigned models: {moved}")
+    return moved
+
+
+def mark_unhealthy(url: str):
+    if url in replicas and replicas[url]["healthy"]:
+        replicas[url]["healthy"] = False
+        print(f"Replica '{url}' is unreachable, taking it off the ring.")
+        remove_replica(url)
+
+
+def owners(model_name: str) -> List[str]:
+    """Replicas serving a model, the least busy first; ties keep the ring order, primary first."""
+    assigned = ring.owners(model_name, ROUTER_REPLICATION)
+    if not assigned:
+        raise HTTPException(status_code=503, detail="No modelserve replica is available.")
+    return sorted(assigned, key=lambda url: replicas[url]["in_flight"])
+
+
+async def check_replicas():
+    """Health-checks every configured replica, taking unreachable ones off the ring and putting recovered ones back."""
+    async def check(url: str):
+        try:
+            response = await client.get(url + ROUTER_HEALTH_PATH, timeout=min(ROUTER_TIMEOUT, 5))
+            healthy = response.status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+        if healthy and url not in ring:
+            print(f"Replica '{url}' is reachable, putting it on the ring.")
+            add_replica(url)
+        elif not healthy:
+            mark_unhealthy(url)
+    await asyncio.gather(*(check(url) for url in list(replicas)))
+
+
+def remember_job(job_id: str, url: str):
+    """Records the replica of a job, forgetting expired jobs."""
+    now = time.monotonic()
+    while job_replicas and next(iter(job_replicas.values()))[1] <= now:
+        job_replicas.popitem(last=False)
+    job_replicas[job_id] = (url, now + ROUTER_JOB_TTL)
+    job_replicas.move_to_end(job_id)
+
+
+def job_replica(job_id: str) -> Optional[str]:
+    url, expires_at = job_replicas.get(job_id, (None, 0.0))
+    return url if expires_at > time.monotonic() and url in replicas else None
+
+
+async def refresh_known_models():
+    """Takes the model names from the catalog of a replica; replicas share a model directory."""
+    for url in ring.nodes:
+        listing = await fetch_json(url, "/models")
+        if listing is not None:
+            known_models.clear()
+            known_models.update(model["name"] for model in listing)
+            return
+
+
+async def watch_replicas():
+    while True:
+        await asyncio.sleep(ROUTER_HEALTH_INTERVAL)
+        try:
+            await check_replicas()
+            await refresh_known_models()
+        except Exception as e:
+            print(f"Could not check the replicas: {e}")
+
+
+def forwarded_headers(headers) -> Dict[str, str]:
+    return {name: value for name, value in headers.items() if name.lower() not in HOP_HEADERS}
+
+
+async def proxy(request: Request, targets: List[str], path: str, buffered: bool = True) -> Response:
+    """
+    Forwards a request to the first reachable replica of `targets` and streams its
+    response back. Buffered bodies are retried on the next target when a replica
+    cannot be reached; streamed bodies can only be sent once.
+    """
+    body = await request.body() if buffered else request.stream()
+    headers = forwarded_headers(request.headers)
+    last_error = None
+    for url in targets if buffered else targets[:1]:
+        replica = replicas[url]
+        replica["in_flight"] += 1
+        replica["requests"] += 1
+        try:
+            upstream = client.build_request(request.method, url + path, params=request.query_params, headers=headers, content=body)
+            response = await client.send(upstream, stream=True)
+        except httpx.TransportError as e:
+            replica["in_flight"] -= 1
+            replica["errors"] += 1
+            last_error = e
+            if isinstance(e, httpx.ConnectError):
+                mark_unhealthy(url)
+            continue
+
+        async def relay(response=response, replica=replica):
+            try:
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+            finally:
+                await response.aclose()
+                replica["in_flight"] -= 1
+        # The body is relayed decoded
+        response_headers = {**forwarded_headers(response.headers), "X-Served-By": url}
+        response_headers.pop("content-encoding", None)
+        return StreamingResponse(relay(), status_code=response.status_code, headers=response_headers)
+    raise HTTPException(status_code=502, detail=f"No replica could be reached: {last_error}")
+
+
+async def fetch_json(url: str, path: str) -> Optional[Any]:
+    try:
+        response = await client.get(url + path, timeout=min(ROUTER_TIMEOUT, 10))
+        response.raise_for_status()
+        return response.json()
+    except (httpx.HTTPError, ValueError):
+        return None
+
+# --- FastAPI Events ---
+
+@app.on_event("startup")
+async def startup_event():
+    """Put the configured replicas on the ring and start health-checking them."""
+    global client
+    if client is None:
+        client = httpx.AsyncClient(timeout=ROUTER_TIMEOUT)
+    for url in MODELSERVE_REPLICAS:
+        add_replica(url)
+    background_tasks.append(asyncio.create_task(watch_replicas()))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop health-checking and close the connections to the replicas."""
+    global client
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
+    if client is not None:
+        await client.aclose()
+        client = None
+
+# --- API Endpoints ---
+
+@app.get("/replicas")
+async def get_replicas():
+    """Get the health, load and number of assigned models of every replica."""
+    assignments = ring.assignments(known_models, ROUTER_REPLICATION)
+    return {
+        "replication": ROUTER_REPLICATION,
+        "replicas": {
+            url: {**state, "models": sorted(name for name, assigned in assignments.items() if url in assigned)}
+            for url, state in replicas.items()
+        }
+    }
+
+
+@app.post("/replicas")
+async def join_replica(replica: ReplicaRequest):
+    """Add a replica to the ring. Returns the models that moved, with their new replicas."""
+    return {"url": replica.url, "moved": add_replica(replica.url.rstrip("/"))}
+
+
+@app.delete("/replicas")
+async def leave_replica(url: str):
+    """Take a replica off the ring and stop health-checking it, e.g. before shutting it down."""
+    url = url.rstrip("/")
+    if url not in replicas:
+        raise HTTPException(status_code=404, detail=f"Replica '{url}' not found.")
+    moved = remove_replica(url)
+    del replicas[url]
+    return {"url": url, "moved": moved}
+
+
+@app.get("/models")
+async def get_models_list(refresh: bool = False):
+    """
+    Get the models of the replicas, each with the replicas it is assigned to and
+    those that currently have it loaded. Replicas are expected to share a model
+    directory, so the catalog of every replica is the same.
+    """
+    urls = list(ring.nodes)
+    path = "/models?refresh=true" if refresh else "/models"
+    listings = await asyncio.gather(*(fetch_json(url, path) for url in urls))
+    models: Dict[str, Dict[str, Any]] = {}
+    for url, listing in zip(urls, listings):
+        for model in listing or []:
+            entry = models.setdefault(model["name"], {**model, "loaded_on": []})
+            if model.get("status") == "loaded":
+                entry["loaded_on"].append(url)
+    if any(listing is not None for listing in listings):
+        known_models.clear()
+        known_models.update(models)
+    for name, entry in models.items():
+        entry["replicas"] = ring.owners(name, ROUTER_REPLICATION)
+        # The status of the model on its own replicas, not on whichever answered first
+        entry["status"] = "loaded" if entry["loaded_on"] else "available"
+    return list(models.values())
+
+
+@app.post("/predict/{model_name}")
+async def predict(model_name: str, request: Request):
+    return await proxy(request, owners(model_name), f"/predict/{model_name}")
+
+
+@app.post("/predict/{model_name}/stream")
+async def predict_stream(model_name: str, request: Request):
+    return await proxy(request, owners(model_name), f"/predict/{model_name}/stream", buffered=False)
+
+
+@app.post("/explain/{model_name}")
+async def explain(model_name: str, request: Request):
+    response = await proxy(request, owners(model_name), f"/explain/{model_name}")
+    location = response.headers.get("location", "")
+    if response.status_code == 202 and location.startswith("/jobs/"):
+        remember_job(location.removeprefix("/jobs/"), response.headers["x-served-by"])
+    return response
+
+
+@app.api_route("/jobs/{job_id}", methods=["GET", "DELETE"])
+@app.api_route("/jobs/{job_id}/result", methods=["GET"])
+async def job(job_id: str, request: Request):
+    """Forward a job request to the replica that accepted the job."""
+    url = job_replica(job_id)
+    if url is None:
+        # Accepted before a router restart: ask every replica
+        for candidate in ring.nodes:
+            if await fetch_json(candidate, f"/jobs/{job_id}") is not None:
+                url = candidate
+                remember_job(job_id, url)
+                break
+        else:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return await proxy(request, [url], request.url.path)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    # To run this, use uvicorn from the 'modelserve' directory:
+    # MODELSERVE_REPLICAS=http://localhost:8001,http://localhost:8002 uvicorn app.router:app --port 8000
+    uvicorn.run("router:app", host="0.0.0.0", port=8000)
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key onto a single in-flight task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and receive the same result or exception.
+    The task is shielded, so a caller being cancelled (e.g. a client
+    disconnecting) does not cancel the work for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Retrieve the exception so it is not reported as never retrieved
+        # when every caller has been cancelled.
+        if not task.cancelled():
+            task.exception()
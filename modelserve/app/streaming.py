@@ -0,0 +1,158 @@
+import asyncio
+import csv
+import json
+import tempfile
+import torch
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+FORMATS = {NDJSON_MEDIA_TYPE: "ndjson", CSV_MEDIA_TYPE: "csv"}
+FILE_FORMATS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse calling `on_close` once the response is over, however it ended.
+
+    The stock StreamingResponse consumes receive() to watch for client
+    disconnects on older ASGI servers, and only runs its background task when
+    the response completes. Here a disconnect surfaces when sending fails.
+    """
+
+    def __init__(self, content, on_close: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_file(path: str, chunk_bytes: int = 1 << 20) -> AsyncIterator[bytes]:
+    """Reads a file in chunks without blocking the event loop."""
+    with open(path, "rb") as f:
+        async for chunk in iter_fileobj(f, chunk_bytes):
+            yield chunk
+
+
+async def iter_fileobj(f: IO[bytes], chunk_bytes: int = 1 << 20) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await asyncio.to_thread(f.read, chunk_bytes)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def spool_stream(stream: AsyncIterator[bytes], max_memory_bytes: int) -> IO[bytes]:
+    """
+    Reads a whole request body into a temporary file, kept in memory up to
+    `max_memory_bytes`, and returns it rewound.
+
+    HTTP/1.1 clients commonly upload the whole body before reading the
+    response, so a server writing a large response while still reading the
+    body deadlocks with them once the socket buffers are full.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory_bytes)
+    try:
+        async for chunk in stream:
+            await asyncio.to_thread(spool.write, chunk)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+
+async def iter_line_chunks(stream: AsyncIterator[bytes], chunk_rows: int) -> AsyncIterator[List[bytes]]:
+    """Splits a byte stream into lines and groups them into chunks of `chunk_rows` non-empty lines."""
+    remainder = b""
+    lines: List[bytes] = []
+    async for data in stream:
+        parts = (remainder + data).split(b"\n")
+        remainder = parts.pop()
+        lines.extend(part for part in parts if part.strip())
+        while len(lines) >= chunk_rows:
+            yield lines[:chunk_rows]
+            lines = lines[chunk_rows:]
+    if remainder.strip():
+        lines.append(remainder)
+    if lines:
+        yield lines
+
+
+def read_rows(lines: List[bytes], fmt: str) -> List[Any]:
+    """Reads a chunk of NDJSON values or CSV records, the latter as lists of strings."""
+    if fmt == "ndjson":
+        return [json.loads(line) for line in lines]
+    return list(csv.reader(line.decode("utf-8") for line in lines))
+
+
+def parse_rows(lines: List[bytes], fmt: str, skip_header: bool = False) -> torch.Tensor:
+    """
+    Parses a chunk of NDJSON arrays or CSV records into a float tensor.
+    With `skip_header`, a first CSV line that is not numeric is treated as a header and dropped.
+    """
+    rows = read_rows(lines, fmt)
+    if fmt == "csv":
+        if skip_header and rows:
+            try:
+                [float(value) for value in rows[0]]
+            except ValueError:
+                rows = rows[1:]
+        rows = [[float(value) for value in row] for row in rows]
+    return torch.tensor(rows, dtype=torch.float32).reshape(len(rows), -1)
+
+
+async def score_stream(
+    chunks: AsyncIterator[List[bytes]],
+    fmt: str,
+    forward: Callable[[torch.Tensor], Awaitable[torch.Tensor]],
+    parse_chunk: Callable[[List[bytes], str, bool], torch.Tensor] = parse_rows,
+) -> AsyncIterator[bytes]:
+    """
+    Scores chunks of rows and yields the predictions as NDJSON, one line per row.
+
+    Parsing the next chunk runs concurrently with inference on the current one;
+    the queue between the two holds a single parsed chunk, so at most a couple
+    of chunks are in memory at any time. An error ends the stream with a final
+    {"error": ...} line, since the response status has already been sent.
+    """
+    parsed: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def parse():
+        first = True
+        try:
+            async for lines in chunks:
+                await parsed.put(await asyncio.to_thread(parse_chunk, lines, fmt, first))
+                first = False
+        except Exception as e:
+            await parsed.put(e)
+        else:
+            await parsed.put(None)
+
+    parser = asyncio.create_task(parse())
+    try:
+        while True:
+            item = await parsed.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            if len(item) == 0:
+                continue
+            predictions = await forward(item)
+            yield "".join(json.dumps(row) + "\n" for row in predictions.tolist()).encode()
+    except Exception as e:
+        yield (json.dumps({"error": str(e)}) + "\n").encode()
+    finally:
+        parser.cancel()
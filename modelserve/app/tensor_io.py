@@ -0,0 +1,82 @@
+import io
+import numpy as np
+import torch
+from typing import Dict, Optional
+
+NPY_MEDIA_TYPE = "application/x-npy"
+NPZ_MEDIA_TYPE = "application/x-npz"
+# Magic string, version and header length fields plus the largest version 1.0 header.
+MAX_HEADER_BYTES = 12 + 65535
+
+TORCH_DTYPES = {
+    "float16": torch.float16,
+    "float32": torch.float32,
+    "float64": torch.float64,
+    "int8": torch.int8,
+    "int16": torch.int16,
+    "int32": torch.int32,
+    "int64": torch.int64,
+    "uint8": torch.uint8,
+    "bool": torch.bool,
+}
+
+
+def decode_npy(buffer: bytearray) -> torch.Tensor:
+    """
+    Wraps the array stored in a .npy buffer into a tensor without copying it.
+
+    Only C-ordered, little-endian (or single byte) arrays are accepted, which is
+    what numpy writes on every common platform.
+    """
+    # Only the header is copied to be parsed; the data stays in `buffer`.
+    header = io.BytesIO(memoryview(buffer)[:MAX_HEADER_BYTES])
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    if fortran_order:
+        raise ValueError("Fortran-ordered arrays are not supported.")
+    if dtype.byteorder == ">":
+        raise ValueError("Big-endian arrays are not supported.")
+    torch_dtype = TORCH_DTYPES.get(dtype.name)
+    if torch_dtype is None:
+        raise ValueError(f"Unsupported array dtype '{dtype}'.")
+
+    count = int(np.prod(shape))
+    if count == 0:
+        return torch.empty(shape, dtype=torch_dtype)
+    return torch.frombuffer(buffer, dtype=torch_dtype, count=count, offset=header.tell()).reshape(shape)
+
+
+def as_model_input(data: torch.Tensor, n_features: Optional[int]) -> torch.Tensor:
+    """
+    Checks that a decoded input is a batch of rows of `n_features` numbers, when
+    known, or a single unbatched row of them, and casts it to float32, the dtype
+    models are served in.
+    """
+    if data.is_complex() or data.dtype == torch.bool:
+        raise ValueError(f"Expected a float32 array, got {data.dtype}")
+    if data.dim() not in (1, 2) or (n_features is not None and data.shape[-1] != n_features):
+        expected = f"(rows, {n_features}) or ({n_features},)" if n_features is not None else "(rows, features)"
+        raise ValueError(f"Expected an array of shape {expected}, got {tuple(data.shape)}")
+    return data.to(torch.float32)
+
+
+def encode_npy(tensor: torch.Tensor) -> bytes:
+    """Serializes a tensor as a .npy buffer."""
+    buffer = io.BytesIO()
+    np.save(buffer, tensor.detach().cpu().numpy(), allow_pickle=False)
+    return buffer.getvalue()
+
+
+def encode_npz(arrays: Dict[str, Optional[np.ndarray]]) -> bytes:
+    """Serializes named arrays as an uncompressed .npz archive, skipping missing ones."""
+    buffer = io.BytesIO()
+    np.savez(buffer, **{name: array for name, array in arrays.items() if array is not None})
+    return buffer.getvalue()
+
+
+def decode_npz(buffer: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(buffer), allow_pickle=False) as archive:
+        return {name: archive[name] for name in archive.files}
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import threading
+import torch
+import torch.multiprocessing as mp
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from loader import load_weights, build_model, load_explainers
+from compiled import load_compiled
+from executors import model_threads
+from quantize import quantize_model, load_calibration, calibration_path
+from preprocessing import load_preprocessor, with_preprocessing
+
+# --- Worker process side ---
+# Each worker keeps its own small LRU of models. Weights are memory-mapped from
+# the model files, so every worker holding a model shares the same physical
+# pages through the page cache instead of keeping a private copy.
+
+_worker_models: "OrderedDict[Tuple[str, str, int, Optional[str], bool], Dict[str, Any]]" = OrderedDict()
+_worker_model_slots = 1
+_worker_threads = 1
+
+
+def _init_worker(threads: int, model_slots: int):
+    global _worker_model_slots, _worker_threads
+    torch.set_num_threads(threads)
+    _worker_model_slots = model_slots
+    _worker_threads = threads
+
+
+def _worker_model(model_name: str, model_info: Dict[str, Any]) -> Dict[str, Any]:
+    # The modification time recorded by the catalog is part of the key so a replaced model.pt is picked up.
+    key = (
+        model_name, model_info["model_path"], model_info["model_mtime"],
+        model_info.get("compiled_path"), model_info.get("quantization") is not None
+    )
+    if key in _worker_models:
+        _worker_models.move_to_end(key)
+        return _worker_models[key]
+
+    config = model_info["config"]
+    model = build_model(config, load_weights(model_info["model_path"]))
+    # The compiled variant, if any, has been built by the server process when it loaded the model,
+    # and so has the accuracy check of the quantized network.
+    forward = model
+    quantization = model_info.get("quantization")
+    if model_info.get("compiled_path") is not None:
+        forward = load_compiled(model_info["compiled_path"], model_info["compile_backend"])
+    elif quantization is not None:
+        calibration = load_calibration(calibration_path(model_info["model_path"], quantization))
+        forward = quantize_model(model, quantization.get("mode", "dynamic"), calibration)
+    # Explanations are computed on inputs the server process has already preprocessed
+    forward = with_preprocessing(load_preprocessor(model_info["model_path"], config), forward)
+    entry = {"model": model, "forward": forward, "explainers": load_explainers(model_name, config)}
+
+    for stale in [k for k in _worker_models if k[0] == model_name]:
+        del _worker_models[stale]
+    _worker_models[key] = entry
+    while len(_worker_models) > _worker_model_slots:
+        _worker_models.popitem(last=False)
+    return entry
+
+
+def _worker_predict(model_name: str, model_info: Dict[str, Any], data: torch.Tensor) -> torch.Tensor:
+    forward = _worker_model(model_name, model_info)["forward"]
+    torch.set_num_threads(model_threads(model_info["config"], "predict", _worker_threads))
+    with torch.inference_mode():
+        return forward(data)
+
+
+def _worker_explain(model_name: str, model_info: Dict[str, Any], explainer_name: str, data: torch.Tensor, kwargs: Dict[str, Any]) -> dict:
+    entry = _worker_model(model_name, model_info)
+    torch.set_num_threads(model_threads(model_info["config"], "explain", _worker_threads))
+    if explainer_name not in entry["explainers"]:
+        raise ValueError(f"Explainer '{explainer_name}' not available for model '{model_name}'")
+    return entry["explainers"][explainer_name](entry["model"], data, **kwargs)
+
+
+# --- Server process side ---
+
+class WorkerPool:
+    """
+    Dispatches forward passes and explanations to a fixed set of worker processes.
+
+    Each worker is a single-process executor so calls can be routed to a specific
+    process. A model is first sent to its home worker, chosen by rendezvous
+    hashing of the model name, and stays on the workers that already hold it.
+    It only spreads to another worker when every worker holding it has at least
+    `spill_depth` calls queued.
+    """
+
+    def __init__(self, processes: int, threads_per_process: int, model_slots: int = 8, spill_depth: int = 4):
+        # torch's multiprocessing context moves tensors between processes through shared memory.
+        context = mp.get_context("spawn")
+        self._workers = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker, initargs=(threads_per_process, model_slots))
+            for _ in range(processes)
+        ]
+        self.spill_depth = spill_depth
+        self._pending = [0] * processes
+        self._holders: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    async def predict(self, model_name: str, model_info: Dict[str, Any], data: torch.Tensor) -> torch.Tensor:
+        return await self._submit(model_name, _worker_predict, model_name, model_info, data)
+
+    async def explain(self, model_name: str, model_info: Dict[str, Any], explainer_name: str, data: torch.Tensor, **kwargs) -> dict:
+        return await self._submit(model_name, _worker_explain, model_name, model_info, explainer_name, data, kwargs)
+
+    def forget(self, model_name: str):
+        """Drops the routing state of a model, e.g. after it has been unloaded."""
+        with self._lock:
+            self._holders.pop(model_name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "processes": len(self._workers),
+                "pending": list(self._pending),
+                "holders": {name: list(workers) for name, workers in self._holders.items()}
+            }
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.shutdown(wait=False, cancel_futures=True)
+
+    async def _submit(self, model_name: str, fn, *args):
+        worker = self._route(model_name)
+        try:
+            return await asyncio.wrap_future(self._workers[worker].submit(fn, *args))
+        finally:
+            with self._lock:
+                self._pending[worker] -= 1
+
+    def _route(self, model_name: str) -> int:
+        with self._lock:
+            holders = self._holders.get(model_name)
+            if not holders:
+                holders = self._holders[model_name] = [self._home(model_name)]
+            elif min(self._pending[w] for w in holders) >= self.spill_depth and len(holders) < len(self._workers):
+                others = [w for w in range(len(self._workers)) if w not in holders]
+                holders.append(min(others, key=lambda w: self._pending[w]))
+            worker = min(holders, key=lambda w: self._pending[w])
+            self._pending[worker] += 1
+            return worker
+
+    def _home(self, model_name: str) -> int:
+        def score(worker: int) -> bytes:
+            return hashlib.md5(f"{model_name}:{worker}".encode()).digest()
+        return max(range(len(self._workers)), key=score)
@@ -0,0 +1,328 @@
+"""
+Load-testing harness for modelserve.
+
+Generates synthetic MLP models and their config.json in a temporary MODEL_DIR,
+drives /predict or /explain with a fixed number of concurrent clients, and
+reports throughput, latency percentiles and the resident memory of the server.
+By default the app is called in-process through httpx's ASGI transport, with no
+network; with --server it is started as a uvicorn process on localhost.
+Server settings are passed with --env, e.g. --env MODEL_COMPILE_BACKEND=torchscript.
+
+    python benchmarks/bench.py --models 4 --concurrency 16 --rows 8 --requests 2000
+    python benchmarks/bench.py --endpoint explain --explainer shap --rows 4 --server
+    python benchmarks/bench.py --compare benchmarks/results/<earlier run>.json
+
+Each run is saved as JSON in benchmarks/results/, named by time and git commit,
+so runs on different commits can be compared with --compare.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import itertools
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import torch
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARK_DIR, "..", "app")
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+sys.path.insert(0, APP_DIR)
+
+from architectures.mlp import MLPClassifier
+from tensor_io import NPY_MEDIA_TYPE, encode_npy
+
+
+def write_models(model_dir: str, count: int, n_features: int, hidden_sizes: List[int], n_classes: int,
+                 explainers: List[str], config: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Saves `count` randomly initialised MLPs and their config.json under `model_dir` and returns their names."""
+    names = []
+    for i in range(count):
+        torch.manual_seed(i)
+        model = MLPClassifier(n_features, hidden_sizes, n_classes).eval()
+        name = f"bench-{i}"
+        path = os.path.join(model_dir, name)
+        os.makedirs(path, exist_ok=True)
+        torch.save(model.state_dict(), os.path.join(path, "model.pt"))
+        with open(os.path.join(path, "config.json"), "w") as f:
+            json.dump({"explainers": {explainer: {} for explainer in explainers}, **(config or {})}, f)
+        names.append(name)
+    return names
+
+
+def make_payload(endpoint: str, rows: int, n_features: int, fmt: str, explainer: Optional[str], seed: int = 0) -> Tuple[str, bytes, Dict[str, str]]:
+    """The query string, body and headers of one benchmark request."""
+    data = torch.randn(rows, n_features, generator=torch.Generator().manual_seed(seed))
+    query = f"?explainer={explainer}" if endpoint == "explain" and fmt == "npy" else ""
+    if fmt == "npy":
+        return query, encode_npy(data), {"content-type": NPY_MEDIA_TYPE, "accept": NPY_MEDIA_TYPE}
+    body = {"data": data.tolist()}
+    if endpoint == "explain":
+        body["explainer"] = explainer
+    return query, json.dumps(body).encode(), {"content-type": "application/json"}
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    values = sorted(values)
+
+    def percentile(p: float) -> Optional[float]:
+        return values[min(len(values) - 1, int(p * len(values)))] if values else None
+
+    return {
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": values[-1] if values else None
+    }
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of a process, this one by default, or None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def drive(client: httpx.AsyncClient, urls: List[str], payloads: List[Tuple[str, bytes, Dict[str, str]]],
+                concurrency: int, requests: int, duration: Optional[float], pid: Optional[int]) -> Dict[str, Any]:
+    """
+    Sends requests from `concurrency` concurrent clients, cycling over the models and
+    payloads, until `requests` have been sent or `duration` seconds have passed.
+    """
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = itertools.count()
+    rss = {"start": rss_bytes(pid), "peak": rss_bytes(pid)}
+    started = time.perf_counter()
+    stop_at = started + duration if duration else None
+
+    async def client_loop():
+        while True:
+            i = next(counter)
+            if i >= requests or (stop_at is not None and time.perf_counter() >= stop_at):
+                return
+            query, body, headers = payloads[i % len(payloads)]
+            sent = time.perf_counter()
+            try:
+                response = await client.post(urls[i % len(urls)] + query, content=body, headers=headers)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - sent)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def sample_rss():
+        while True:
+            await asyncio.sleep(0.1)
+            current = rss_bytes(pid)
+            if current is not None and (rss["peak"] is None or current > rss["peak"]):
+                rss["peak"] = current
+
+    sampler = asyncio.create_task(sample_rss())
+    try:
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    finally:
+        sampler.cancel()
+    elapsed = time.perf_counter() - started
+    rss["end"] = rss_bytes(pid)
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status != "200"),
+        "statuses": statuses,
+        "duration_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else None,
+        "latency_ms": {name: value * 1000 if value is not None else None for name, value in percentiles(latencies).items()},
+        "rss_bytes": rss
+    }
+
+
+async def benchmark(client: httpx.AsyncClient, args: argparse.Namespace, names: List[str], pid: Optional[int]) -> Dict[str, Any]:
+    urls = [f"/{args.endpoint}/{name}" for name in names]
+    payloads = [make_payload(args.endpoint, args.rows, args.features, args.format, args.explainer, seed) for seed in range(args.distinct_payloads)]
+
+    # The first request to each model loads it; its latency is reported apart
+    first_request_ms = {}
+    for url in urls:
+        query, body, headers = payloads[0]
+        sent = time.perf_counter()
+        response = await client.post(url + query, content=body, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} answered {response.status_code}: {response.text[:200]}")
+        first_request_ms[url] = (time.perf_counter() - sent) * 1000
+    if args.warmup:
+        await drive(client, urls, payloads, args.concurrency, args.warmup, None, pid)
+
+    results = await drive(client, urls, payloads, args.concurrency, args.requests, args.duration, pid)
+    results["rows_per_s"] = results["throughput_rps"] * args.rows if results["throughput_rps"] else None
+    results["first_request_ms"] = percentiles(list(first_request_ms.values()))
+    return results
+
+
+async def run_in_process(args: argparse.Namespace, model_dir: str, names: List[str]) -> Dict[str, Any]:
+    if args.env and "main" in sys.modules:
+        # Server settings are read when the app module is imported
+        print(f"Warning: the app is already imported, so --env {' '.join(args.env)} has no effect in-process; use --server", file=sys.stderr)
+    environ = dict(os.environ)
+    os.environ["MODEL_DIR"] = model_dir
+    os.environ.update(args.env)
+    try:
+        import main
+        from catalog import ModelCatalog
+        # The app may already have been imported with another model directory
+        main.MODEL_DIR = model_dir
+        main.catalog = ModelCatalog(model_dir)
+        await main.startup_event()
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://modelserve", timeout=args.timeout) as client:
+                return await benchmark(client, args, names, None)
+        finally:
+            await main.shutdown_event()
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_server(args: argparse.Namespace, model_dir: str, names: List[str]) -> Dict[str, Any]:
+    port = free_port()
+    env = {**os.environ, "MODEL_DIR": model_dir, **args.env}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", APP_DIR, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout,
+                                     limits=httpx.Limits(max_connections=args.concurrency)) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"The server exited with code {server.returncode}")
+                try:
+                    if (await client.get("/models")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("The server did not start within 60 s")
+                await asyncio.sleep(0.2)
+            return await benchmark(client, args, names, server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]):
+    """Prints the main results of two runs side by side."""
+    rows = [
+        ("throughput_rps", lambda r: r["results"]["throughput_rps"]),
+        ("rows_per_s", lambda r: r["results"]["rows_per_s"]),
+        *[(f"latency_{p}_ms", lambda r, p=p: r["results"]["latency_ms"][p]) for p in ("p50", "p90", "p99", "max")],
+        ("peak_rss_mb", lambda r: r["results"]["rss_bytes"]["peak"] / 1024 ** 2 if r["results"]["rss_bytes"]["peak"] else None),
+        ("errors", lambda r: r["results"]["errors"])
+    ]
+    differing = sorted(name for name in set(previous["settings"]) | set(current["settings"]) if previous["settings"].get(name) != current["settings"].get(name))
+    if differing:
+        print(f"Warning: the runs differ in settings {differing}")
+
+    def fmt(value) -> str:
+        return f"{value:.6g}" if value is not None else "-"
+
+    print(f"{'':>16} {previous.get('commit') or '?':>12} {current.get('commit') or '?':>12} {'change':>8}")
+    for name, get in rows:
+        before, after = get(previous), get(current)
+        change = f"{(after - before) / before * 100:+.1f}%" if before and after is not None else ""
+        print(f"{name:>16} {fmt(before):>12} {fmt(after):>12} {change:>8}")
+
+
+def report(run: Dict[str, Any]):
+    results = run["results"]
+    latency = results["latency_ms"]
+    rss = results["rss_bytes"]
+    print(f"{results['requests']} requests in {results['duration_s']:.2f} s, {results['errors']} errors")
+    print(f"throughput: {results['throughput_rps']:.1f} req/s, {results['rows_per_s']:.1f} rows/s")
+    print("latency ms: " + ", ".join(f"{name} {value:.2f}" for name, value in latency.items() if value is not None))
+    print(f"first request ms (model load): p50 {results['first_request_ms']['p50']:.1f}, max {results['first_request_ms']['max']:.1f}")
+    if rss["peak"] is not None:
+        print(f"rss MB: start {rss['start'] / 1024 ** 2:.0f}, peak {rss['peak'] / 1024 ** 2:.0f}, end {rss['end'] / 1024 ** 2:.0f}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmarks modelserve on synthetic models.")
+    parser.add_argument("--endpoint", choices=("predict", "explain"), default="predict")
+    parser.add_argument("--explainer", default="shap", help="Explainer used by --endpoint explain")
+    parser.add_argument("--models", type=int, default=1, help="Number of synthetic models, requests are spread over them")
+    parser.add_argument("--features", type=int, default=32)
+    parser.add_argument("--hidden", type=int, nargs="*", default=[256, 128], help="Hidden layer sizes of the models")
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=1, help="Rows per request")
+    parser.add_argument("--format", choices=("json", "npy"), default="json", help="Encoding of requests and responses")
+    parser.add_argument("--distinct-payloads", type=int, default=64, help="Number of different inputs sent, repeated in turn")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=1000, help="Number of measured requests")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds, even if fewer requests were sent")
+    parser.add_argument("--warmup", type=int, default=50, help="Requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--server", action="store_true", help="Run a uvicorn server on localhost instead of calling the app in-process")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="Server settings, e.g. BATCH_MAX_WAIT_MS=2")
+    parser.add_argument("--config", default="{}", help="JSON merged into every model's config.json, e.g. '{\"compile\": {\"backend\": \"torchscript\"}}'")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help="Directory the results are saved to; empty to not save them")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare with")
+    args = parser.parse_args(argv)
+    args.env = dict(item.split("=", 1) for item in args.env)
+    args.config = json.loads(args.config)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="modelserve-bench-") as model_dir:
+        explainers = [args.explainer] if args.endpoint == "explain" else []
+        names = write_models(model_dir, args.models, args.features, args.hidden, args.classes, explainers, args.config)
+        runner = run_server if args.server else run_in_process
+        results = asyncio.run(runner(args, model_dir, names))
+
+    run = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "torch": torch.__version__, "cpus": os.cpu_count(), "machine": platform.machine()},
+        "settings": {name: value for name, value in vars(args).items() if name not in ("output_dir", "compare")},
+        "results": results
+    }
+    report(run)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        path = os.path.join(args.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{run['commit'] or 'nocommit'}-{args.endpoint}.json")
+        with open(path, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"Saved results to {path}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), run)
+    return run
+
+
+if __name__ == "__main__":
+    main()
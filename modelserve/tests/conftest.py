@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The server modules import each other as top-level modules (see app/main.py),
+# so the app directory itself has to be importable.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app")))
@@ -0,0 +1,88 @@
+import asyncio
+import time
+import pytest
+from admission import AdmissionController, AdmissionQueue, AdmissionRejected, DeadlineExceeded, PRIORITIES
+
+INTERACTIVE = PRIORITIES["interactive"]
+BATCH = PRIORITIES["batch"]
+
+
+def test_waiting_requests_are_admitted_by_priority():
+    """Tests that a freed slot goes to a waiting interactive request before earlier batch requests."""
+    order = []
+
+    async def scenario():
+        queue = AdmissionQueue(max_concurrency=1, max_queue=4)
+        release = await queue.acquire()
+
+        async def request(name, priority):
+            done = await queue.acquire(priority)
+            order.append(name)
+            done()
+
+        waiting = [asyncio.ensure_future(request("batch", BATCH)), asyncio.ensure_future(request("interactive", INTERACTIVE))]
+        await asyncio.sleep(0)
+        assert queue.stats()["queued"] == 2
+        release()
+        await asyncio.gather(*waiting)
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert order == ["interactive", "batch"]
+    assert (stats["active"], stats["queued"], stats["admitted"]) == (0, 0, 3)
+
+
+def test_full_queue_rejects_with_retry_after():
+    """Tests that requests beyond the queue bound are rejected, batch traffic first."""
+    async def scenario():
+        queue = AdmissionQueue(max_concurrency=1, max_queue=2, low_priority_share=0.5)
+        await queue.acquire()
+        waiting = [asyncio.ensure_future(queue.acquire(BATCH))]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as batch_rejection:
+            await queue.acquire(BATCH)
+        waiting.append(asyncio.ensure_future(queue.acquire(INTERACTIVE)))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejection:
+            await queue.acquire(INTERACTIVE)
+        for task in waiting:
+            task.cancel()
+        return batch_rejection.value, rejection.value, queue.stats()
+
+    batch_rejection, rejection, stats = asyncio.run(scenario())
+
+    assert batch_rejection.status_code == rejection.status_code == 429
+    assert rejection.retry_after >= 1
+    assert stats["rejected"] == 2
+
+
+def test_queued_request_leaves_when_its_deadline_passes():
+    async def scenario():
+        queue = AdmissionQueue(max_concurrency=1, max_queue=4)
+        release = await queue.acquire()
+        with pytest.raises(DeadlineExceeded):
+            await queue.acquire(deadline=time.monotonic() + 0.01)
+        release()
+        # The expired request did not keep the slot
+        (await queue.acquire())()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert (stats["expired"], stats["active"], stats["queued"]) == (1, 0, 0)
+
+
+def test_server_wide_bound_rejects_with_503():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1)
+        queue = controller.queue("demo", "predict", max_concurrency=4, max_queue=4)
+        async with controller.admit(queue):
+            with pytest.raises(AdmissionRejected) as rejection:
+                await controller.acquire(controller.queue("other", "predict", 4, 4))
+        return rejection.value, controller.stats()
+
+    rejection, stats = asyncio.run(scenario())
+
+    assert rejection.status_code == 503
+    assert stats["in_flight"] == 0
@@ -0,0 +1,505 @@
+import io
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+import httpx
+import numpy as np
+import pytest
+import torch
+import uvicorn
+from fastapi.testclient import TestClient
+
+import main
+from architectures.mlp import MLPClassifier
+from model_cache import ModelCache
+from singleflight import SingleFlight
+from catalog import ModelCatalog
+from explanation_cache import ExplanationCache
+from admission import AdmissionController
+from jobs import JobStore
+from prediction_cache import PredictionCache
+from tensor_io import NPY_MEDIA_TYPE, NPZ_MEDIA_TYPE, decode_npz, encode_npy
+
+N_FEATURES = 5
+N_CLASSES = 3
+
+
+def write_model(model_dir, name, config=None, seed=0):
+    """Saves a small MLP and its config.json under `model_dir`/`name` and returns the model."""
+    torch.manual_seed(seed)
+    model = MLPClassifier(N_FEATURES, [32, 16], N_CLASSES).eval()
+    path = os.path.join(model_dir, name)
+    os.makedirs(path, exist_ok=True)
+    torch.save(model.state_dict(), os.path.join(path, "model.pt"))
+    with open(os.path.join(path, "config.json"), "w") as f:
+        json.dump(config if config is not None else {"explainers": {"shap": {}}}, f)
+    return model
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    """Points the server at an empty model directory with fresh global state."""
+    monkeypatch.setattr(main, "MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "catalog", ModelCatalog(str(tmp_path)))
+    monkeypatch.setattr(main, "loaded_models", ModelCache(main.MODEL_CACHE_BYTES))
+    monkeypatch.setattr(main, "model_loads", SingleFlight())
+    monkeypatch.setattr(main, "model_swaps", SingleFlight())
+    monkeypatch.setattr(main, "draining_models", [])
+    monkeypatch.setattr(main, "load_failures", {})
+    monkeypatch.setattr(main, "preload_status", {})
+    monkeypatch.setattr(main, "admission", AdmissionController(main.MAX_IN_FLIGHT_REQUESTS))
+    monkeypatch.setattr(main, "explanation_jobs", JobStore(str(tmp_path / ".jobs"), main.EXPLAIN_JOB_TTL))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def client(model_dir):
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def server_url(model_dir):
+    """Serves the app with uvicorn over a real socket, unlike TestClient which never blocks on one."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started and time.monotonic() < deadline:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(30)
+
+
+def test_predict_json(model_dir, client):
+    """Tests the JSON request/response path of /predict."""
+    model = write_model(model_dir, "demo")
+    main.discover_models()
+    data = torch.randn(4, N_FEATURES)
+
+    response = client.post("/predict/demo", json={"data": data.tolist()})
+
+    assert response.status_code == 200
+    with torch.no_grad():
+        expected = model(data)
+    assert torch.allclose(torch.tensor(response.json()["predictions"]), expected, atol=1e-6)
+
+
+def test_predict_compiled_and_warm(model_dir, client):
+    """Tests that a model configured for compilation is served through the cached variant after warmup."""
+    model = write_model(model_dir, "demo", {"compile": {"backend": "torchscript", "warmup_batches": 2}})
+    main.discover_models()
+    data = torch.randn(4, N_FEATURES)
+
+    response = client.post("/predict/demo", json={"data": data.tolist()})
+
+    assert response.status_code == 200
+    with torch.no_grad():
+        assert torch.allclose(torch.tensor(response.json()["predictions"]), model(data), atol=1e-6)
+    assert any(name.endswith(".ts.pt") for name in os.listdir(os.path.join(model_dir, "demo")))
+    [info] = client.get("/models").json()
+    assert info["compiled"] is True
+    assert info["warmup_time_ms"] is not None
+
+
+@pytest.mark.parametrize("mode", ["static", "dynamic"])
+def test_predict_quantized(model_dir, client, mode):
+    """Tests that a quantized model passing its accuracy check serves close predictions."""
+    model = write_model(model_dir, "demo", {"quantization": {"mode": mode}})
+    calibration = np.random.RandomState(0).randn(256, N_FEATURES).astype(np.float32)
+    np.save(os.path.join(model_dir, "demo", "calibration.npy"), calibration)
+    main.discover_models()
+    data = torch.randn(4, N_FEATURES)
+
+    response = client.post("/predict/demo", json={"data": data.tolist()})
+
+    assert response.status_code == 200
+    with torch.no_grad():
+        assert torch.allclose(torch.tensor(response.json()["predictions"]), model(data), atol=0.1)
+    [info] = client.get("/models").json()
+    assert info["quantization"]["enabled"] is True
+    # Without explainers only the int8 copy is kept, and its packed weights count against the cache budget
+    int8_weight_bytes = sum(p.numel() for name, p in model.named_parameters() if name.endswith("weight"))
+    assert info["memory_bytes"] >= int8_weight_bytes
+    assert client.get("/models/cache").json()["models"]["demo"]["size_bytes"] >= int8_weight_bytes
+
+
+def test_predict_npy(model_dir, client):
+    """Tests that a .npy body is accepted and a .npy response is returned on request."""
+    model = write_model(model_dir, "demo")
+    main.discover_models()
+    data = torch.randn(6, N_FEATURES)
+
+    response = client.post(
+        "/predict/demo",
+        content=encode_npy(data),
+        headers={"Content-Type": NPY_MEDIA_TYPE, "Accept": NPY_MEDIA_TYPE},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == NPY_MEDIA_TYPE
+    predictions = np.load(io.BytesIO(response.content))
+    with torch.no_grad():
+        expected = model(data).numpy()
+    assert np.allclose(predictions, expected, atol=1e-6)
+
+
+def test_predict_invalid_npy(model_dir, client):
+    write_model(model_dir, "demo")
+    main.discover_models()
+
+    response = client.post("/predict/demo", content=b"not an array", headers={"Content-Type": NPY_MEDIA_TYPE})
+
+    assert response.status_code == 400
+    for shape in [(N_FEATURES + 1,), (2, N_FEATURES + 1), (1, 2, N_FEATURES)]:
+        wrong_shape = client.post("/predict/demo", content=encode_npy(torch.zeros(shape)), headers={"Content-Type": NPY_MEDIA_TYPE})
+        assert wrong_shape.status_code == 400 and str(N_FEATURES) in wrong_shape.json()["detail"]
+    assert client.post("/predict/demo", json={"data": [[0.0] * (N_FEATURES - 1)]}).status_code == 400
+    assert client.post("/predict/demo", json={"data": [[0.0], [0.0, 1.0]]}).status_code == 400
+
+
+def test_predict_npy_float64_and_int(model_dir, client):
+    """Tests that numeric arrays in numpy's default dtypes are cast to the float32 the model takes."""
+    model = write_model(model_dir, "demo")
+    main.discover_models()
+    data = np.random.randn(3, N_FEATURES)
+
+    for array in (data, data.round().astype(np.int64)):
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        response = client.post("/predict/demo", content=buffer.getvalue(), headers={"Content-Type": NPY_MEDIA_TYPE})
+
+        assert response.status_code == 200
+        with torch.no_grad():
+            expected = model(torch.from_numpy(array).float())
+        assert torch.allclose(torch.tensor(response.json()["predictions"]), expected, atol=1e-6)
+
+
+def test_predict_single_row(model_dir, client):
+    """Tests that an unbatched row is served through the batcher and answered unbatched."""
+    model = write_model(model_dir, "demo")
+    main.discover_models()
+    row = torch.randn(N_FEATURES)
+
+    for response in (client.post("/predict/demo", json={"data": row.tolist()}),
+                     client.post("/predict/demo", content=encode_npy(row), headers={"Content-Type": NPY_MEDIA_TYPE})):
+        assert response.status_code == 200
+        predictions = torch.tensor(response.json()["predictions"])
+        with torch.no_grad():
+            expected = model(row.unsqueeze(0))[0]
+        assert predictions.shape == expected.shape and torch.allclose(predictions, expected, atol=1e-6)
+
+
+def test_predict_unknown_model(model_dir, client):
+    main.discover_models()
+    assert client.post("/predict/missing", json={"data": [[0.0] * N_FEATURES]}).status_code == 404
+
+
+def test_explain_npz(model_dir, client):
+    """Tests a binary explain round trip with the explainer given as a query parameter."""
+    write_model(model_dir, "demo")
+    main.discover_models()
+    data = torch.randn(3, N_FEATURES)
+
+    response = client.post(
+        "/explain/demo?explainer=shap",
+        content=encode_npy(data),
+        headers={"Content-Type": NPY_MEDIA_TYPE, "Accept": NPZ_MEDIA_TYPE},
+    )
+
+    assert response.status_code == 200
+    arrays = decode_npz(response.content)
+    assert arrays["attributions"].shape == (N_CLASSES, 3, N_FEATURES)
+    assert arrays["baseline"].shape == (1, N_FEATURES)
+
+
+def test_explain_json(model_dir, client):
+    write_model(model_dir, "demo")
+    main.discover_models()
+
+    response = client.post("/explain/demo", json={"explainer": "shap", "data": torch.randn(2, N_FEATURES).tolist()})
+
+    assert response.status_code == 200
+    assert np.array(json.loads(response.json()["attributions"])).shape == (N_CLASSES, 2, N_FEATURES)
+
+
+def test_predict_stream_csv(model_dir, client):
+    """Tests chunked scoring of a CSV body, header included."""
+    model = write_model(model_dir, "demo")
+    main.discover_models()
+    data = torch.randn(10, N_FEATURES)
+    body = "a,b,c,d,e\n" + "\n".join(",".join(str(v) for v in row) for row in data.tolist()) + "\n"
+
+    response = client.post("/predict/demo/stream?chunk_rows=3", content=body, headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 200
+    predictions = torch.tensor([json.loads(line) for line in response.text.splitlines()])
+    with torch.no_grad():
+        assert torch.allclose(predictions, model(data), atol=1e-5)
+
+
+def test_predict_stream_large_upload_over_a_socket(model_dir, server_url):
+    """Tests that a client uploading its whole body before reading the predictions does not deadlock with the server."""
+    write_model(model_dir, "demo")
+    main.discover_models()
+    rows = 300_000
+    line = json.dumps([0.5] * N_FEATURES).encode() + b"\n"
+
+    response = httpx.post(f"{server_url}/predict/demo/stream", content=line * rows,
+                          headers={"Content-Type": "application/x-ndjson"}, timeout=60)
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert len(lines) == rows and "error" not in lines[-1]
+
+
+def test_predict_stream_dataset_uri(model_dir, client, tmp_path, monkeypatch):
+    """Tests scoring an NDJSON dataset file referenced by URI, and rejecting paths outside DATA_DIR."""
+    write_model(model_dir, "demo")
+    main.discover_models()
+    data_dir = tmp_path / "data"
+    (data_dir / "1").mkdir(parents=True)
+    dataset = data_dir / "1" / "rows.ndjson"
+    dataset.write_text("\n".join(json.dumps(row) for row in torch.randn(7, N_FEATURES).tolist()))
+    monkeypatch.setattr(main, "DATA_DIR", str(data_dir))
+
+    response = client.post(f"/predict/demo/stream?dataset_uri=file://{dataset}")
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 7
+
+    outside = client.post(f"/predict/demo/stream?dataset_uri=file://{model_dir}/demo/config.json")
+    assert outside.status_code == 400
+
+
+def test_explain_reuses_cached_rows(model_dir, client, monkeypatch):
+    """Tests that a repeated explanation is served from the cache with identical attributions."""
+    write_model(model_dir, "demo")
+    main.discover_models()
+    monkeypatch.setattr(main, "explanation_cache", ExplanationCache(1024 ** 2))
+    data = torch.randn(12, N_FEATURES).tolist()
+
+    first = client.post("/explain/demo", json={"explainer": "shap", "data": data}).json()
+    second = client.post("/explain/demo", json={"explainer": "shap", "data": data}).json()
+
+    assert first == second
+    stats = client.get("/explanations/cache").json()
+    assert (stats["misses"], stats["hits"]) == (12, 12)
+
+
+def test_predict_and_explain_use_separate_executors(model_dir, client, monkeypatch):
+    """Tests that predictions and explanations are counted on their own executors."""
+    monkeypatch.setattr(main, "explanation_cache", None)
+    write_model(model_dir, "demo", {"explainers": {"shap": {}}})
+    main.discover_models()
+    data = torch.randn(2, N_FEATURES).tolist()
+
+    assert client.post("/predict/demo", json={"data": data}).status_code == 200
+    assert client.post("/explain/demo", json={"explainer": "shap", "data": data}).status_code == 200
+
+    executors = client.get("/executors").json()
+    assert executors["predict"]["completed"] >= 1
+    assert executors["explain"]["completed"] == 1
+    assert executors["explain"]["queued"] == 0
+
+
+def test_expired_and_overloaded_requests_are_rejected(model_dir, client, monkeypatch):
+    """Tests the 504 of a request past its deadline and the 503 with Retry-After of an overloaded server."""
+    write_model(model_dir, "demo")
+    main.discover_models()
+    body = {"data": torch.randn(1, N_FEATURES).tolist()}
+
+    late = client.post("/predict/demo", json=body, headers={"X-Request-Timeout-Ms": "0"})
+    assert late.status_code == 504
+
+    monkeypatch.setattr(main, "admission", AdmissionController(max_in_flight=0))
+    overloaded = client.post("/predict/demo", json=body)
+    assert overloaded.status_code == 503
+    assert int(overloaded.headers["Retry-After"]) >= 1
+
+
+def test_explain_async_job(model_dir, client, monkeypatch):
+    """Tests that an async explanation runs in chunks and gives the same attributions as the synchronous path."""
+    write_model(model_dir, "demo")
+    main.discover_models()
+    monkeypatch.setattr(main, "EXPLAIN_JOB_CHUNK_ROWS", 4)
+    monkeypatch.setattr(main, "explanation_cache", None)
+    data = torch.randn(10, N_FEATURES)
+
+    response = client.post("/explain/demo", json={"explainer": "shap", "data": data.tolist()}, headers={"Prefer": "respond-async"})
+    assert response.status_code == 202
+    job_url = response.headers["Location"]
+
+    for _ in range(200):
+        job = client.get(job_url).json()
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.01)
+    assert (job["status"], job["rows_done"]) == ("done", 10)
+
+    result = client.get(f"{job_url}/result")
+    assert result.status_code == 200
+    arrays = decode_npz(result.content)
+    sync = client.post("/explain/demo", json={"explainer": "shap", "data": data.tolist()}).json()
+    assert np.allclose(arrays["attributions"], np.array(json.loads(sync["attributions"])), atol=1e-5)
+
+    assert client.delete(job_url).status_code == 200
+    assert client.get(job_url).status_code == 404
+
+
+def test_explain_uses_precomputed_baseline(model_dir, client, monkeypatch):
+    """Tests that with a background set the attributions of a row do not depend on the rows sent with it."""
+    write_model(model_dir, "demo")
+    background = np.random.RandomState(0).randn(50, N_FEATURES).astype(np.float32)
+    np.save(os.path.join(model_dir, "demo", "background.npy"), background)
+    main.discover_models()
+    monkeypatch.setattr(main, "explanation_cache", None)
+    data = torch.randn(6, N_FEATURES)
+
+    alone = client.post("/explain/demo", json={"explainer": "shap", "data": data[:1].tolist()}).json()
+    batched = client.post("/explain/demo", json={"explainer": "shap", "data": data.tolist()}).json()
+
+    assert np.allclose(json.loads(alone["baseline"]), background.mean(axis=0, keepdims=True), atol=1e-6)
+    assert np.allclose(np.array(json.loads(alone["attributions"]))[:, 0], np.array(json.loads(batched["attributions"]))[:, 0], atol=1e-5)
+    [info] = client.get("/models").json()
+    assert info["precomputed_baseline"] is True
+
+
+def test_new_version_is_swapped_in_after_draining(model_dir, client):
+    """Tests that a deployed version is loaded in the background and replaces the old one, which drains first."""
+    old_model = write_model(os.path.join(model_dir, "demo"), "1")
+    main.discover_models()
+    data = torch.randn(4, N_FEATURES)
+    response = client.post("/predict/demo", json={"data": data.tolist()})
+    assert response.headers["x-model-version"] == "1"
+    old = main.loaded_models.peek("demo")
+    # A request still running on the old version
+    end_lease = main.lease_model(old)
+
+    new_model = write_model(os.path.join(model_dir, "demo"), "2", seed=1)
+    client.get("/models", params={"refresh": True})
+    for _ in range(200):
+        if main.loaded_models.peek("demo") is not old:
+            break
+        time.sleep(0.05)
+
+    models = {m["name"]: m for m in client.get("/models").json()}
+    assert models["demo"]["loaded_version"] == "2"
+    assert models["demo"]["draining_versions"] == ["1"]
+    response = client.post("/predict/demo", json={"data": data.tolist()})
+    assert response.headers["x-model-version"] == "2"
+    with torch.no_grad():
+        assert torch.allclose(torch.tensor(response.json()["predictions"]), new_model(data), atol=1e-6)
+        assert not torch.allclose(new_model(data), old_model(data), atol=1e-6)
+
+    end_lease()
+    assert main.draining_models == []
+
+
+def test_identical_concurrent_predictions_share_a_forward_pass(monkeypatch):
+    """Tests that concurrent requests with the same input run the model once, and repeats hit the cache."""
+    monkeypatch.setattr(main, "prediction_flights", SingleFlight())
+    monkeypatch.setattr(main, "prediction_cache", PredictionCache(1024, ttl_seconds=60))
+    calls = []
+
+    class SlowBatcher:
+        async def submit(self, data, deadline=None):
+            calls.append(data)
+            await asyncio.sleep(0.05)
+            return data * 2
+
+    model_data = {"serving_checksum": "abc", "backend": "eager", "batcher": SlowBatcher()}
+
+    async def run():
+        same = [main.coalesced_predict("demo", model_data, torch.ones(2, 3)) for _ in range(5)]
+        other = main.coalesced_predict("demo", model_data, torch.zeros(2, 3))
+        results = await asyncio.gather(*same, other)
+        repeat = await main.coalesced_predict("demo", model_data, torch.ones(2, 3))
+        return results, repeat
+
+    results, repeat = asyncio.run(run())
+
+    assert len(calls) == 2
+    assert all(torch.equal(result, torch.full((2, 3), 2.0)) for result in results[:5])
+    assert torch.equal(repeat, torch.full((2, 3), 2.0))
+    assert main.prediction_cache.stats()["hits"] == 1
+
+
+def test_metrics_report_request_phases(model_dir, client):
+    """Tests that /metrics exposes the phase latencies and batch sizes of a served prediction."""
+    write_model(model_dir, "demo")
+    main.discover_models()
+    client.post("/predict/demo", json={"data": torch.randn(4, N_FEATURES).tolist()})
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for phase in ("admission", "decode", "queue", "inference", "encode"):
+        assert f'modelserve_request_phase_seconds_count{{model="demo",endpoint="predict",phase="{phase}"}}' in response.text
+    assert 'modelserve_batch_rows_bucket{model="demo",le="4"}' in response.text
+    assert 'modelserve_model_load_seconds_count{model="demo",stage="load"}' in response.text
+    assert 'modelserve_model_in_flight{model="demo",draining="false"} 0' in response.text
+
+
+def test_preloaded_models_are_warm_and_pinned_when_ready(model_dir, monkeypatch):
+    """Tests that models flagged or listed for preload are loaded and pinned at startup, and /ready waits for them."""
+    write_model(model_dir, "flagged", {"preload": True})
+    write_model(model_dir, "listed")
+    write_model(model_dir, "lazy")
+    monkeypatch.setattr(main, "PRELOAD_MODELS", ["listed", "missing"])
+
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 30
+        while (response := client.get("/ready")).status_code == 503 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert response.status_code == 200
+        assert response.json()["models"] == {"flagged": "ready", "listed": "ready", "missing": "failed"}
+        assert "flagged" in main.loaded_models and main.loaded_models.is_pinned("flagged")
+        assert "listed" in main.loaded_models and main.loaded_models.is_pinned("listed")
+        assert "lazy" not in main.loaded_models
+
+
+def test_not_ready_while_preloading(model_dir, client, monkeypatch):
+    """Tests that /ready reports the models still being preloaded."""
+    monkeypatch.setattr(main, "preload_status", {"demo": "loading", "other": "ready"})
+
+    response = client.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json()["pending"] == ["demo"]
+
+
+def test_predict_raw_rows_through_the_model_preprocessing(model_dir, client):
+    """Tests that raw JSON and CSV rows are encoded by the model's preprocessing before the network."""
+    model = write_model(model_dir, "demo", {"explainers": {"shap": {}}, "preprocessing": "preprocessing.json"})
+    spec = {"columns": [
+        {"name": "age", "kind": "numeric", "mean": 40.0, "std": 10.0},
+        {"name": "income", "kind": "numeric", "mean": 0.0, "std": 2.0, "fill": 4.0},
+        {"name": "city", "kind": "onehot", "categories": ["paris", "rome", "oslo"]}
+    ]}
+    with open(os.path.join(model_dir, "demo", "preprocessing.json"), "w") as f:
+        json.dump(spec, f)
+    main.discover_models()
+    rows = [[50, 2, "rome"], {"age": 30, "city": "oslo"}]
+    with torch.no_grad():
+        expected = model(torch.tensor([[1.0, 1.0, 0.0, 1.0, 0.0], [-1.0, 2.0, 0.0, 0.0, 1.0]]))
+
+    response = client.post("/predict/demo", json={"data": rows})
+    streamed = client.post("/predict/demo/stream", content="age,income,city\n50,2,rome\n30,,oslo\n", headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 200
+    assert torch.allclose(torch.tensor(response.json()["predictions"]), expected, atol=1e-6)
+    assert torch.allclose(torch.tensor([json.loads(line) for line in streamed.text.splitlines()]), expected, atol=1e-5)
+    assert client.post("/predict/demo", json={"data": [[50, "rome"]]}).status_code == 400
+    explained = client.post("/explain/demo", json={"explainer": "shap", "data": rows})
+    assert np.array(json.loads(explained.json()["attributions"])).shape == (N_CLASSES, 2, N_FEATURES)
+    listed = {model["name"]: model for model in client.get("/models").json()}
+    assert listed["demo"]["features"] == ["age", "income", "city=paris", "city=rome", "city=oslo"]
@@ -0,0 +1,49 @@
+import json
+import numpy as np
+import torch
+from baselines import load_explainer_state, main, sample_background
+
+
+def test_sample_background_from_csv(tmp_path):
+    """Tests sampling feature columns from a CSV dataset with a header."""
+    dataset = tmp_path / "train.csv"
+    rows = np.arange(60, dtype=np.float32).reshape(20, 3)
+    dataset.write_text("a,b,label\n" + "\n".join(",".join(str(v) for v in row) for row in rows) + "\n")
+
+    background = sample_background(str(dataset), samples=5, columns=[0, 1])
+
+    assert background.shape == (5, 2)
+    assert all(any(np.array_equal(sample, row) for row in rows[:, :2]) for sample in background)
+    assert sample_background(str(dataset), samples=50).shape == (20, 3)
+
+
+def test_background_set_is_stored_and_loaded(tmp_path):
+    dataset = tmp_path / "train.ndjson"
+    dataset.write_text("[1.0, 2.0]\n[3.0, 4.0]\n")
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+
+    main([str(dataset), str(model_dir), "--samples", "10"])
+    state = load_explainer_state(str(model_dir / "model.pt"), {})
+
+    assert torch.equal(state["baseline"], torch.tensor([[2.0, 3.0]]))
+    assert load_explainer_state(str(tmp_path / "model.pt"), {}) == {}
+
+
+def test_background_set_of_a_preprocessed_model_is_encoded(tmp_path):
+    """Tests that raw categorical rows are sampled as the encoded features the explainers see."""
+    dataset = tmp_path / "train.csv"
+    dataset.write_text("label,city,age\n0,paris,30\n1,rome,50\n1,rome,\n")
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "config.json").write_text(json.dumps({"preprocessing": "preprocessing.json"}))
+    (model_dir / "preprocessing.json").write_text(json.dumps({"columns": [
+        {"name": "age", "kind": "numeric", "mean": 40.0, "std": 10.0},
+        {"name": "city", "kind": "onehot", "categories": ["paris", "rome"]}
+    ]}))
+
+    main([str(dataset), str(model_dir), "--samples", "10"])
+    state = load_explainer_state(str(model_dir / "model.pt"), {})
+
+    # age -1, 1 and the mean 0; paris once, rome twice
+    assert torch.allclose(state["baseline"], torch.tensor([[0.0, 1 / 3, 2 / 3]]))
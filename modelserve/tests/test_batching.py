@@ -0,0 +1,142 @@
+import asyncio
+import time
+import torch
+from admission import DeadlineExceeded
+from batching import MicroBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_requests_share_one_forward_pass():
+    """Tests that requests submitted together are served by a single forward call."""
+    calls = []
+
+    def forward(data):
+        calls.append(data.shape[0])
+        return data * 2
+
+    async def scenario():
+        batcher = MicroBatcher(forward, max_batch_size=32, max_wait_ms=50)
+        inputs = [torch.full((1, 3), float(i)) for i in range(8)]
+        return inputs, await asyncio.gather(*(batcher.submit(x) for x in inputs))
+
+    inputs, outputs = run(scenario())
+
+    assert calls == [8]
+    for x, y in zip(inputs, outputs):
+        assert torch.equal(y, x * 2)
+
+
+def test_batches_are_capped_at_max_batch_size():
+    """Tests that no forward pass receives more rows than max_batch_size."""
+    calls = []
+
+    def forward(data):
+        calls.append(data.shape[0])
+        return data
+
+    async def scenario():
+        batcher = MicroBatcher(forward, max_batch_size=4, max_wait_ms=50)
+        await asyncio.gather(*(batcher.submit(torch.zeros(1, 2)) for _ in range(10)))
+
+    run(scenario())
+
+    assert sum(calls) == 10
+    assert max(calls) <= 4
+
+
+def test_multi_row_and_unbatched_requests_get_their_own_rows_back():
+    """Tests that rows are scattered back correctly for mixed request sizes."""
+    async def scenario():
+        batcher = MicroBatcher(lambda data: data + 1, max_wait_ms=20)
+        return await asyncio.gather(
+            batcher.submit(torch.zeros(3, 2)),
+            batcher.submit(torch.tensor([5.0, 6.0])),
+            batcher.submit(torch.ones(2, 2)),
+        )
+
+    a, b, c = run(scenario())
+
+    assert a.shape == (3, 2) and torch.all(a == 1)
+    assert torch.equal(b, torch.tensor([6.0, 7.0]))
+    assert c.shape == (2, 2) and torch.all(c == 2)
+
+
+def test_incompatible_shapes_are_run_separately():
+    """Tests that requests with different feature counts do not break each other."""
+    calls = []
+
+    def forward(data):
+        calls.append(tuple(data.shape))
+        return data.sum(dim=1, keepdim=True)
+
+    async def scenario():
+        batcher = MicroBatcher(forward, max_wait_ms=20)
+        return await asyncio.gather(
+            batcher.submit(torch.ones(1, 2)),
+            batcher.submit(torch.ones(1, 5)),
+        )
+
+    a, b = run(scenario())
+
+    assert sorted(calls) == [(1, 2), (1, 5)]
+    assert a.item() == 2 and b.item() == 5
+
+
+def test_forward_errors_reach_every_waiting_request():
+    """Tests that an exception in the forward pass is propagated to all callers."""
+    def forward(data):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        batcher = MicroBatcher(forward, max_wait_ms=10)
+        return await asyncio.gather(
+            batcher.submit(torch.ones(1, 2)),
+            batcher.submit(torch.ones(1, 2)),
+            return_exceptions=True,
+        )
+
+    results = run(scenario())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_expired_requests_are_left_out_of_the_batch():
+    """Tests that a request whose deadline passed while queued is failed without being computed."""
+    calls = []
+
+    def forward(data):
+        calls.append(data.shape[0])
+        return data
+
+    async def scenario():
+        batcher = MicroBatcher(forward, max_batch_size=32, max_wait_ms=20)
+        live = batcher.submit(torch.zeros(2, 3))
+        late = batcher.submit(torch.zeros(1, 3), deadline=time.monotonic() + 0.001)
+        return await asyncio.gather(live, late, return_exceptions=True)
+
+    live, late = run(scenario())
+
+    assert calls == [2]
+    assert live.shape == (2, 3)
+    assert isinstance(late, DeadlineExceeded)
+
+
+def test_on_batch_reports_rows_waits_and_forward_time():
+    """Tests that each forward pass is reported with its rows and the queue wait of each request."""
+    reports = []
+
+    async def scenario():
+        batcher = MicroBatcher(lambda data: data, max_wait_ms=20, on_batch=lambda *report: reports.append(report))
+        await asyncio.gather(batcher.submit(torch.ones(2, 3)), batcher.submit(torch.ones(1, 3)))
+
+    run(scenario())
+
+    assert len(reports) == 1
+    rows, waits, forward_seconds = reports[0]
+    assert rows == 3
+    # The first request waited for the batch to fill
+    assert len(waits) == 2 and waits[0] >= waits[1]
+    assert forward_seconds >= 0
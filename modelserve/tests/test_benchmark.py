@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+
+import main
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+import bench
+
+
+def test_percentiles():
+    stats = bench.percentiles([float(i) for i in range(1, 101)])
+
+    assert stats["p50"] == 51.0 and stats["p99"] == 100.0 and stats["max"] == 100.0
+    assert bench.percentiles([])["p50"] is None
+
+
+def test_in_process_run_is_saved_and_comparable(tmp_path, monkeypatch, capsys):
+    """
+    Tests a small in-process benchmark end to end, then compares it with itself.
+    The app is already imported, so --env is reported as ignored and leaves the environment as it was.
+    """
+    # The benchmark points the already imported app at its own model directory
+    monkeypatch.setattr(main, "MODEL_DIR", main.MODEL_DIR)
+    monkeypatch.setattr(main, "catalog", main.catalog)
+    output_dir = str(tmp_path / "results")
+    environ = dict(os.environ)
+
+    run = bench.main([
+        "--models", "2", "--features", "4", "--hidden", "8", "--rows", "3",
+        "--requests", "20", "--warmup", "4", "--concurrency", "4", "--output-dir", output_dir,
+        "--env", "BATCH_MAX_WAIT_MS=2"
+    ])
+
+    assert dict(os.environ) == environ
+    assert "--env BATCH_MAX_WAIT_MS" in capsys.readouterr().err
+    assert run["results"]["requests"] == 20
+    assert run["results"]["errors"] == 0
+    assert run["results"]["latency_ms"]["p99"] is not None
+    [saved] = os.listdir(output_dir)
+    with open(os.path.join(output_dir, saved)) as f:
+        assert json.load(f)["results"]["requests"] == 20
+    bench.compare(run, run)
+    assert "+0.0%" in capsys.readouterr().out
+
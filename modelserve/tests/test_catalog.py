@@ -0,0 +1,110 @@
+import json
+import os
+from catalog import ModelCatalog
+
+
+def write_model_files(model_dir, name, config):
+    path = os.path.join(model_dir, name)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "model.pt"), "wb") as f:
+        f.write(b"weights")
+    with open(os.path.join(path, "config.json"), "w") as f:
+        json.dump(config, f)
+    return path
+
+
+def touch(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_refresh_reports_added_updated_and_removed_models(tmp_path):
+    """Tests the change detection of successive refreshes."""
+    model_dir = str(tmp_path)
+    catalog = ModelCatalog(model_dir)
+    a = write_model_files(model_dir, "a", {"explainers": {}})
+    write_model_files(model_dir, "b", {})
+    os.makedirs(os.path.join(model_dir, "incomplete"))
+
+    assert sorted(catalog.refresh()["added"]) == ["a", "b"]
+    assert sorted(catalog.names()) == ["a", "b"]
+    assert catalog.refresh() == {"added": [], "removed": [], "updated": []}
+
+    with open(os.path.join(a, "config.json"), "w") as f:
+        json.dump({"explainers": {"shap": {}}}, f)
+    touch(os.path.join(a, "config.json"), 10 ** 18)
+    os.remove(os.path.join(model_dir, "b", "model.pt"))
+
+    changes = catalog.refresh()
+    assert changes == {"added": [], "removed": ["b"], "updated": ["a"]}
+    assert catalog["a"]["config"] == {"explainers": {"shap": {}}}
+
+
+def test_unchanged_configs_are_not_parsed_again(tmp_path):
+    """Tests that an entry is reused as is while its files keep their modification times."""
+    model_dir = str(tmp_path)
+    write_model_files(model_dir, "a", {})
+    catalog = ModelCatalog(model_dir)
+    catalog.refresh()
+    entry = catalog["a"]
+
+    catalog.refresh()
+
+    assert catalog["a"] is entry
+
+
+def test_invalid_config_is_recorded(tmp_path):
+    model_dir = str(tmp_path)
+    path = write_model_files(model_dir, "a", {})
+    with open(os.path.join(path, "config.json"), "w") as f:
+        f.write("{not json")
+    catalog = ModelCatalog(model_dir)
+    catalog.refresh()
+
+    assert catalog["a"]["config"] is None
+    assert catalog["a"]["config_error"]
+
+
+def test_versioned_models_serve_the_current_version(tmp_path):
+    """Tests that the highest version, in natural order, is served unless CURRENT names another one."""
+    model_dir = str(tmp_path)
+    write_model_files(os.path.join(model_dir, "a"), "v9", {})
+    write_model_files(os.path.join(model_dir, "a"), "v10", {})
+    os.makedirs(os.path.join(model_dir, "a", ".v11"))
+    catalog = ModelCatalog(model_dir)
+
+    catalog.refresh()
+    assert catalog["a"]["version"] == "v10"
+    assert catalog["a"]["model_path"] == os.path.join(model_dir, "a", "v10", "model.pt")
+
+    with open(os.path.join(model_dir, "a", "CURRENT"), "w") as f:
+        f.write("v9\n")
+    assert catalog.refresh()["updated"] == ["a"]
+    assert catalog["a"]["version"] == "v9"
+
+    # A version missing its config.json is not a candidate yet
+    os.makedirs(os.path.join(model_dir, "a", "v12"))
+    os.remove(os.path.join(model_dir, "a", "CURRENT"))
+    with open(os.path.join(model_dir, "a", "v12", "model.pt"), "wb") as f:
+        f.write(b"weights")
+    assert catalog.refresh()["updated"] == ["a"]
+    assert catalog["a"]["version"] == "v10"
+
+
+def test_directories_filled_after_creation_are_discovered(tmp_path):
+    """Tests models whose files are copied into an already scanned directory, or removed and restored."""
+    model_dir = str(tmp_path)
+    catalog = ModelCatalog(model_dir)
+    os.makedirs(os.path.join(model_dir, "m"))
+    touch(model_dir, 10 ** 18)
+    assert catalog.refresh() == {"added": [], "removed": [], "updated": []}
+
+    write_model_files(model_dir, "m", {})
+    touch(model_dir, 10 ** 18)
+    assert catalog.refresh()["added"] == ["m"]
+
+    os.rename(os.path.join(model_dir, "m", "model.pt"), os.path.join(model_dir, "model.pt.bak"))
+    touch(model_dir, 10 ** 18)
+    assert catalog.refresh()["removed"] == ["m"]
+    os.rename(os.path.join(model_dir, "model.pt.bak"), os.path.join(model_dir, "m", "model.pt"))
+    touch(model_dir, 10 ** 18)
+    assert catalog.refresh()["added"] == ["m"] and "m" in catalog
@@ -0,0 +1,33 @@
+import os
+import pytest
+import torch
+from architectures.mlp import MLPClassifier
+from compiled import artifact_path, compile_model, load_compiled
+
+
+@pytest.mark.parametrize("backend", ["torchscript", "onnxruntime"])
+def test_artifact_is_cached_by_checksum(tmp_path, backend):
+    """Tests that a backend artifact matches the eager model and is reused until the weights change."""
+    if backend == "onnxruntime":
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("onnxscript")
+    torch.manual_seed(0)
+    model = MLPClassifier(5, [32, 16], 3).eval()
+    model_path = str(tmp_path / "model.pt")
+    example = torch.randn(8, 5)
+
+    path = compile_model(model, backend, model_path, "a" * 64, example)
+    assert path == artifact_path(model_path, "a" * 64, backend)
+    compiled = load_compiled(path, backend)
+    data = torch.randn(3, 5)
+    with torch.inference_mode():
+        assert torch.allclose(compiled(data), model(data), atol=1e-6)
+
+    mtime = os.stat(path).st_mtime_ns
+    assert compile_model(model, backend, model_path, "a" * 64, example) == path
+    assert os.stat(path).st_mtime_ns == mtime
+
+    # New weights get a new artifact and the old one is removed
+    new_path = compile_model(model, backend, model_path, "b" * 64, example)
+    assert os.path.exists(new_path)
+    assert not os.path.exists(path)
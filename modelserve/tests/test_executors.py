@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+import pytest
+from admission import DeadlineExceeded
+from executors import WorkloadExecutor, model_threads
+
+
+def test_calls_past_their_deadline_are_dropped():
+    executor = WorkloadExecutor("test", 1)
+
+    async def main():
+        assert await executor.run(sum, [1, 2]) == 3
+        with pytest.raises(DeadlineExceeded):
+            await executor.run(sum, [1, 2], deadline=time.monotonic() - 1)
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert executor.stats()["expired"] == 1
+
+
+def test_stats_track_queue_depth_and_waits():
+    executor = WorkloadExecutor("test", 1)
+    release = threading.Event()
+
+    async def main():
+        calls = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        during = executor.stats()
+        release.set()
+        await asyncio.gather(*calls)
+        return during, executor.stats()
+
+    try:
+        during, after = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert (during["running"], during["queued"]) == (1, 2)
+    assert (after["running"], after["queued"], after["completed"]) == (0, 0, 3)
+    assert after["wait_ms_max"] >= after["wait_ms_p50"] >= 0
+
+
+def test_model_threads():
+    assert model_threads({"threads": {"explain": 1}}, "explain", 4) == 1
+    assert model_threads({"threads": {"explain": 1}}, "predict", 4) == 4
+    assert model_threads({}, "predict", 4) == 4
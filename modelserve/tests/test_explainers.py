@@ -0,0 +1,71 @@
+import torch
+from architectures.mlp import MLPClassifier
+from explainers import lime, shap
+
+
+def make_model():
+    torch.manual_seed(0)
+    return MLPClassifier(6, [16, 8], 4).eval()
+
+
+def test_integrated_gradients_completeness():
+    """Tests that attributions of every class sum to the output difference from the baseline."""
+    model = make_model()
+    data = torch.randn(5, 6)
+    baseline = torch.zeros(1, 6)
+
+    attributions = shap.integrated_gradients(model, data, baseline, num_classes=4, n_steps=64)
+
+    with torch.no_grad():
+        expected = (model(data) - model(baseline)).T
+    assert attributions.shape == (4, 5, 6)
+    assert torch.allclose(attributions.sum(dim=2), expected, atol=1e-2)
+
+
+def test_internal_batch_size_does_not_change_attributions():
+    """Tests that chunking the interpolation steps gives the same result."""
+    model = make_model()
+    data = torch.randn(7, 6)
+    baseline = data.mean(dim=0, keepdim=True)
+
+    full = shap.integrated_gradients(model, data, baseline, num_classes=4, n_steps=20)
+    chunked = shap.integrated_gradients(model, data, baseline, num_classes=4, n_steps=20, internal_batch_size=15)
+
+    assert torch.allclose(full, chunked, atol=1e-6)
+
+
+def test_explain_returns_one_array_per_class():
+    result = shap.explain(make_model(), torch.randn(12, 6), n_steps=10)
+
+    assert len(result["attributions"]) == 4
+    assert result["attributions"][0].shape == (12, 6)
+    assert result["baseline"].shape == (1, 6)
+
+
+
+def test_lime_recovers_a_linear_model():
+    """Tests that without a ridge penalty the local models of a linear network are exact."""
+    torch.manual_seed(0)
+    model = torch.nn.Linear(6, 4).eval()
+    data = torch.randn(5, 6)
+    baseline = torch.zeros(1, 6)
+
+    attributions, intercepts = lime.lime_attributions(model, data, baseline, num_samples=128, alpha=0.0)
+
+    with torch.no_grad():
+        assert torch.allclose(attributions, model.weight[:, None, :] * data[None], atol=1e-4)
+        assert torch.allclose(intercepts, model(baseline).T.expand(4, 5), atol=1e-4)
+
+
+def test_lime_explanation_of_a_row_does_not_depend_on_the_batch():
+    model = make_model()
+    data = torch.randn(8, 6)
+    baseline = torch.zeros(1, 6)
+
+    alone = lime.explain(model, data[2:3], baseline=baseline, num_samples=64)
+    batched = lime.explain(model, data, baseline=baseline, num_samples=64, internal_batch_size=100)
+
+    assert len(batched["attributions"]) == 4
+    assert batched["attributions"][0].shape == (8, 6)
+    for alone_class, batched_class in zip(alone["attributions"], batched["attributions"]):
+        assert (abs(alone_class[0] - batched_class[2]) < 1e-5).all()
@@ -0,0 +1,41 @@
+import numpy as np
+import torch
+from explanation_cache import ExplanationCache, explanation_keys
+
+
+def keys_for(data, checksum="abc", params=None, baseline=None):
+    context = {"baseline": baseline if baseline is not None else torch.zeros(1, 3)}
+    return explanation_keys("demo", checksum, "shap", params or {}, context, data)
+
+
+def test_keys_depend_on_every_input():
+    """Tests that rows, weights, parameters and context all change the key."""
+    data = torch.tensor([[1.0, 2.0, 3.0], [1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+    keys = keys_for(data)
+
+    assert keys[0] == keys[1] != keys[2]
+    assert keys_for(data, checksum="def")[0] != keys[0]
+    assert keys_for(data, params={"n_steps": 10})[0] != keys[0]
+    assert keys_for(data, baseline=torch.ones(1, 3))[0] != keys[0]
+
+
+def test_memory_tier_is_bounded():
+    """Tests that the in-memory tier evicts the oldest entries past its byte budget."""
+    cache = ExplanationCache(max_bytes=3 * 8 * 4)
+    values = [np.full((2, 4), i, dtype=np.float32) for i in range(4)]
+    cache.put_many(["a", "b", "c", "d"], values)
+
+    assert cache.get("a") is None
+    assert np.array_equal(cache.get("d"), values[3])
+    assert cache.stats()["bytes"] <= 3 * 8 * 4
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    """Tests that entries written to disk are found by another cache instance."""
+    value = np.arange(6, dtype=np.float32).reshape(2, 3)
+    ExplanationCache(1024, directory=str(tmp_path)).put_many(["ab12"], [value])
+
+    cache = ExplanationCache(1024, directory=str(tmp_path))
+    assert cache.stats()["disk_entries"] == 1
+    assert np.array_equal(cache.get("ab12"), value)
+    assert cache.stats()["entries"] == 1
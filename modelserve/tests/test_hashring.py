@@ -0,0 +1,39 @@
+from hashring import HashRing
+
+MODELS = [f"model-{i}" for i in range(500)]
+
+
+def test_owners_are_distinct_and_stable():
+    ring = HashRing(["a", "b", "c"])
+
+    owners = ring.owners("demo", replication=2)
+
+    assert len(owners) == 2 and len(set(owners)) == 2
+    assert HashRing(["c", "a", "b"]).owners("demo", replication=2) == owners
+    assert len(ring.owners("demo", replication=5)) == 3
+    assert HashRing().owners("demo") == []
+
+
+def test_models_are_spread_over_replicas():
+    ring = HashRing(["a", "b", "c", "d"])
+    counts = {}
+    for owner in ring.assignments(MODELS).values():
+        counts[owner[0]] = counts.get(owner[0], 0) + 1
+
+    assert set(counts) == {"a", "b", "c", "d"}
+    assert min(counts.values()) > len(MODELS) / 4 * 0.6
+
+
+def test_join_and_leave_only_move_the_models_of_that_replica():
+    """Tests that a joining replica only takes models from others, and a leaving one only gives its own away."""
+    ring = HashRing(["a", "b", "c"])
+    before = ring.assignments(MODELS)
+
+    ring.add("d")
+    after = ring.assignments(MODELS)
+    moved = [name for name in MODELS if before[name] != after[name]]
+    assert all(after[name] == ["d"] for name in moved)
+    assert 0 < len(moved) < len(MODELS) / 2
+
+    ring.remove("d")
+    assert ring.assignments(MODELS) == before
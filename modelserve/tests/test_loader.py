@@ -0,0 +1,62 @@
+import os
+import pytest
+import torch
+from architectures.mlp import MLPClassifier, infer_shapes
+import hashlib
+from loader import load_weights, build_model, model_nbytes, file_checksum
+
+
+@pytest.fixture
+def saved_model(tmp_path):
+    """Saves a small MLP state dict and returns its path and reference model."""
+    model = MLPClassifier(5, [32, 16], 3).eval()
+    path = os.path.join(tmp_path, "model.pt")
+    torch.save(model.state_dict(), path)
+    return path, model
+
+
+def test_infer_shapes_from_state_dict(saved_model):
+    """Tests that the MLP layout is recovered from the stored weight shapes."""
+    _, model = saved_model
+    assert infer_shapes(model.state_dict()) == {"input_size": 5, "hidden_sizes": [32, 16], "num_classes": 3}
+
+
+def test_build_model_without_architecture_section(saved_model):
+    """Tests that a config with no architecture section still yields the stored network."""
+    path, reference = saved_model
+    model = build_model({"explainers": {"shap": {}}}, load_weights(path))
+
+    data = torch.randn(4, 5)
+    with torch.no_grad():
+        assert torch.allclose(model(data), reference(data))
+
+
+def test_build_model_rejects_mismatching_architecture(saved_model):
+    """Tests that shapes declared in the config are checked against the weights."""
+    path, _ = saved_model
+    with pytest.raises(RuntimeError):
+        build_model({"architecture": {"type": "mlp", "hidden_sizes": [8]}}, load_weights(path))
+
+
+def test_model_nbytes(saved_model):
+    """Tests the parameter size accounting of a loaded model."""
+    path, _ = saved_model
+    model = build_model({}, load_weights(path))
+    n_params = 5 * 32 + 32 + 32 * 16 + 16 + 16 * 3 + 3
+    assert model_nbytes(model) == n_params * 4
+
+
+def test_file_checksum_is_cached_until_the_file_changes(tmp_path):
+    """Tests that an unchanged file is not read again, and a changed one is."""
+    path = tmp_path / "model.pt"
+    path.write_bytes(b"weights-1")
+    stat = os.stat(path)
+    assert file_checksum(str(path)) == hashlib.sha256(b"weights-1").hexdigest()
+
+    # Same size and modification time: the cached checksum is kept
+    path.write_bytes(b"weights-2")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert file_checksum(str(path)) == hashlib.sha256(b"weights-1").hexdigest()
+
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert file_checksum(str(path)) == hashlib.sha256(b"weights-2").hexdigest()
@@ -0,0 +1,39 @@
+from metrics import MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ("model",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value, "demo")
+
+    text = registry.render()
+
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{model="demo",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{model="demo",le="1"} 3' in text
+    assert 'latency_seconds_bucket{model="demo",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{model="demo"} 6.05' in text
+    assert 'latency_seconds_count{model="demo"} 4' in text
+
+
+def test_collectors_are_rendered():
+    """Tests that the families returned by collectors are rendered, with label values escaped, and failing ones skipped."""
+    registry = MetricsRegistry()
+
+    @registry.collector
+    def requests():
+        yield "requests_total", "counter", "Requests.", [("requests_total", {"model": 'a "quoted" name'}, 3)]
+
+    @registry.collector
+    def queue_depth():
+        yield "queue_depth", "gauge", "Queued calls.", [("queue_depth", {}, 7)]
+
+    @registry.collector
+    def broken():
+        raise RuntimeError("unavailable")
+
+    text = registry.render()
+
+    assert 'requests_total{model="a \\"quoted\\" name"} 3' in text
+    assert "# TYPE queue_depth gauge\nqueue_depth 7" in text
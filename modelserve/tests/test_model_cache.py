@@ -0,0 +1,66 @@
+import pytest
+import torch
+from model_cache import ModelCache, tensors_nbytes
+
+
+def test_lru_evicts_least_recently_used():
+    """Tests that going over budget evicts the entry accessed longest ago."""
+    cache = ModelCache(budget_bytes=100)
+    cache.put("a", {}, 40)
+    cache.put("b", {}, 40)
+    cache.get("a")
+
+    evicted = cache.put("c", {}, 40)
+
+    assert evicted == ["b"]
+    assert "a" in cache and "c" in cache
+    assert cache.evictions == 1
+
+
+def test_lfu_evicts_least_frequently_used():
+    """Tests that the lfu policy keeps the most used entry even if it is the oldest."""
+    cache = ModelCache(budget_bytes=100, policy="lfu")
+    cache.put("a", {}, 40)
+    cache.put("b", {}, 40)
+    for _ in range(3):
+        cache.get("a")
+    cache.get("b")
+
+    assert cache.put("c", {}, 40) == ["b"]
+
+
+def test_pinned_entries_are_never_evicted():
+    """Tests that pinned entries survive even when the cache stays over budget."""
+    cache = ModelCache(budget_bytes=50, pinned=["a"])
+    cache.put("a", {}, 40)
+
+    assert cache.put("b", {}, 40) == []
+    assert "a" in cache and "b" in cache
+    assert cache.total_bytes == 80
+
+    cache.unpin("a")
+    assert cache.put("c", {}, 10) == ["a"]
+
+
+def test_hit_and_miss_counters():
+    """Tests the access counters exposed through stats()."""
+    cache = ModelCache(budget_bytes=100)
+    cache.put("a", {"model": 1}, 10)
+
+    assert cache.get("a") == {"model": 1}
+    assert cache.get("missing") is None
+    assert cache.peek("a") == {"model": 1}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["models"]["a"] == {"size_bytes": 10, "uses": 2, "pinned": False}
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ModelCache(budget_bytes=1, policy="fifo")
+
+
+def test_tensors_nbytes_walks_nested_containers():
+    state = {"baseline": torch.zeros(2, 5), "background": [torch.zeros(3, dtype=torch.float64)], "name": "x"}
+    assert tensors_nbytes(state) == 2 * 5 * 4 + 3 * 8
@@ -0,0 +1,37 @@
+import time
+import torch
+from prediction_cache import PredictionCache, prediction_key
+
+
+def test_keys_depend_on_model_weights_backend_and_input():
+    data = torch.ones(2, 3)
+    key = prediction_key("demo", "abc", "eager", data)
+
+    assert prediction_key("demo", "abc", "eager", torch.ones(2, 3)) == key
+    assert prediction_key("other", "abc", "eager", data) != key
+    assert prediction_key("demo", "def", "eager", data) != key
+    assert prediction_key("demo", "abc", "torchscript", data) != key
+    assert prediction_key("demo", "abc", "eager", data.double()) != key
+    assert prediction_key("demo", "abc", "eager", torch.ones(3, 2)) != key
+
+
+def test_entries_expire():
+    cache = PredictionCache(1024, ttl_seconds=0.05)
+    cache.put("a", torch.ones(2))
+
+    assert torch.equal(cache.get("a"), torch.ones(2))
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["bytes"] == 0
+
+
+def test_cache_is_bounded():
+    """Tests that the least recently used entries are evicted past the byte budget."""
+    cache = PredictionCache(max_bytes=3 * 16, ttl_seconds=60)
+    for name in "abcd":
+        cache.put(name, torch.zeros(4))
+
+    assert cache.get("a") is None
+    assert cache.get("d") is not None
+    assert cache.stats()["bytes"] == 3 * 16
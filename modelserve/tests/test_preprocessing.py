@@ -0,0 +1,58 @@
+import json
+import pytest
+import torch
+from preprocessing import Preprocessor, fit_preprocessing, load_preprocessor, main
+
+SPEC = {"columns": [
+    {"name": "age", "kind": "numeric", "mean": 40.0, "std": 10.0},
+    {"name": "city", "kind": "onehot", "categories": ["paris", "rome", "oslo"], "fill": "rome"},
+    {"name": "size", "kind": "ordinal", "categories": ["S", "M", "L"]}
+]}
+
+
+def test_raw_rows_are_encoded_in_one_batch():
+    """Tests standardization, one-hot and ordinal encoding and imputation of list and object rows."""
+    preprocessor = Preprocessor(SPEC)
+    rows = [
+        [50, "oslo", "L"],
+        {"age": None, "city": "berlin", "size": "S"},
+        {"age": "30", "size": "unknown"}
+    ]
+
+    features = preprocessor(preprocessor.encode_rows(rows))
+
+    assert preprocessor.feature_names == ["age", "city=paris", "city=rome", "city=oslo", "size"]
+    assert torch.equal(features, torch.tensor([
+        [1.0, 0.0, 0.0, 1.0, 2.0],
+        # Missing age takes the mean, an unknown city the fill category
+        [0.0, 0.0, 1.0, 0.0, 0.0],
+        [-1.0, 0.0, 1.0, 0.0, -1.0]
+    ]))
+
+
+def test_invalid_rows_and_specs_are_rejected():
+    preprocessor = Preprocessor(SPEC)
+    with pytest.raises(ValueError):
+        preprocessor.encode_rows([[1, "paris"]])
+    with pytest.raises(ValueError):
+        preprocessor.encode_rows([["old", "paris", "S"]])
+    with pytest.raises(ValueError):
+        Preprocessor({"columns": [{"name": "city", "kind": "onehot", "categories": ["a"], "fill": "b"}]})
+
+
+def test_fitted_preprocessing_is_referenced_from_the_config(tmp_path):
+    dataset = tmp_path / "train.csv"
+    dataset.write_text("age,city,size,label\n20,paris,S,0\n40,rome,M,1\n,rome,L,1\n")
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "config.json").write_text(json.dumps({"explainers": {}}))
+
+    main([str(dataset), str(model_dir), "--numeric", "age", "--onehot", "city", "--ordinal", "size=S,M,L"])
+    config = json.loads((model_dir / "config.json").read_text())
+    preprocessor = load_preprocessor(str(model_dir / "model.pt"), config)
+
+    assert preprocessor.names == ["age", "city", "size"]
+    assert preprocessor.feature_names == ["age", "city=paris", "city=rome", "size"]
+    assert torch.allclose(preprocessor(preprocessor.encode_rows([[None, None, "M"]])), torch.tensor([[0.0, 0.0, 1.0, 1.0]]))
+    assert load_preprocessor(str(model_dir / "model.pt"), {}) is None
+    assert fit_preprocessing([{"x": "1"}, {"x": "3"}], numeric=["x"])["columns"][0]["std"] == 1.0
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import torch
+from architectures.mlp import MLPClassifier
+from quantize import compare_outputs, quantize_checked, quantize_model
+
+
+@pytest.fixture
+def model():
+    torch.manual_seed(0)
+    return MLPClassifier(8, [64, 32], 3).eval()
+
+
+@pytest.mark.parametrize("mode", ["dynamic", "static"])
+def test_quantized_model_agrees_with_fp32(model, mode):
+    calibration = torch.randn(256, 8)
+
+    quantized = quantize_model(model, mode, calibration)
+
+    assert compare_outputs(model, quantized, calibration)["agreement"] >= 0.95
+    # The fp32 model is left untouched
+    assert isinstance(model.layer_stack[0], torch.nn.Linear)
+
+
+def test_quantization_is_enabled_only_when_accurate_enough(model, tmp_path):
+    """Tests the accuracy gate on the stored calibration sample."""
+    model_path = str(tmp_path / "model.pt")
+    config = {"mode": "dynamic"}
+
+    quantized, report = quantize_checked(model, config, model_path)
+    assert quantized is None and "not found" in report["reason"]
+
+    np.save(tmp_path / "calibration.npy", np.random.RandomState(0).randn(128, 8).astype(np.float32))
+    quantized, report = quantize_checked(model, config, model_path)
+    assert quantized is not None and report["enabled"]
+
+    quantized, report = quantize_checked(model, {**config, "max_abs_error": 0.0}, model_path)
+    assert quantized is None and not report["enabled"]
@@ -0,0 +1,111 @@
+import asyncio
+import httpx
+import pytest
+from collections import OrderedDict
+from fastapi.testclient import TestClient
+
+import router
+from hashring import HashRing
+
+REPLICAS = ["http://replica-0", "http://replica-1", "http://replica-2"]
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    """Routes to three fake replicas; a replica listed in `down` refuses connections."""
+    state = {"down": set(), "requests": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        replica = f"{request.url.scheme}://{request.url.host}"
+        if replica in state["down"]:
+            raise httpx.ConnectError("connection refused", request=request)
+        state["requests"].append((replica, request.url.path))
+        if request.url.path == "/models":
+            return httpx.Response(200, json=[
+                {"name": "demo", "status": "loaded" if replica == REPLICAS[0] else "available"},
+                {"name": "other", "status": "available"}
+            ])
+        if request.url.path.startswith("/explain"):
+            return httpx.Response(202, json={"job_id": "job-1"}, headers={"Location": "/jobs/job-1"})
+        if request.url.path.startswith("/jobs"):
+            return httpx.Response(200, json={"job_id": "job-1", "replica": replica})
+        return httpx.Response(200, json={"replica": replica, "body": request.content.decode()})
+
+    monkeypatch.setattr(router, "MODELSERVE_REPLICAS", REPLICAS)
+    monkeypatch.setattr(router, "replicas", {})
+    monkeypatch.setattr(router, "ring", HashRing())
+    monkeypatch.setattr(router, "known_models", set())
+    monkeypatch.setattr(router, "job_replicas", OrderedDict())
+    monkeypatch.setattr(router, "client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return state
+
+
+@pytest.fixture
+def client(replicas):
+    with TestClient(router.app) as client:
+        yield client
+
+
+def test_requests_go_to_the_replicas_of_the_model(replicas, client):
+    owners = HashRing(REPLICAS).owners("demo", router.ROUTER_REPLICATION)
+
+    for _ in range(4):
+        response = client.post("/predict/demo", json={"data": [[1.0]]})
+        assert response.status_code == 200
+        assert response.json()["replica"] in owners
+        assert response.headers["x-served-by"] == response.json()["replica"]
+        assert response.json()["body"] == '{"data":[[1.0]]}'
+
+
+def test_unreachable_replica_is_skipped_and_leaves_the_ring(replicas, client):
+    """Tests that a request is retried on the next replica of the model when one refuses connections."""
+    primary, secondary = HashRing(REPLICAS).owners("demo", 2)
+    replicas["down"].add(primary)
+
+    response = client.post("/predict/demo", json={"data": [[1.0]]})
+
+    assert response.status_code == 200
+    assert response.json()["replica"] == secondary
+    assert primary not in router.ring
+    assert client.get("/replicas").json()["replicas"][primary]["healthy"] is False
+
+
+def test_leaving_replica_reports_moved_models(replicas, client):
+    client.get("/models")
+    owners = router.ring.owners("demo", router.ROUTER_REPLICATION)
+
+    moved = client.request("DELETE", "/replicas", params={"url": owners[0]}).json()["moved"]
+
+    assert owners[0] not in moved["demo"]
+    assert all(owners[0] not in assigned for assigned in router.ring.assignments(["demo", "other"], 2).values())
+    assert client.post("/replicas", json={"url": owners[0]}).json()["moved"]["demo"] == owners
+
+
+def test_models_show_assigned_and_loaded_replicas(replicas, client):
+    models = {model["name"]: model for model in client.get("/models").json()}
+
+    assert models["demo"]["replicas"] == router.ring.owners("demo", router.ROUTER_REPLICATION)
+    assert models["demo"]["loaded_on"] == [REPLICAS[0]]
+    assert models["demo"]["status"] == "loaded"
+    assert models["other"]["loaded_on"] == []
+
+
+def test_jobs_are_routed_to_the_replica_that_accepted_them(replicas, client):
+    response = client.post("/explain/demo", json={"explainer": "shap", "data": [[1.0]]})
+    assert response.status_code == 202
+    accepted_by = response.headers["x-served-by"]
+
+    assert client.get("/jobs/job-1").json()["replica"] == accepted_by
+
+
+def test_router_state_only_grows_with_real_models_and_live_jobs(replicas, client, monkeypatch):
+    """Tests that unknown model names are not recorded and expired job routes are forgotten."""
+    client.post("/predict/no-such-model", json={"data": [[1.0]]})
+    asyncio.run(router.refresh_known_models())
+    assert router.known_models == {"demo", "other"}
+
+    monkeypatch.setattr(router, "ROUTER_JOB_TTL", 0.0)
+    client.post("/explain/demo", json={"explainer": "shap", "data": [[1.0]]})
+    router.remember_job("job-2", REPLICAS[0])
+    assert list(router.job_replicas) == ["job-2"]
+    assert router.job_replica("job-2") is None
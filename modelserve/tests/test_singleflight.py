@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    """Tests that callers with the same key wait on a single execution."""
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "model"
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("a", load) for _ in range(10)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+
+    assert calls == [1]
+    assert results == ["model"] * 10
+    assert "a" not in flight
+
+
+def test_errors_are_shared_and_not_cached():
+    """Tests that a failure reaches every waiter and the next call runs again."""
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("broken")
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("a", load) for _ in range(3)), return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await flight.do("a", load)
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_work():
+    """Tests that the shared task keeps running when one waiter goes away."""
+    async def load():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def scenario():
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do("a", load))
+        second = asyncio.create_task(flight.do("a", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == 42
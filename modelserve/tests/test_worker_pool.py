@@ -0,0 +1,37 @@
+from worker_pool import WorkerPool
+
+
+def make_pool(processes=4, spill_depth=2):
+    # Worker processes are only started on the first submission, so routing can
+    # be exercised without spawning anything.
+    return WorkerPool(processes, threads_per_process=1, spill_depth=spill_depth)
+
+
+def test_model_stays_on_its_home_worker():
+    """Tests that a lightly loaded model is always routed to the same worker."""
+    pool = make_pool()
+    first = pool._route("model-a")
+    pool._pending[first] -= 1
+
+    for _ in range(5):
+        assert pool._route("model-a") == first
+        pool._pending[first] -= 1
+    assert pool.stats()["holders"] == {"model-a": [first]}
+
+
+def test_model_spills_to_another_worker_when_busy():
+    """Tests that a model spreads to a second worker once its holders are saturated."""
+    pool = make_pool(spill_depth=2)
+    workers = [pool._route("model-a") for _ in range(3)]
+
+    assert workers[0] == workers[1]
+    assert workers[2] != workers[0]
+    assert sorted(pool.stats()["holders"]["model-a"]) == sorted({workers[0], workers[2]})
+
+
+def test_forget_resets_routing():
+    pool = make_pool()
+    pool._route("model-a")
+    pool.forget("model-a")
+    assert "model-a" not in pool.stats()["holders"]
+    pool.shutdown()